@@ -2,6 +2,9 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the project through it (e.g. ``uvicorn config.asgi:application``) to get
+the long-lived staff order stream at ``/api/orders/events/``; under WSGI that
+endpoint degrades to one batch per reconnect.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -12,5 +15,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Django advises against persistent connections under ASGI: every
+# sync_to_async thread would keep one open (see config/sqlite.py).
+os.environ.setdefault('SQLITE_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -14,6 +14,10 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
+from .sqlite import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers the rest of the chain.
+    'store.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -52,7 +58,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'config.urls'
+# Serve catalog, profile and order history GETs from native async views
+# (store/views_async.py); only worthwhile under ASGI.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False').lower() == 'true'
+ROOT_URLCONF = 'config.urls_async' if ASYNC_READ_VIEWS else 'config.urls'
 
 TEMPLATES = [
     {
@@ -74,12 +83,86 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Django's stock SQLite settings; SQLITE_PROFILE=production for WAL, busy
+# timeout, BEGIN IMMEDIATE and persistent connections (see config/sqlite.py).
 DATABASES = {
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
+}
+
+# Read replicas (comma-separated SQLite files kept in sync with the primary
+# outside Django, e.g. by LiteFS). Catalog, order history and profile reads
+# go to them; tests mirror them onto the test primary.
+DATABASE_REPLICAS = []
+for index, name in enumerate(
+    name for name in os.getenv('DATABASE_REPLICAS', '').split(',') if name
+):
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = {**sqlite_database(name, replica=True), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['store.routers.PrimaryReplicaRouter']
+# After a request writes, its user's reads stay on the primary this long.
+REPLICA_READ_YOUR_WRITES_SECONDS = int(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', '10'))
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv(
+            'DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'store'),
     }
 }
+CART_CACHE_TIMEOUT = int(os.getenv('CART_CACHE_TIMEOUT', '300'))
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', '3600'))
+# Lifetime in seconds of the signed cart tokens held by anonymous visitors.
+GUEST_CART_MAX_AGE = int(os.getenv('GUEST_CART_MAX_AGE', str(30 * 24 * 3600)))
+# Idempotency-Key on checkout and payment (store/idempotency.py): how long
+# responses are replayed, how long a duplicate waits for the request still
+# running with its key, and after how long an unfinished claim is abandoned.
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '10'))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '60'))
+# Shipped and cancelled orders untouched for this many days are moved to the
+# archive tables by `manage.py archive_orders`, in batches (store/archive.py).
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '90'))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', '500'))
+# Build product/order list pages from .values() rows (store/fastpath.py)
+# instead of the DRF serializers; the JSON is identical.
+FAST_LIST_SERIALIZATION = os.getenv('FAST_LIST_SERIALIZATION', 'True').lower() == 'true'
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+PRODUCT_SEARCH_LIMIT = int(os.getenv('PRODUCT_SEARCH_LIMIT', '200'))
+
+# Staff order change feed (/api/orders/changes/ and /api/orders/events/)
+ORDER_FEED_POLL_INTERVAL = float(os.getenv('ORDER_FEED_POLL_INTERVAL', '2'))
+ORDER_FEED_SETTLE_SECONDS = float(os.getenv('ORDER_FEED_SETTLE_SECONDS', '1'))
+ORDER_FEED_BATCH_SIZE = int(os.getenv('ORDER_FEED_BATCH_SIZE', '500'))
+ORDER_FEED_HEARTBEAT_SECONDS = float(os.getenv('ORDER_FEED_HEARTBEAT_SECONDS', '20'))
+# ?updated_since= delta sync (store/sync.py) holds back rows this recent, as
+# the change feed does.
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '1'))
+
+# Request instrumentation (store/timing.py): Server-Timing header on staff
+# responses and a JSON log line on ``store.timing`` for slow requests.
+REQUEST_TIMING = os.getenv('REQUEST_TIMING', 'True').lower() == 'true'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '500'))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', '50'))
+SLOW_REQUEST_TOP_SQL = int(os.getenv('SLOW_REQUEST_TOP_SQL', '5'))
+# URL names whose time goes to password hashing on purpose: only their query
+# count is checked.
+SLOW_REQUEST_SKIP_URL_NAMES = ('register-list', 'token_obtain_pair')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'store.timing': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,18 +205,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'store.authentication.StoreJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'store.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')),
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'store.serializers.StoreTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'store.serializers.StoreTokenRefreshSerializer',
 }
+# Authenticate tokens from their username/is_staff claims without loading the
+# user; claims can be up to ACCESS_TOKEN_LIFETIME stale.
+JWT_STATELESS_USERS = os.getenv('JWT_STATELESS_USERS', 'True').lower() == 'true'
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+USER_CACHE_TIMEOUT = float(os.getenv('USER_CACHE_TIMEOUT', '60'))
 
 CORS_ALLOWED_ORIGINS = [
     origin
@@ -143,6 +235,8 @@ CORS_ALLOWED_ORIGINS = [
     if origin
 ]
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 CSRF_TRUSTED_ORIGINS = [
     origin
     for origin in os.getenv(
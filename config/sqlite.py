@@ -0,0 +1,74 @@
+"""SQLite connection profiles for ``DATABASES``.
+
+The ``production`` profile lets concurrent requests share one SQLite file:
+WAL so readers never block the writer, ``synchronous=NORMAL`` (durable at
+checkpoints, safe against corruption in WAL mode), a busy timeout instead of
+failing at once with "database is locked", ``BEGIN IMMEDIATE`` so a write
+transaction takes the write lock up front rather than deadlocking when it
+upgrades from a read, and persistent connections. ``default``, Django's
+stock behaviour, is the default: the production profile is opted into with
+``SQLITE_PROFILE=production``, so development, tests and management
+commands leave ``db.sqlite3`` in its rollback-journal mode.
+
+Persistent connections are off under ASGI (``config.asgi`` sets
+``SQLITE_CONN_MAX_AGE=0``): each ``sync_to_async`` thread would otherwise
+keep its own connection, page cache and mmap open. Replicas are copies kept
+in sync outside Django, so their connections are read-only and never switch
+the journal mode or take the write lock.
+"""
+
+import os
+
+PROFILES = ('production', 'default')
+
+
+def _env(name, default):
+    return os.getenv(f'SQLITE_{name}', default)
+
+
+def init_pragmas(journal_mode, synchronous, mmap_size, cache_size, query_only=False):
+    """``init_command`` running the given pragmas; a ``journal_mode`` of
+    ``None`` leaves the file's own, and ``query_only`` refuses writes."""
+    pragmas = [] if journal_mode is None else [f'PRAGMA journal_mode={journal_mode}']
+    pragmas += [
+        f'PRAGMA synchronous={synchronous}',
+        f'PRAGMA mmap_size={mmap_size}',
+        f'PRAGMA cache_size={cache_size}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+    if query_only:
+        pragmas.append('PRAGMA query_only=ON')
+    return ';'.join(pragmas)
+
+
+def sqlite_database(name, profile=None, replica=False):
+    """Return a ``DATABASES`` entry for the SQLite file ``name``.
+
+    ``profile`` defaults to ``$SQLITE_PROFILE`` (``default``); every pragma
+    of the production profile can be overridden with ``SQLITE_<SETTING>``.
+    ``replica`` opens a read replica without the profile's write pragmas.
+    """
+    profile = profile or _env('PROFILE', 'default')
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown SQLite profile {profile!r}; choose from {PROFILES}.')
+    database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': name}
+    if profile == 'default':
+        return database
+    database['CONN_MAX_AGE'] = int(_env('CONN_MAX_AGE', '600'))
+    database['CONN_HEALTH_CHECKS'] = True
+    database['OPTIONS'] = {
+        'init_command': init_pragmas(
+            # journal_mode=WAL is written to the file itself.
+            journal_mode=None if replica else _env('JOURNAL_MODE', 'WAL'),
+            synchronous=_env('SYNCHRONOUS', 'NORMAL'),
+            mmap_size=int(_env('MMAP_SIZE', str(256 * 1024 * 1024))),
+            # Negative sizes are in KiB: 64 MiB of page cache per connection.
+            cache_size=int(_env('CACHE_SIZE', '-65536')),
+            query_only=replica,
+        ),
+        # Seconds to wait for a lock (sqlite3's busy timeout).
+        'timeout': float(_env('BUSY_TIMEOUT', '20')),
+    }
+    if not replica:
+        database['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+    return database
@@ -0,0 +1,21 @@
+"""``config.urls`` with the native async read views in front.
+
+Used as ``ROOT_URLCONF`` when ``ASYNC_READ_VIEWS`` is on (see
+``store/views_async.py``); routes not listed here, and requests the async
+views don't handle, go to the same DRF views as ``config.urls``.
+"""
+
+from django.urls import path
+
+from store import views_async
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/products/', views_async.product_list),
+    path('api/products/<int:pk>/', views_async.product_detail),
+    path('api/orders/', views_async.order_list),
+    path('api/orders/<int:pk>/', views_async.order_detail),
+    path('api/auth/me/', views_async.profile),
+    *sync_urlpatterns,
+]
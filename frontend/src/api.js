@@ -4,6 +4,7 @@ const ACCESS_KEY = 'accessToken';
 const REFRESH_KEY = 'refreshToken';
 const USER_KEY = 'username';
 const STAFF_KEY = 'isStaff';
+const GUEST_CART_KEY = 'guestCart';
 
 export const getAccessToken = () => localStorage.getItem(ACCESS_KEY);
 export const getRefreshToken = () => localStorage.getItem(REFRESH_KEY);
@@ -24,6 +25,13 @@ export const clearSession = () => {
 };
 export const getIsStaff = () => localStorage.getItem(STAFF_KEY) === 'true';
 
+// Signed cart token of an anonymous visitor, merged into their cart at login.
+export const getGuestCart = () => localStorage.getItem(GUEST_CART_KEY);
+export const setGuestCart = (token) => {
+  if (token) localStorage.setItem(GUEST_CART_KEY, token);
+  else localStorage.removeItem(GUEST_CART_KEY);
+};
+
 const parseError = async (response) => {
   try {
     const data = await response.json();
@@ -1,5 +1,13 @@
 import { computed, reactive, readonly } from 'vue';
-import { clearSession, getUsername, getIsStaff, request, setSession } from '../api';
+import {
+  clearSession,
+  getGuestCart,
+  getIsStaff,
+  getUsername,
+  request,
+  setGuestCart,
+  setSession,
+} from '../api';
 
 const state = reactive({
   username: getUsername() || '',
@@ -29,10 +37,12 @@ export const useAuth = () => {
     state.loading = true;
     setError('');
     try {
+      const guestCart = getGuestCart();
       const data = await request('/auth/token/', {
         method: 'POST',
-        body: { username, password },
+        body: { username, password, ...(guestCart ? { guest_cart: guestCart } : {}) },
       });
+      setGuestCart(null);
       setSession({ access: data.access, refresh: data.refresh, username });
       state.username = username;
       state.isAuthenticated = true;
@@ -1,13 +1,29 @@
 from django.contrib import admin
 
-from .models import Cart, CartItem, Order, OrderItem, Product
+from .models import Cart, CartItem, Order, OrderItem, Product, ProductStockShard
+from .search import search_products
+
+
+class ProductStockShardInline(admin.TabularInline):
+    model = ProductStockShard
+    extra = 0
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'stock', 'is_active', 'created_at')
+    list_display = ('name', 'price', 'available_stock', 'stock_shard_count', 'is_active', 'created_at')
     list_filter = ('is_active',)
     search_fields = ('name',)
+    readonly_fields = ('stock_shard_count',)
+    inlines = [ProductStockShardInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('stock_shards')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_products(queryset, search_term, ranked=False), False
 
 
 class CartItemInline(admin.TabularInline):
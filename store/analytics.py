@@ -0,0 +1,112 @@
+"""Sales summary tables kept up to date as orders change status.
+
+``DailySales`` counts orders and revenue per (placed day, current status) and
+``DailyProductSales`` units and revenue per (placed day, product) over orders
+in ``Order.SOLD_STATUSES``. Every status change applies its delta with an
+``INSERT ... ON CONFLICT DO UPDATE`` in the transaction that changes the
+status, so dashboard queries read a few summary rows per day instead of
+scanning orders.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales, Order, OrderHistory, OrderHistoryItem, OrderItem
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _upsert(model, keys, rows, using):
+    """Add ``rows`` (``{key tuple: (count, revenue)}``) to ``model``'s counters."""
+    if not rows:
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    count_field = 'order_count' if model is DailySales else 'units'
+    columns = [model._meta.get_field(name).column for name in (*keys, count_field, 'revenue')]
+    count_column, revenue_column = (quote(column) for column in columns[-2:])
+    # ROUND keeps SQLite's floating point decimals from drifting.
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(map(quote, columns))}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({", ".join(map(quote, columns[: len(keys)]))}) DO UPDATE SET '
+        f'{count_column} = {count_column} + excluded.{count_column}, '
+        f'{revenue_column} = ROUND({revenue_column} + excluded.{revenue_column}, 2)'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*key, count, revenue) for key, (count, revenue) in rows.items()])
+
+
+def record_status_change(orders, old_status, new_status, using=DEFAULT_DB_ALIAS):
+    """Move ``orders`` from ``old_status`` (``None`` for new orders) to ``new_status``.
+
+    ``orders`` need ``id``, ``placed_at`` and ``total_amount``. Call inside the
+    transaction that changes the status.
+    """
+    if old_status == new_status or not orders:
+        return
+    days = {order.id: timezone.localdate(order.placed_at) for order in orders}
+    sales = defaultdict(lambda: [0, Decimal('0')])
+    for order in orders:
+        for status, sign in ((old_status, -1), (new_status, 1)):
+            if status is not None:
+                entry = sales[(days[order.id], status)]
+                entry[0] += sign
+                entry[1] += sign * order.total_amount
+
+    was_sold = old_status in Order.SOLD_STATUSES
+    if was_sold != (new_status in Order.SOLD_STATUSES):
+        sign = -1 if was_sold else 1
+        products = defaultdict(lambda: [0, Decimal('0')])
+        items = OrderItem.objects.using(using).filter(order_id__in=days).values_list(
+            'order_id', 'product_id', 'quantity', 'unit_price'
+        )
+        for order_id, product_id, quantity, unit_price in items:
+            entry = products[(days[order_id], product_id)]
+            entry[0] += sign * quantity
+            entry[1] += sign * quantity * unit_price
+        _upsert(DailyProductSales, ('day', 'product'), products, using)
+    _upsert(DailySales, ('day', 'status'), sales, using)
+
+
+def rebuild_sales_aggregates(using=DEFAULT_DB_ALIAS):
+    """Recompute both summary tables from the order history; return row counts."""
+    with transaction.atomic(using=using):
+        DailySales.objects.using(using).all().delete()
+        DailyProductSales.objects.using(using).all().delete()
+        # Archived orders still count.
+        sales = (
+            OrderHistory.objects.using(using)
+            .annotate(day=TruncDate('placed_at'))
+            .values('day', 'status')
+            .annotate(order_count=Count('id'), revenue=Sum('total_amount', output_field=MONEY))
+            .order_by()
+        )
+        DailySales.objects.using(using).bulk_create(
+            [DailySales(**row) for row in sales.iterator()], batch_size=1000
+        )
+        products = (
+            OrderHistoryItem.objects.using(using)
+            .filter(order__status__in=Order.SOLD_STATUSES)
+            .annotate(day=TruncDate('order__placed_at'))
+            .values('day', 'product_id')
+            .annotate(
+                units=Sum('quantity'),
+                revenue=Sum(
+                    ExpressionWrapper(F('quantity') * F('unit_price'), output_field=MONEY)
+                ),
+            )
+            .order_by()
+        )
+        DailyProductSales.objects.using(using).bulk_create(
+            [DailyProductSales(**row) for row in products.iterator()], batch_size=1000
+        )
+        return (
+            DailySales.objects.using(using).count(),
+            DailyProductSales.objects.using(using).count(),
+        )
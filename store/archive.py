@@ -0,0 +1,80 @@
+"""Moving finished orders out of the live order tables.
+
+Shipped and cancelled orders never change again, yet checkout, payment and
+the staff board share their tables and indexes with every order ever
+placed. ``archive_orders`` moves those last updated more than
+``ORDER_ARCHIVE_AFTER_DAYS`` ago, with their items, into ``ArchivedOrder``/
+``ArchivedOrderItem``, keeping their ids. Each batch is its own short
+transaction, so writers wait for one batch at most.
+
+``OrderHistory``/``OrderHistoryItem`` read both tables as one; a customer's
+order list and detail, the order exports and the sales aggregate rebuild go
+through them.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+ARCHIVABLE_STATUSES = (Order.STATUS_SHIPPED, Order.STATUS_CANCELLED)
+ORDER_FIELDS = ('id', 'user_id', 'status', 'total_amount', 'placed_at', 'updated_at')
+ITEM_FIELDS = ('id', 'order_id', 'product_id', 'quantity', 'unit_price', 'prepared_quantity')
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(before, using=DEFAULT_DB_ALIAS):
+    return Order.objects.using(using).filter(
+        status__in=ARCHIVABLE_STATUSES, updated_at__lt=before
+    )
+
+
+def archive_batch(before, batch_size, using=DEFAULT_DB_ALIAS):
+    """Archive up to ``batch_size`` orders last updated before ``before``; return how many."""
+    with transaction.atomic(using=using):
+        orders = list(
+            archivable_orders(before, using).order_by('id').values(*ORDER_FIELDS)[:batch_size]
+        )
+        if not orders:
+            return 0
+        ids = [order['id'] for order in orders]
+        items = OrderItem.objects.using(using).filter(order_id__in=ids).values(*ITEM_FIELDS)
+        ArchivedOrder.objects.using(using).bulk_create(
+            [ArchivedOrder(**order) for order in orders]
+        )
+        ArchivedOrderItem.objects.using(using).bulk_create(
+            [ArchivedOrderItem(**item) for item in items], batch_size=1000
+        )
+        OrderItem.objects.using(using).filter(order_id__in=ids).delete()
+        Order.objects.using(using).filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def archive_orders(
+    before=None, batch_size=None, pause=0.0, max_batches=None, using=DEFAULT_DB_ALIAS
+):
+    """Archive every order eligible before ``before``, batch by batch.
+
+    Yields the size of each batch. ``pause`` seconds between batches leave
+    the database to other writers; ``max_batches`` bounds one run.
+    """
+    before = before or archive_cutoff()
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        archived = archive_batch(before, batch_size, using)
+        if not archived:
+            return
+        batches += 1
+        yield archived
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+# Profile fields copied into every token so requests don't have to load them.
+USER_CLAIMS = ('username', 'email', 'is_staff', 'is_superuser')
+
+_users = OrderedDict()
+_users_lock = threading.Lock()
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def _user_pk(value):
+    # Simple JWT stores the user id claim as a string.
+    return get_user_model()._meta.pk.to_python(value)
+
+
+class StoreTokenUser(TokenUser):
+    @cached_property
+    def id(self):
+        return _user_pk(self.token[api_settings.USER_ID_CLAIM])
+
+
+def get_cached_user(user_id):
+    """Return the user with ``user_id`` from a bounded per-process LRU cache.
+
+    Entries are dropped when the user is saved or deleted in this process
+    and expire after ``USER_CACHE_TIMEOUT`` seconds to bound staleness across
+    processes. The instance is shared between requests: don't mutate it.
+    """
+    user_id = _user_pk(user_id)
+    now = time.monotonic()
+    with _users_lock:
+        entry = _users.get(user_id)
+        if entry is not None and entry[0] > now:
+            _users.move_to_end(user_id)
+            return entry[1]
+    user = (
+        get_user_model()
+        .objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+        .first()
+    )
+    if user is not None:
+        with _users_lock:
+            _users[user_id] = (now + settings.USER_CACHE_TIMEOUT, user)
+            _users.move_to_end(user_id)
+            while len(_users) > settings.USER_CACHE_SIZE:
+                _users.popitem(last=False)
+    return user
+
+
+def forget_cached_user(user_id) -> None:
+    with _users_lock:
+        _users.pop(_user_pk(user_id), None)
+
+
+class StoreJWTAuthentication(JWTAuthentication):
+    """JWT authentication that doesn't query ``auth_user`` per request.
+
+    Tokens carrying the ``USER_CLAIMS`` authenticate as a ``StoreTokenUser`` built
+    from the claims alone, so a staff flag or username change only reaches
+    the API when the access token is refreshed. Older tokens without claims,
+    or every token when ``JWT_STATELESS_USERS`` is off, load the user through
+    ``get_cached_user``.
+    """
+
+    def is_stateless(self, validated_token) -> bool:
+        """Whether the user can be built from ``validated_token`` alone."""
+        return settings.JWT_STATELESS_USERS and all(
+            claim in validated_token for claim in USER_CLAIMS
+        )
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed(
+                'Token contained no recognizable user identification',
+                code='token_not_valid',
+            )
+        if self.is_stateless(validated_token):
+            return StoreTokenUser(validated_token)
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+async def aauthenticate(request):
+    """``StoreJWTAuthentication.authenticate`` for async Django views.
+
+    Returns ``(user, token)`` or ``None`` without an ``Authorization`` header
+    and raises like the sync version on a bad token. Only users that aren't
+    built from the token claims cost a thread hop.
+    """
+    authentication = StoreJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    token = authentication.get_validated_token(raw_token)
+    if authentication.is_stateless(token):
+        return authentication.get_user(token), token
+    return await sync_to_async(authentication.get_user)(token), token
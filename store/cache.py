@@ -0,0 +1,272 @@
+import hashlib
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .routers import read_from_primary
+
+CART_VERSION_KEY = 'store:cart:version:{user_id}'
+CART_SNAPSHOT_KEY = 'store:cart:snapshot:{user_id}'
+CATALOG_GENERATION_KEY = 'store:catalog:generation'
+CATALOG_RESPONSE_KEY = 'store:catalog:response:{generation}:{digest}'
+CATALOG_STOCK_KEY = 'store:catalog:stock:{product_id}'
+
+
+def _new_version() -> int:
+    # Versions are time based so that a version key evicted from the cache
+    # never comes back with a value an older snapshot was tagged with.
+    return time.time_ns()
+
+
+def get_cart_snapshot(user_id):
+    """Return ``(version, data)`` for the user's cart.
+
+    ``data`` is the cached serialized cart, or ``None`` when the snapshot is
+    missing or was taken at an older cart version. ``version`` must be read
+    before the database so a concurrent write can't be cached as current.
+    """
+    version_key = CART_VERSION_KEY.format(user_id=user_id)
+    snapshot_key = CART_SNAPSHOT_KEY.format(user_id=user_id)
+    found = cache.get_many([version_key, snapshot_key])
+    version = found.get(version_key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(version_key, version, timeout=None):
+            version = cache.get(version_key, version)
+        return version, None
+    snapshot = found.get(snapshot_key)
+    if snapshot is not None and snapshot[0] == version:
+        return version, snapshot[1]
+    return version, None
+
+
+def set_cart_snapshot(user_id, version, data) -> None:
+    cache.set(
+        CART_SNAPSHOT_KEY.format(user_id=user_id),
+        (version, data),
+        timeout=settings.CART_CACHE_TIMEOUT,
+    )
+
+
+def bump_cart_versions(user_ids) -> None:
+    """Invalidate cached carts once the current transaction commits."""
+    keys = [CART_VERSION_KEY.format(user_id=user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_catalog_generation() -> int:
+    generation = cache.get(CATALOG_GENERATION_KEY)
+    if generation is None:
+        generation = _new_version()
+        if not cache.add(CATALOG_GENERATION_KEY, generation, timeout=None):
+            generation = cache.get(CATALOG_GENERATION_KEY, generation)
+    return generation
+
+
+async def aget_catalog_generation() -> int:
+    generation = await cache.aget(CATALOG_GENERATION_KEY)
+    if generation is None:
+        generation = _new_version()
+        if not await cache.aadd(CATALOG_GENERATION_KEY, generation, timeout=None):
+            generation = await cache.aget(CATALOG_GENERATION_KEY, generation)
+    return generation
+
+
+def bump_catalog_generation() -> None:
+    """Invalidate every cached catalog response once the transaction commits."""
+    transaction.on_commit(lambda: cache.delete(CATALOG_GENERATION_KEY))
+
+
+def bump_catalog_stock(product_ids) -> None:
+    """Expire the cached catalog responses showing the stock of
+    ``product_ids`` once the transaction commits."""
+    keys = _stock_keys(product_ids)
+    if keys:
+        transaction.on_commit(
+            lambda: cache.set_many(dict.fromkeys(keys, _new_version()), timeout=None)
+        )
+
+
+def _stock_keys(product_ids):
+    return [CATALOG_STOCK_KEY.format(product_id=product_id) for product_id in set(product_ids)]
+
+
+def _stock_product_ids(data):
+    """Ids of the products whose stock ``data`` shows; ``None`` if one has no id."""
+    rows = data.get('results', [data]) if isinstance(data, dict) else data
+    product_ids = []
+    for row in rows:
+        if isinstance(row, dict) and 'stock' in row:
+            if 'id' not in row:
+                return None
+            product_ids.append(row['id'])
+    return product_ids
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    content: bytes
+    content_type: str
+    etag: str
+    last_modified: int
+    # ((stock key, version), ...) the body was rendered at.
+    stock_versions: tuple = ()
+
+
+def catalog_cache_key(request, generation) -> str:
+    digest = hashlib.sha256(request.get_full_path().encode()).hexdigest()
+    return CATALOG_RESPONSE_KEY.format(generation=generation, digest=digest)
+
+
+def _catalog_entry(content, content_type, generation, stock_versions, added, started):
+    # Generations and stock versions are taken from the clock when they are
+    # created, so they date the body as a whole: unlike the rows on a page,
+    # they also move when a product leaves. A stock version newer than the
+    # start of the build was set by a checkout that may have committed after
+    # the stock was read; keys added here were unset, so nothing has changed
+    # them yet and a later checkout will overwrite them.
+    entry = CatalogEntry(
+        content=content,
+        content_type=content_type,
+        etag='"%s"' % hashlib.sha1(content).hexdigest(),
+        last_modified=max([generation, *stock_versions.values()]) // 10**9,
+        stock_versions=tuple(stock_versions.items()),
+    )
+    cacheable = all(
+        version < started for key, version in stock_versions.items() if key not in added
+    )
+    return entry, cacheable
+
+
+def catalog_entry(content, content_type, data, generation, started):
+    """``(entry, cacheable)`` for a catalog body whose build began at ``started``."""
+    product_ids = _stock_product_ids(data)
+    keys = _stock_keys(product_ids or ())
+    stock_versions = cache.get_many(keys)
+    added = set()
+    for key in keys:
+        if key not in stock_versions:
+            version = _new_version()
+            if cache.add(key, version, timeout=None):
+                added.add(key)
+            else:
+                version = cache.get(key, version)
+            stock_versions[key] = version
+    entry, cacheable = _catalog_entry(
+        content, content_type, generation, stock_versions, added, started
+    )
+    return entry, cacheable and product_ids is not None
+
+
+async def acatalog_entry(content, content_type, data, generation, started):
+    product_ids = _stock_product_ids(data)
+    keys = _stock_keys(product_ids or ())
+    stock_versions = await cache.aget_many(keys)
+    added = set()
+    for key in keys:
+        if key not in stock_versions:
+            version = _new_version()
+            if await cache.aadd(key, version, timeout=None):
+                added.add(key)
+            else:
+                version = await cache.aget(key, version)
+            stock_versions[key] = version
+    entry, cacheable = _catalog_entry(
+        content, content_type, generation, stock_versions, added, started
+    )
+    return entry, cacheable and product_ids is not None
+
+
+def catalog_entry_is_current(entry) -> bool:
+    """Whether the stock shown by a cached ``entry`` is unchanged."""
+    if not entry.stock_versions:
+        return True
+    found = cache.get_many([key for key, _ in entry.stock_versions])
+    return all(found.get(key) == version for key, version in entry.stock_versions)
+
+
+async def acatalog_entry_is_current(entry) -> bool:
+    if not entry.stock_versions:
+        return True
+    found = await cache.aget_many([key for key, _ in entry.stock_versions])
+    return all(found.get(key) == version for key, version in entry.stock_versions)
+
+
+def conditional_catalog_response(request, entry, response):
+    response['ETag'] = entry.etag
+    response['Last-Modified'] = http_date(entry.last_modified)
+    patch_cache_control(response, public=True, no_cache=True)
+    return get_conditional_response(
+        request,
+        etag=entry.etag,
+        last_modified=entry.last_modified,
+        response=response,
+    )
+
+
+class CatalogCacheMixin:
+    """Cache rendered ``list``/``retrieve`` responses of a public catalog view.
+
+    Entries are keyed by the catalog generation, which is dropped whenever a
+    product changes, so no TTL has to be guessed. Checkouts only renew the
+    stock versions of the products bought (``bump_catalog_stock``), which
+    expires just the entries showing their stock. Responses carry a strong
+    ``ETag`` (a digest of the body) and a ``Last-Modified`` taken from those
+    versions, and conditional requests get a 304.
+
+    Delta-sync pages (``?updated_since=``) are never cached: what they hold
+    depends on the clock (``SYNC_SETTLE_SECONDS``) and on stock changes that
+    don't renew the generation.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_catalog_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_catalog_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_catalog_response(self, handler, request, *args, **kwargs):
+        self.catalog_cache_key = None
+        if (
+            request.accepted_renderer.format == 'json'
+            and 'updated_since' not in request.query_params
+        ):
+            self.catalog_generation = get_catalog_generation()
+            key = catalog_cache_key(request, self.catalog_generation)
+            entry = cache.get(key)
+            if entry is not None and catalog_entry_is_current(entry):
+                response = HttpResponse(entry.content, content_type=entry.content_type)
+                return self.conditional_catalog_response(request, entry, response)
+            self.catalog_cache_key = key
+            self.catalog_build_started = time.time_ns()
+            # A lagging replica would be cached for every reader.
+            read_from_primary()
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'catalog_cache_key', None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            entry, cacheable = catalog_entry(
+                response.content,
+                response['Content-Type'],
+                response.data,
+                self.catalog_generation,
+                self.catalog_build_started,
+            )
+            if cacheable:
+                cache.set(key, entry, timeout=settings.CATALOG_CACHE_TIMEOUT)
+            response = self.conditional_catalog_response(request, entry, response)
+        return response
+
+    def conditional_catalog_response(self, request, entry, response):
+        return conditional_catalog_response(request, entry, response)
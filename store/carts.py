@@ -0,0 +1,163 @@
+"""Adding products to a cart in a fixed number of queries.
+
+``add_to_cart`` merges quantities into existing lines instead of tripping
+the ``(cart, product)`` unique constraint: it reads the products concerned
+with one query, adds every line with a single ``INSERT ... ON CONFLICT DO
+UPDATE SET quantity = quantity + excluded.quantity`` (so concurrent adds of
+the same product both count), then re-reads the lines and checks stock for
+the merged quantities, rolling back if any is short.
+
+Anonymous visitors keep their cart on the client as a signed token holding
+``[product_id, quantity]`` pairs (``dump_guest_cart``/``load_guest_cart``),
+so browsing writes nothing. ``merge_guest_cart`` folds it into the user's
+cart at login with the same single upsert.
+"""
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections, router, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .cache import bump_cart_versions
+from .models import Cart, CartItem, Product
+
+GUEST_CART_SALT = 'store.carts.guest'
+
+
+def active_products(product_ids):
+    """``{id: product}`` for the active products among ``product_ids``."""
+    return (
+        Product.objects.filter(pk__in=product_ids, is_active=True)
+        .prefetch_related('stock_shards')
+        .in_bulk()
+    )
+
+
+def check_cart_lines(products, totals):
+    """Raise ``ValidationError`` unless every product in ``totals`` is in
+    ``products`` (see ``active_products``) with enough stock for its total."""
+    missing = sorted(set(totals) - set(products))
+    if missing:
+        raise ValidationError(
+            {
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    f'Unknown or inactive product {product_id}.' for product_id in missing
+                ]
+            }
+        )
+    short = [
+        f'Insufficient stock for {products[product_id].name}.'
+        for product_id, total in totals.items()
+        if total > products[product_id].available_stock
+    ]
+    if short:
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: short})
+
+
+def _upsert_lines(cart, totals):
+    CartItem.objects.bulk_create(
+        [
+            CartItem(cart=cart, product_id=product_id, quantity=total)
+            for product_id, total in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+    # bulk_create sends no post_save, so the cart snapshot is dropped here.
+    bump_cart_versions([cart.user_id])
+
+
+def _increment_lines(cart, quantities):
+    using = router.db_for_write(CartItem)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = [
+        CartItem._meta.get_field(name).column
+        for name in ('cart', 'product', 'quantity', 'added_at')
+    ]
+    quantity = quote(columns[2])
+    sql = (
+        f'INSERT INTO {quote(CartItem._meta.db_table)} ({", ".join(map(quote, columns))}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({", ".join(map(quote, columns[:2]))}) DO UPDATE SET '
+        f'{quantity} = {quote(CartItem._meta.db_table)}.{quantity} + excluded.{quantity}'
+    )
+    added_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            sql,
+            [
+                (cart.pk, product_id, quantity, added_at)
+                for product_id, quantity in quantities.items()
+            ],
+        )
+
+
+@transaction.atomic
+def add_to_cart(cart, quantities):
+    """Add ``quantities`` (``{product_id: quantity}``) to ``cart``.
+
+    Returns ``{product_id: new quantity}``. Raises ``ValidationError`` and
+    changes nothing if a product is unknown, inactive or short of stock.
+    """
+    products = active_products(quantities)
+    # Unknown products must not reach the INSERT.
+    check_cart_lines(products, quantities)
+    _increment_lines(cart, quantities)
+    totals = dict(
+        cart.items.filter(product_id__in=quantities).values_list('product_id', 'quantity')
+    )
+    check_cart_lines(products, totals)
+    # The INSERT sends no post_save, so the cart snapshot is dropped here.
+    bump_cart_versions([cart.user_id])
+    return totals
+
+
+def dump_guest_cart(quantities):
+    """Sign ``{product_id: quantity}`` into a compact guest cart token."""
+    return signing.dumps(sorted(quantities.items()), salt=GUEST_CART_SALT, compress=True)
+
+
+def load_guest_cart(token):
+    """The ``{product_id: quantity}`` held by a guest cart token.
+
+    An expired token is an empty cart; a forged or corrupted one raises
+    ``signing.BadSignature``.
+    """
+    try:
+        lines = signing.loads(token, salt=GUEST_CART_SALT, max_age=settings.GUEST_CART_MAX_AGE)
+    except signing.SignatureExpired:
+        return {}
+    return {product_id: quantity for product_id, quantity in lines}
+
+
+@transaction.atomic
+def merge_guest_cart(user_id, quantities):
+    """Merge a guest cart into ``user_id``'s cart; return the number of lines changed.
+
+    Each line ends up with the larger of its cart and guest quantities
+    rather than their sum, so merging the same token twice (a retried
+    login) changes nothing the second time. Unlike ``add_to_cart`` this
+    never fails: products deactivated since they were added are dropped and
+    quantities are capped at the available stock, so logging in always
+    succeeds. The cart row is created here if needed.
+    """
+    products = active_products(quantities)
+    if not products:
+        return 0
+    cart, _ = Cart.objects.get_or_create(user_id=user_id)
+    current = dict(
+        cart.items.filter(product_id__in=products).values_list('product_id', 'quantity')
+    )
+    totals = {}
+    for product_id, product in products.items():
+        existing = current.get(product_id, 0)
+        total = min(quantities[product_id], product.available_stock)
+        if total > existing:
+            totals[product_id] = total
+    if totals:
+        _upsert_lines(cart, totals)
+    return len(totals)
@@ -0,0 +1,121 @@
+"""Streaming NDJSON/CSV exports of products and orders.
+
+Rows are read with ``.values().iterator()`` and serialized chunk by chunk
+through ``store.fastpath``, so an export holds one chunk in memory however
+many rows it covers, and each chunk costs one query per related table.
+"""
+
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from .fastpath import order_rows, product_rows, serialize_orders, serialize_products
+
+OUTPUTS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+PRODUCT_COLUMNS = (
+    'id', 'name', 'description', 'price', 'stock', 'image_url', 'is_active',
+    'created_at', 'updated_at',
+)
+ORDER_COLUMNS = ('id', 'username', 'status', 'total_amount', 'placed_at', 'updated_at')
+ORDER_ITEM_COLUMNS = (
+    'item_id', 'product_id', 'product_name', 'quantity', 'prepared_quantity',
+    'unit_price', 'subtotal',
+)
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _serialized(rows, serialize, using):
+    size = settings.EXPORT_CHUNK_SIZE
+    for chunk in _chunks(rows.iterator(chunk_size=size), size):
+        yield from serialize(chunk, using=using)
+
+
+def _ndjson(records):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+def _product_lines(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(PRODUCT_COLUMNS)
+    for product in records:
+        yield writer.writerow([product[column] for column in PRODUCT_COLUMNS])
+
+
+def _order_lines(records):
+    # One line per order item; an order without items gets one line with
+    # empty item columns.
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_COLUMNS + ORDER_ITEM_COLUMNS)
+    for order in records:
+        head = [
+            order['id'], order['user']['username'], order['status'],
+            order['total_amount'], order['placed_at'], order['updated_at'],
+        ]
+        if not order['items']:
+            yield writer.writerow(head + [''] * len(ORDER_ITEM_COLUMNS))
+        for item in order['items']:
+            yield writer.writerow(
+                head
+                + [
+                    item['id'], item['product']['id'], item['product']['name'],
+                    item['quantity'], item['prepared_quantity'], item['unit_price'],
+                    item['subtotal'],
+                ]
+            )
+
+
+def _response(lines, output, name):
+    response = StreamingHttpResponse(lines, content_type=OUTPUTS[output])
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{name}-{stamp}.{output}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def export_output(request):
+    # Not ``?format=``: DRF reserves it for renderer selection.
+    output = request.query_params.get('output', 'ndjson')
+    if output not in OUTPUTS:
+        raise ValidationError({'output': f"Choose one of: {', '.join(OUTPUTS)}."})
+    return output
+
+
+def export_products(queryset, output):
+    """Stream ``queryset`` (ordered by id) as NDJSON or CSV."""
+    # Pin the database now: the body is read after the view has returned.
+    using = queryset.db
+    rows = product_rows(queryset.using(using).order_by('id'))
+    records = _serialized(rows, serialize_products, using)
+    lines = _ndjson(records) if output == 'ndjson' else _product_lines(records)
+    return _response(lines, output, 'products')
+
+
+def export_orders(queryset, output):
+    """Stream ``queryset`` (ordered by id) with its items as NDJSON or CSV."""
+    using = queryset.db
+    rows = order_rows(queryset.using(using).order_by('id'))
+    records = _serialized(rows, serialize_orders, using)
+    lines = _ndjson(records) if output == 'ndjson' else _order_lines(records)
+    return _response(lines, output, 'orders')
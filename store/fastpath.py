@@ -0,0 +1,325 @@
+"""Serialize read-only list pages straight from ``.values()`` rows.
+
+``serialize_products`` and ``serialize_orders`` produce exactly what
+``ProductSerializer`` and ``OrderSerializer`` render (same keys, order and
+formatting) without building model instances or DRF field objects per row.
+Decimal columns are already quantized by the database converters, so they are
+formatted as they come. With a sparse fieldset (see ``store.fieldsets``) only
+the selected columns are read and only the selected keys rendered.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from .fieldsets import AS_ID, ORDER_COLUMNS, ORDER_ITEM_COLUMNS, PRODUCT_COLUMNS, columns
+from .models import OrderHistoryItem, ProductStockShard
+
+PRODUCT_FIELDS = (
+    'id',
+    'name',
+    'description',
+    'price',
+    'stock',
+    'image_url',
+    'is_active',
+    'created_at',
+    'updated_at',
+    'stock_shard_count',
+)
+ORDER_FIELDS = ('id', 'user_id', 'status', 'total_amount', 'placed_at', 'updated_at')
+
+
+def _datetime_formatter():
+    if api_settings.DATETIME_FORMAT is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return serializers.DateTimeField().to_representation
+    field_timezone = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if not value:
+            return None
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            return value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+def _decimal(value):
+    if api_settings.COERCE_DECIMAL_TO_STRING:
+        return f'{value:f}'
+    return value
+
+
+def _shard_stock_rows(product_ids, using):
+    return (
+        ProductStockShard.objects.using(using)
+        .filter(product_id__in=product_ids)
+        .values('product_id')
+        .annotate(total=Sum('quantity'), changed_at=Max('updated_at'))
+        .values_list('product_id', 'total', 'changed_at')
+    )
+
+
+def _shard_stock(product_ids, using):
+    """``{product_id: (stock, last shard change)}`` of sharded products."""
+    if not product_ids:
+        return {}
+    return {product_id: rest for product_id, *rest in _shard_stock_rows(product_ids, using)}
+
+
+async def _ashard_stock(product_ids, using):
+    if not product_ids:
+        return {}
+    return {
+        product_id: rest async for product_id, *rest in _shard_stock_rows(product_ids, using)
+    }
+
+
+def _stock(row, shard_stock, prefix=''):
+    if row[f'{prefix}stock_shard_count']:
+        return shard_stock.get(row[f'{prefix}id'], (0, None))[0]
+    return row[f'{prefix}stock']
+
+
+def _updated_at(row, shard_stock, prefix=''):
+    """``Product.last_changed_at`` of ``row``."""
+    updated_at = row[f'{prefix}updated_at']
+    if row[f'{prefix}stock_shard_count']:
+        shards_updated_at = shard_stock.get(row[f'{prefix}id'], (0, None))[1]
+        if shards_updated_at is not None:
+            return max(updated_at, shards_updated_at)
+    return updated_at
+
+
+def _product(row, shard_stock, format_datetime, prefix=''):
+    return {
+        'id': row[f'{prefix}id'],
+        'name': row[f'{prefix}name'],
+        'description': row[f'{prefix}description'],
+        'price': _decimal(row[f'{prefix}price']),
+        'stock': _stock(row, shard_stock, prefix),
+        'image_url': row[f'{prefix}image_url'],
+        'is_active': row[f'{prefix}is_active'],
+        'created_at': format_datetime(row[f'{prefix}created_at']),
+        'updated_at': format_datetime(_updated_at(row, shard_stock, prefix)),
+    }
+
+
+def _column(name, convert=None):
+    if convert is None:
+        return lambda row: row[name]
+    return lambda row: convert(row[name])
+
+
+def _sparse_product(selection, shard_stock, format_datetime, prefix=''):
+    """A ``_product`` rendering only the fields in ``selection``."""
+    getters = {
+        'id': _column(f'{prefix}id'),
+        'name': _column(f'{prefix}name'),
+        'description': _column(f'{prefix}description'),
+        'price': _column(f'{prefix}price', _decimal),
+        'stock': lambda row: _stock(row, shard_stock, prefix),
+        'image_url': _column(f'{prefix}image_url'),
+        'is_active': _column(f'{prefix}is_active'),
+        'created_at': _column(f'{prefix}created_at', format_datetime),
+        'updated_at': lambda row: format_datetime(_updated_at(row, shard_stock, prefix)),
+    }
+    selected = [(name, getters[name]) for name in selection]
+    return lambda row: {name: get(row) for name, get in selected}
+
+
+def product_rows(queryset, *extra, fieldset=None):
+    fields = PRODUCT_FIELDS if fieldset is None else columns(fieldset, PRODUCT_COLUMNS)
+    return queryset.prefetch_related(None).values(*dict.fromkeys((*fields, *extra)))
+
+
+def _product_records(rows, shard_stock):
+    format_datetime = _datetime_formatter()
+    return [_product(row, shard_stock, format_datetime) for row in rows]
+
+
+def _sharded_products(rows):
+    return [row['id'] for row in rows if row.get('stock_shard_count')]
+
+
+def serialize_products(rows, using=None, fieldset=None):
+    rows = list(rows)
+    shard_stock = _shard_stock(_sharded_products(rows), using)
+    if fieldset is None:
+        return _product_records(rows, shard_stock)
+    render = _sparse_product(fieldset, shard_stock, _datetime_formatter())
+    return [render(row) for row in rows]
+
+
+async def aserialize_products(rows, using=None):
+    """``serialize_products`` for async views; ``rows`` is an evaluated page."""
+    rows = list(rows)
+    return _product_records(rows, await _ashard_stock(_sharded_products(rows), using))
+
+
+def order_rows(queryset, *extra, fieldset=None):
+    if fieldset is None:
+        fields, user = ORDER_FIELDS, True
+    else:
+        fields, user = columns(fieldset, ORDER_COLUMNS), 'user' in fieldset
+    named = {'username': F('user__username')} if user else {}
+    return queryset.prefetch_related(None).values(*dict.fromkeys((*fields, *extra)), **named)
+
+
+def _item_columns(selection):
+    if selection is None:
+        product = PRODUCT_FIELDS
+        fields = ('id', 'quantity', 'prepared_quantity', 'unit_price')
+    else:
+        product = selection.get('product')
+        product = columns(product, PRODUCT_COLUMNS) if isinstance(product, dict) else ()
+        fields = columns(selection, ORDER_ITEM_COLUMNS)
+    return dict.fromkeys(('order_id', *fields, *(f'product__{field}' for field in product)))
+
+
+def _order_items(rows, using, selection=None):
+    """Lines of the orders in ``rows``, live or archived.
+
+    ``selection`` is that of an order's ``items``.
+    """
+    return (
+        OrderHistoryItem.objects.using(using)
+        .filter(order_id__in=[row['id'] for row in rows])
+        .order_by('id')
+        .values(*_item_columns(selection))
+    )
+
+
+def _group_items(items):
+    items_by_order = defaultdict(list)
+    for item in items:
+        items_by_order[item['order_id']].append(item)
+    return items_by_order
+
+
+def _sharded_items(items_by_order):
+    return {
+        item['product__id']
+        for order_items in items_by_order.values()
+        for item in order_items
+        if item.get('product__stock_shard_count')
+    }
+
+
+def _order_records(rows, items_by_order, shard_stock):
+    format_datetime = _datetime_formatter()
+    return [
+        {
+            'id': row['id'],
+            'user': {'id': row['user_id'], 'username': row['username']},
+            'status': row['status'],
+            'total_amount': _decimal(row['total_amount']),
+            'placed_at': format_datetime(row['placed_at']),
+            'updated_at': format_datetime(row['updated_at']),
+            'items': [
+                {
+                    'id': item['id'],
+                    'product': _product(item, shard_stock, format_datetime, 'product__'),
+                    'quantity': item['quantity'],
+                    'prepared_quantity': item['prepared_quantity'],
+                    'unit_price': _decimal(item['unit_price']),
+                    # A Decimal, like OrderItemSerializer.get_subtotal; two
+                    # decimal places already, so no quantize.
+                    'subtotal': item['quantity'] * item['unit_price'],
+                }
+                for item in items_by_order[row['id']]
+            ],
+        }
+        for row in rows
+    ]
+
+
+def _sparse_order_records(rows, selection, items_by_order, shard_stock):
+    format_datetime = _datetime_formatter()
+    getters = {
+        'id': _column('id'),
+        'user': lambda row: {'id': row['user_id'], 'username': row['username']},
+        'status': _column('status'),
+        'total_amount': _column('total_amount', _decimal),
+        'placed_at': _column('placed_at', format_datetime),
+        'updated_at': _column('updated_at', format_datetime),
+    }
+    item_selection = selection.get('items')
+    if item_selection is not None:
+        product = item_selection.get('product')
+        item_getters = {
+            'id': _column('id'),
+            'product': (
+                _column('product_id')
+                if product is AS_ID
+                else _sparse_product(product or {}, shard_stock, format_datetime, 'product__')
+            ),
+            'quantity': _column('quantity'),
+            'prepared_quantity': _column('prepared_quantity'),
+            'unit_price': _column('unit_price', _decimal),
+            'subtotal': lambda item: item['quantity'] * item['unit_price'],
+        }
+        item_selected = [(name, item_getters[name]) for name in item_selection]
+        getters['items'] = lambda row: [
+            {name: get(item) for name, get in item_selected} for item in items_by_order[row['id']]
+        ]
+    selected = [(name, getters[name]) for name in selection]
+    return [{name: get(row) for name, get in selected} for row in rows]
+
+
+def serialize_orders(rows, using=None, fieldset=None):
+    rows = list(rows)
+    if fieldset is None:
+        items_by_order = _group_items(_order_items(rows, using))
+        shard_stock = _shard_stock(_sharded_items(items_by_order), using)
+        return _order_records(rows, items_by_order, shard_stock)
+    items_by_order = {}
+    if 'items' in fieldset:
+        items_by_order = _group_items(_order_items(rows, using, fieldset['items']))
+    shard_stock = _shard_stock(_sharded_items(items_by_order), using)
+    return _sparse_order_records(rows, fieldset, items_by_order, shard_stock)
+
+
+async def aserialize_orders(rows, using=None):
+    """``serialize_orders`` for async views; ``rows`` is an evaluated page."""
+    rows = list(rows)
+    items_by_order = _group_items([item async for item in _order_items(rows, using)])
+    shard_stock = await _ashard_stock(_sharded_items(items_by_order), using)
+    return _order_records(rows, items_by_order, shard_stock)
+
+
+class FastListMixin:
+    """Serve ``list`` pages through ``fast_list_rows``/``fast_list_serialize``.
+
+    Both are static methods such as ``product_rows``/``serialize_products``;
+    related rows are read from the database the page came from.
+    Falls back to the regular serializer when ``FAST_LIST_SERIALIZATION`` is
+    off or the response isn't JSON (the browsable API renders forms from the
+    serializer). A ``fieldset`` (see ``SparseFieldsetMixin``) is passed on.
+    """
+
+    fast_list_rows = None
+    fast_list_serialize = None
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_LIST_SERIALIZATION or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        # Cursor pagination reads its position from the first ordering field.
+        ordering = [field.lstrip('-') for field in getattr(self, 'cursor_ordering', ())]
+        fieldset = getattr(self, 'fieldset', None)
+        rows = self.fast_list_rows(queryset, *ordering, fieldset=fieldset)
+        using = rows.db
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.fast_list_serialize(rows, using=using, fieldset=fieldset))
+        return self.get_paginated_response(
+            self.fast_list_serialize(page, using=using, fieldset=fieldset)
+        )
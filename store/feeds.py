@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Order
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(updated_at, pk) -> str:
+    return f'{(updated_at - EPOCH) // timedelta(microseconds=1)}-{pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        micros, pk = cursor.split('-')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError):
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}.')
+
+
+def initial_cursor() -> str:
+    """Cursor for a client that starts following the feed now."""
+    settled = timezone.now() - timedelta(seconds=settings.ORDER_FEED_SETTLE_SECONDS)
+    return encode_cursor(settled, 0)
+
+
+def order_changes_queryset(cursor):
+    """Orders changed after ``cursor``, oldest change first.
+
+    Rows younger than ``ORDER_FEED_SETTLE_SECONDS`` are held back to the next
+    poll: ``updated_at`` is stamped before commit, so a slower transaction can
+    still land with a timestamp just behind one already handed out.
+    """
+    updated_at, pk = decode_cursor(cursor)
+    settled = timezone.now() - timedelta(seconds=settings.ORDER_FEED_SETTLE_SECONDS)
+    queryset = Order.objects.filter(
+        Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk),
+        updated_at__lte=settled,
+    )
+    return queryset.order_by('updated_at', 'id').values(
+        'id', 'status', 'total_amount', 'placed_at', 'updated_at',
+        username=F('user__username'),
+    )[: settings.ORDER_FEED_BATCH_SIZE]
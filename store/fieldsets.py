@@ -0,0 +1,222 @@
+"""Sparse fieldsets: ``?fields=`` and ``?expand=`` on product and order reads.
+
+``?fields=id,name,price`` renders only the listed fields. Nested fields are
+named with dots (``?fields=id,status,items.quantity,items.product.name``)
+and naming an object (``items``) keeps all of its fields. Once either
+parameter is given, the relations in a view's ``expandable_fields`` (an
+order line's ``product``) are rendered as their id unless ``?expand=``
+names them or one of their fields is selected. Without the parameters
+responses are unchanged.
+
+``parse_fieldset`` turns the parameters into a selection: a dict of the
+selected field names, in serializer order, mapped to ``None`` for a value,
+to the nested selection for an object, or to ``AS_ID`` for a relation left
+unexpanded. ``SparseFieldsetMixin`` hands it to the serializers through the
+context and to the fast path; ``sparse_products``/``sparse_orders`` load
+only the matching columns.
+"""
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+AS_ID = object()
+# Product fields read from the stock shards of a sharded product.
+SHARD_FIELDS = {'stock', 'updated_at'}
+
+# Columns each rendered field is read from.
+PRODUCT_COLUMNS = {
+    'id': ('id',),
+    'name': ('name',),
+    'description': ('description',),
+    'price': ('price',),
+    'stock': ('stock', 'stock_shard_count'),
+    'image_url': ('image_url',),
+    'is_active': ('is_active',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at', 'stock_shard_count'),
+}
+ORDER_COLUMNS = {
+    'id': ('id',),
+    'user': ('user_id',),
+    'status': ('status',),
+    'total_amount': ('total_amount',),
+    'placed_at': ('placed_at',),
+    'updated_at': ('updated_at',),
+    'items': (),
+}
+ORDER_ITEM_COLUMNS = {
+    'id': ('id',),
+    'product': ('product_id',),
+    'quantity': ('quantity',),
+    'prepared_quantity': ('prepared_quantity',),
+    'unit_price': ('unit_price',),
+    'subtotal': ('quantity', 'unit_price'),
+}
+
+
+def columns(selection, column_map, prefix=''):
+    """The columns behind the fields in ``selection``, ``id`` first."""
+    names = ['id'] + [column for name in selection for column in column_map[name]]
+    return [f'{prefix}{name}' for name in dict.fromkeys(names)]
+
+
+def field_tree(serializer):
+    """``{name: None or nested tree}`` of the fields ``serializer`` renders."""
+    tree = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            field = field.child
+        tree[name] = field_tree(field) if isinstance(field, serializers.BaseSerializer) else None
+    return tree
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def _requested(paths, tree):
+    """``{name: None (everything) or nested request}`` for the dotted ``paths``."""
+    requested = {}
+    for path in paths:
+        node, level = requested, tree
+        names = path.split('.')
+        for depth, name in enumerate(names, 1):
+            if not isinstance(level, dict) or name not in level:
+                raise ValidationError({'fields': [f'Unknown field "{path}".']})
+            level = level[name]
+            if depth == len(names):
+                node[name] = None
+            elif name in node and node[name] is None:
+                break
+            else:
+                node = node.setdefault(name, {})
+    return requested
+
+
+def _resolve(tree, requested, expand, expandable, prefix=''):
+    selection = {}
+    for name, subtree in tree.items():
+        if requested is not None and name not in requested:
+            continue
+        if subtree is None:
+            selection[name] = None
+            continue
+        path = f'{prefix}{name}'
+        children = None if requested is None else requested[name]
+        if children is None and path in expandable and path not in expand:
+            selection[name] = AS_ID
+        else:
+            selection[name] = _resolve(subtree, children, expand, expandable, f'{path}.')
+    return selection
+
+
+def parse_fieldset(query_params, serializer, expandable=()):
+    """The selection asked for by ``?fields=``/``?expand=``; ``None`` without them."""
+    if 'fields' not in query_params and 'expand' not in query_params:
+        return None
+    expand = set(_split(query_params.get('expand', '')))
+    unknown = sorted(expand - set(expandable))
+    if unknown:
+        raise ValidationError({'expand': [f'Cannot expand "{path}".' for path in unknown]})
+    tree = field_tree(serializer)
+    requested = None
+    if 'fields' in query_params:
+        requested = _requested(_split(query_params['fields']), tree)
+        if not requested:
+            raise ValidationError({'fields': ['Select at least one field.']})
+    return _resolve(tree, requested, expand, expandable)
+
+
+class SparseFieldsMixin:
+    """Serializer mixin rendering only the fields selected by ``context['fieldset']``."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.context.get('fieldset')
+        if selection is None:
+            return fields
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        for name in reversed(names):
+            selection = selection[name]
+        return {
+            name: (
+                serializers.PrimaryKeyRelatedField(read_only=True)
+                if selection[name] is AS_ID
+                else fields[name]
+            )
+            for name in selection
+        }
+
+
+class SparseFieldsetMixin:
+    """``?fields=``/``?expand=`` on the ``list`` and ``retrieve`` actions of a viewset.
+
+    ``get_queryset`` should pass its queryset through ``sparse_queryset``.
+    """
+
+    expandable_fields = ()
+    # Columns the view itself reads (cursor ordering, tombstones).
+    sparse_required_columns = ()
+    sparse_loader = None
+
+    @property
+    def fieldset(self):
+        if self.action not in ('list', 'retrieve'):
+            return None
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = parse_fieldset(
+                self.request.query_params, self.get_serializer_class()(), self.expandable_fields
+            )
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.fieldset
+        return context
+
+    def sparse_queryset(self, queryset):
+        if self.fieldset is None:
+            return queryset
+        return self.sparse_loader(queryset, self.fieldset, *self.sparse_required_columns)
+
+
+def sparse_products(queryset, selection, *required):
+    """``queryset`` loading only the product columns ``selection`` renders."""
+    queryset = queryset.only(*columns(selection, PRODUCT_COLUMNS), *required)
+    if not SHARD_FIELDS & set(selection):
+        queryset = queryset.prefetch_related(None)
+    return queryset
+
+
+def sparse_orders(queryset, selection, *required):
+    """``queryset`` loading only the order, line and product columns ``selection`` renders."""
+    only = [*columns(selection, ORDER_COLUMNS), *required]
+    if 'user' in selection:
+        only.append('user__username')
+    else:
+        queryset = queryset.select_related(None)
+    queryset = queryset.prefetch_related(None)
+    item_selection = selection.get('items')
+    if isinstance(item_selection, dict):
+        # OrderItem, or OrderHistoryItem for OrderHistory.
+        item_model = queryset.model._meta.get_field('items').related_model
+        items = item_model.objects.only('order_id', *columns(item_selection, ORDER_ITEM_COLUMNS))
+        product_selection = item_selection.get('product')
+        if isinstance(product_selection, dict):
+            items = items.select_related('product').only(
+                'order_id',
+                *columns(item_selection, ORDER_ITEM_COLUMNS),
+                *columns(product_selection, PRODUCT_COLUMNS, 'product__'),
+            )
+            if SHARD_FIELDS & set(product_selection):
+                items = items.prefetch_related('product__stock_shards')
+        queryset = queryset.prefetch_related(Prefetch('items', queryset=items))
+    return queryset.only(*only)
@@ -0,0 +1,143 @@
+"""``Idempotency-Key`` support for the endpoints a client may safely retry.
+
+A view method decorated with ``@idempotent`` that receives the header first
+claims the key for the user by inserting an ``IdempotencyKey`` row with no
+response, then runs and stores its response on that row in the same
+transaction as its own writes: a crash in between rolls both back and
+leaves a claim that a retry can take over. A request that repeats the key
+reads the row (it only writes to claim a missing key or drop a stale one):
+
+* gets the stored response back, with ``Idempotent-Replayed: true``, once
+  the first one has finished;
+* waits up to ``IDEMPOTENCY_WAIT_TIMEOUT`` seconds for it while it is still
+  running, then gets ``409 Conflict``;
+* gets ``422`` if it isn't the same request (method, path and body).
+
+Server errors aren't stored: the claim is released so a retry runs again.
+Stored responses are replayed for ``IDEMPOTENCY_KEY_TTL`` seconds; a claim
+left unfinished for ``IDEMPOTENCY_LOCK_TIMEOUT`` seconds (a crashed worker)
+can be taken over. ``prune_idempotency_keys`` deletes expired rows.
+"""
+
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+# How often a duplicate checks whether the original request has finished.
+POLL_INTERVAL = 0.05
+
+
+def request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def stale_keys(now=None):
+    """Rows that are expired or were claimed and never finished."""
+    now = now or timezone.now()
+    abandoned = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    return IdempotencyKey.objects.filter(
+        Q(expires_at__lte=now) | Q(status_code__isnull=True, created_at__lte=abandoned)
+    )
+
+
+def _is_stale(record, now):
+    """``stale_keys`` for a row already read."""
+    if record.expires_at <= now:
+        return True
+    abandoned = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    return record.status_code is None and record.created_at <= abandoned
+
+
+def _replay(record):
+    response = HttpResponse(
+        bytes(record.content), status=record.status_code, content_type='application/json'
+    )
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _claim(user_id, key, fingerprint):
+    """Claim ``key``; return ``(record, None)``, or ``(None, response)`` to answer with."""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        now = timezone.now()
+        record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+        if record is None:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user_id=user_id,
+                        key=key,
+                        request_hash=fingerprint,
+                        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                    )
+                return record, None
+            except IntegrityError:
+                # Claimed by a concurrent request in the meantime.
+                continue
+        if _is_stale(record, now):
+            # Re-checked in the DELETE in case the request just finished.
+            stale_keys(now).filter(pk=record.pk).delete()
+            continue
+        if record.request_hash != fingerprint:
+            return None, Response(
+                {'detail': f'{HEADER} was already used for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record.status_code is not None:
+            return None, _replay(record)
+        if time.monotonic() >= deadline:
+            return None, Response(
+                {'detail': f'A request with this {HEADER} is still in progress.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        time.sleep(POLL_INTERVAL)
+
+
+def idempotent(view):
+    """Make a DRF view method replay its response for a repeated ``Idempotency-Key``."""
+
+    @functools.wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(self, request, *args, **kwargs)
+        if not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response(
+                {'detail': f'{HEADER} must be 1 to 255 characters.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        record, response = _claim(request.user.id, key, request_hash(request))
+        if response is not None:
+            return response
+        try:
+            with transaction.atomic():
+                response = view(self, request, *args, **kwargs)
+                if response.status_code < 500:
+                    record.status_code = response.status_code
+                    record.content = JSONRenderer().render(response.data)
+                    record.save(update_fields=['status_code', 'content'])
+        except BaseException:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        return response
+
+    return wrapper
@@ -0,0 +1,69 @@
+"""Helpers shared by the ``bench_*`` management commands."""
+
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def benchmark_database(alias='default'):
+    """Run a benchmark against a throwaway, freshly migrated database.
+
+    SQLite gets a file-backed database rather than the in-memory test one so
+    that worker threads can share it. The development database is never
+    touched.
+    """
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    tmpdir = None
+    if connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='store-bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Summarize per-call durations (seconds) as milliseconds and calls/s."""
+    total = sum(samples)
+    return {
+        'count': len(samples),
+        'rps': len(samples) / total if total else 0.0,
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p90_ms': percentile(samples, 90) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
+
+
+def time_calls(func, iterations, before_each=None):
+    samples = []
+    for _ in range(iterations):
+        if before_each is not None:
+            before_each()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
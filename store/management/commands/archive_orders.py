@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from store.archive import archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Move shipped and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS '
+        'into the archive tables, one short transaction per batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Archive orders last updated more than this many days ago.',
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE)
+        parser.add_argument(
+            '--pause', type=float, default=0.0, help='Seconds to sleep between batches.'
+        )
+        parser.add_argument(
+            '--max-batches', type=int, help='Stop after this many batches (resume on the next run).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only count the orders that would be moved.'
+        )
+
+    def handle(self, *args, **options):
+        before = archive_cutoff(options['days'])
+        if options['dry_run']:
+            count = archivable_orders(before, options['database']).count()
+            self.stdout.write(f'{count} orders would be archived.')
+            return
+        total = 0
+        for archived in archive_orders(
+            before,
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            max_batches=options['max_batches'],
+            using=options['database'],
+        ):
+            total += archived
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Archived a batch of {archived} orders.')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} orders.'))
@@ -0,0 +1,342 @@
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+
+from store.models import Product
+from store.search import rebuild_index
+from store.serializers import StoreTokenObtainPairSerializer
+
+from ._bench import benchmark_database, percentile, summarize
+
+User = get_user_model()
+SCENARIOS = ('browse', 'cart', 'checkout', 'staff')
+DEFAULT_MIX = 'browse=70,cart=15,checkout=10,staff=5'
+# Upper bounds (ms) of the latency histogram buckets.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS or not weight.isdigit():
+            raise CommandError(
+                f'Bad --mix entry {part!r}; expected name=weight with name in {SCENARIOS}.'
+            )
+        mix[name] = int(weight)
+    if not any(mix.values()):
+        raise CommandError('--mix needs at least one positive weight.')
+    return mix
+
+
+class ASGIClient:
+    """Minimal HTTP client calling an ASGI application in-process."""
+
+    def __init__(self, app, token=None):
+        self.app = app
+        self.token = token
+
+    async def request(self, method, url, data=None):
+        parts = urlsplit(url)
+        body = json.dumps(data).encode() if data is not None else b''
+        headers = [
+            (b'host', b'localhost'),
+            (b'accept', b'application/json'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ]
+        if self.token:
+            headers.append((b'authorization', f'Bearer {self.token}'.encode()))
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': parts.path,
+            'raw_path': parts.path.encode(),
+            'query_string': parts.query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 80),
+        }
+        done = asyncio.Event()
+        request_sent = False
+        response = {'status': None, 'body': []}
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Django listens for a disconnect while the view runs; only
+            # disconnect once the response is complete.
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    done.set()
+
+        await self.app(scope, receive, send)
+        done.set()
+        content = b''.join(response['body'])
+        return response['status'], content
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.lock_timeouts = 0
+        self.exceptions = 0
+
+    async def call(self, client, label, method, url, data=None):
+        start = time.perf_counter()
+        try:
+            status, content = await client.request(method, url, data)
+        except Exception:
+            self.exceptions += 1
+            status, content = None, b''
+        self.latencies[label].append(time.perf_counter() - start)
+        self.statuses[label][status] += 1
+        if status is not None and 200 <= status < 300 and content:
+            return status, json.loads(content)
+        return status, None
+
+    def on_exception(self, sender, request=None, **kwargs):
+        # got_request_exception fires inside the handler's except block.
+        exc = sys.exc_info()[1]
+        if isinstance(exc, OperationalError) and 'locked' in str(exc):
+            self.lock_timeouts += 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test config.asgi in-process: many concurrent asyncio clients run '
+        'a weighted mix of browsing, cart, checkout/payment and staff '
+        'preparation scenarios. Reports requests/s, latency histograms and '
+        'error and lock-timeout rates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent virtual users.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run.')
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Scenario weights (default {DEFAULT_MIX}).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        random.seed(options['seed'])
+        # Importing the ASGI module runs django.setup(), which reconfigures
+        # logging, so import it before quieting the loggers.
+        from config.asgi import application
+
+        # Failures are counted below; don't print a traceback for each.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        logging.getLogger('store.timing').setLevel(logging.ERROR)
+        # Settings are already loaded, so apply config.asgi's
+        # SQLITE_CONN_MAX_AGE=0 here.
+        for connection in connections.all():
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+        with benchmark_database():
+            buyers, staff, product_ids = self._seed(options)
+            recorder = Recorder()
+            got_request_exception.connect(recorder.on_exception)
+            try:
+                started = time.perf_counter()
+                asyncio.run(self._run(application, recorder, buyers, staff, product_ids, mix, options))
+                elapsed = time.perf_counter() - started
+            finally:
+                got_request_exception.disconnect(recorder.on_exception)
+        self._report(recorder, elapsed, options)
+
+    def _seed(self, options):
+        buyers = User.objects.bulk_create(
+            [User(username=f'load{i}') for i in range(options['clients'])]
+        )
+        staff = User.objects.create_user('load-staff', is_staff=True)
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f'Product {i}',
+                    description='Load test product ' * 8,
+                    price=Decimal('9.99'),
+                    stock=1_000_000,
+                )
+                for i in range(options['products'])
+            ],
+            batch_size=1000,
+        )
+        rebuild_index()
+
+        def token(user):
+            return str(StoreTokenObtainPairSerializer.get_token(user).access_token)
+
+        return [token(user) for user in buyers], token(staff), [p.pk for p in products]
+
+    async def _run(self, app, recorder, buyers, staff, product_ids, mix, options):
+        deadline = time.perf_counter() + options['duration']
+        names, weights = zip(*mix.items())
+        scenarios = {
+            'browse': self._browse,
+            'cart': self._cart,
+            'checkout': self._checkout,
+            'staff': self._staff,
+        }
+
+        async def virtual_user(index):
+            client = ASGIClient(app, buyers[index])
+            staff_client = ASGIClient(app, staff)
+            rng = random.Random(options['seed'] + index)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                scenario_client = staff_client if name == 'staff' else client
+                await scenarios[name](scenario_client, recorder, product_ids, rng)
+
+        await asyncio.gather(*(virtual_user(index) for index in range(options['clients'])))
+
+    async def _browse(self, client, recorder, product_ids, rng):
+        await recorder.call(client, 'GET products', 'GET', '/api/products/')
+        await recorder.call(client, 'GET products?q=', 'GET', f'/api/products/?q=product+{rng.randrange(100)}')
+        await recorder.call(
+            client, 'GET product', 'GET', f'/api/products/{rng.choice(product_ids)}/'
+        )
+
+    async def _cart(self, client, recorder, product_ids, rng):
+        status, item = await recorder.call(
+            client, 'POST cart/items', 'POST', '/api/cart/items/',
+            {'product_id': rng.choice(product_ids), 'quantity': 1},
+        )
+        await recorder.call(client, 'GET cart', 'GET', '/api/cart/')
+        if item:
+            await recorder.call(
+                client, 'DELETE cart/items', 'DELETE', f"/api/cart/items/{item['id']}/"
+            )
+
+    async def _checkout(self, client, recorder, product_ids, rng):
+        for product_id in rng.sample(product_ids, 2):
+            await recorder.call(
+                client, 'POST cart/items', 'POST', '/api/cart/items/',
+                {'product_id': product_id, 'quantity': rng.randint(1, 3)},
+            )
+        status, order = await recorder.call(client, 'POST orders', 'POST', '/api/orders/', {})
+        if order:
+            await recorder.call(client, 'POST pay', 'POST', f"/api/orders/{order['id']}/pay/", {})
+
+    async def _staff(self, client, recorder, product_ids, rng):
+        status, board = await recorder.call(
+            client, 'GET board', 'GET', '/api/orders/board/?status=paid&page_size=5'
+        )
+        if not board or not board['results']:
+            return
+        order = rng.choice(board['results'])
+        items = [
+            {'id': item['id'], 'prepared_quantity': item['quantity']} for item in order['items']
+        ]
+        status, _ = await recorder.call(
+            client, 'POST prepare', 'POST', f"/api/orders/{order['id']}/prepare/", {'items': items}
+        )
+        if status == 200:
+            await recorder.call(
+                client, 'POST ready_to_ship', 'POST', f"/api/orders/{order['id']}/ready_to_ship/", {}
+            )
+            await recorder.call(client, 'POST ship', 'POST', f"/api/orders/{order['id']}/ship/", {})
+
+    def _report(self, recorder, elapsed, options):
+        all_samples = [sample for samples in recorder.latencies.values() for sample in samples]
+        total = len(all_samples)
+        if not total:
+            raise CommandError('No requests completed.')
+        statuses = Counter()
+        for counter in recorder.statuses.values():
+            statuses.update(counter)
+        errors = sum(count for status, count in statuses.items() if status is None or status >= 500)
+        rejected = sum(count for status, count in statuses.items() if status and 400 <= status < 500)
+
+        self.stdout.write(
+            f"{'request':<20} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+            f"{'4xx':>5} {'5xx':>5}"
+        )
+        routes = {}
+        for label in sorted(recorder.latencies):
+            stats = summarize(recorder.latencies[label])
+            counter = recorder.statuses[label]
+            client_errors = sum(c for s, c in counter.items() if s and 400 <= s < 500)
+            server_errors = sum(c for s, c in counter.items() if s is None or s >= 500)
+            routes[label] = {
+                **stats,
+                'statuses': {str(status): count for status, count in counter.items()},
+            }
+            self.stdout.write(
+                f"{label:<20} {stats['count']:>7} {stats['p50_ms']:>9.2f} "
+                f"{stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f} {client_errors:>5} "
+                f"{server_errors:>5}"
+            )
+
+        histogram = Counter()
+        for sample in all_samples:
+            ms = sample * 1000
+            histogram[next((bound for bound in BUCKETS if ms <= bound), None)] += 1
+        self.stdout.write('\nlatency histogram')
+        widest = max(histogram.values())
+        for bound in (*BUCKETS, None):
+            count = histogram.get(bound, 0)
+            label = f'<= {bound} ms' if bound else f'> {BUCKETS[-1]} ms'
+            bar = '#' * round(40 * count / widest)
+            self.stdout.write(f'{label:>12} {count:>7} {bar}')
+
+        summary = {
+            'clients': options['clients'],
+            'duration_s': elapsed,
+            'requests': total,
+            'rps': total / elapsed,
+            'p50_ms': percentile(all_samples, 50) * 1000,
+            'p99_ms': percentile(all_samples, 99) * 1000,
+            'error_rate': errors / total,
+            'rejected_rate': rejected / total,
+            'lock_timeouts': recorder.lock_timeouts,
+            'lock_timeout_rate': recorder.lock_timeouts / total,
+        }
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n{total} requests in {elapsed:.1f}s from {options['clients']} clients: "
+                f"{summary['rps']:.1f} req/s, p50 {summary['p50_ms']:.2f} ms, "
+                f"p99 {summary['p99_ms']:.2f} ms"
+            )
+        )
+        self.stdout.write(
+            f"errors {summary['error_rate']:.2%}, rejected (4xx) {summary['rejected_rate']:.2%}, "
+            f"lock timeouts {recorder.lock_timeouts} ({summary['lock_timeout_rate']:.2%})"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(
+                    {
+                        'options': {name: options[name] for name in ('clients', 'duration', 'products', 'mix', 'seed')},
+                        'summary': summary,
+                        'histogram_ms': {str(bound or 'inf'): histogram.get(bound, 0) for bound in (*BUCKETS, None)},
+                        'routes': routes,
+                    },
+                    fh,
+                    indent=2,
+                )
+            self.stdout.write(f"Results written to {options['output']}")
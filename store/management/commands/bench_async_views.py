@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from store.cache import CATALOG_GENERATION_KEY
+from store.models import Order, OrderItem, Product
+from store.serializers import StoreTokenObtainPairSerializer
+
+from ._bench import benchmark_database, summarize
+from .bench_asgi import ASGIClient
+
+User = get_user_model()
+URLCONFS = {'sync': 'config.urls', 'async': 'config.urls_async'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the DRF read views with the native async ones '
+        '(store/views_async.py) under config.asgi at several concurrency levels.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=50, help="Orders in the buyer's history.")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per run.')
+        parser.add_argument(
+            '--cold-cache',
+            action='store_true',
+            help='Drop the catalog response cache before every request.',
+        )
+
+    def handle(self, *args, **options):
+        # django.setup() in config.asgi reconfigures logging; import it first.
+        from config.asgi import application
+
+        logging.getLogger('store.timing').setLevel(logging.ERROR)
+        with benchmark_database():
+            token, paths = self._seed(options)
+            self.stdout.write(
+                f"{'views':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}"
+            )
+            results = {}
+            for concurrency in options['concurrency']:
+                for mode, urlconf in URLCONFS.items():
+                    cache.clear()
+                    with override_settings(ROOT_URLCONF=urlconf):
+                        rps, stats, errors = asyncio.run(
+                            self._run(application, token, paths, concurrency, options)
+                        )
+                    results[mode, concurrency] = rps
+                    self.stdout.write(
+                        f"{mode:<6} {concurrency:>7} {rps:>9.1f} {stats['p50_ms']:>9.2f} "
+                        f"{stats['p99_ms']:>9.2f} {errors:>7}"
+                    )
+            for concurrency in options['concurrency']:
+                speedup = results['async', concurrency] / results['sync', concurrency]
+                self.stdout.write(
+                    self.style.SUCCESS(f'{concurrency} clients: async views at {speedup:.2f}x sync req/s')
+                )
+
+    def _seed(self, options):
+        buyer = User.objects.create_user('bench-buyer', email='buyer@example.com')
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f'Product {i}',
+                    description='Benchmark product ' * 8,
+                    price=Decimal('9.99'),
+                    stock=100,
+                )
+                for i in range(options['products'])
+            ],
+            batch_size=1000,
+        )
+        orders = Order.objects.bulk_create(
+            [Order(user=buyer, total_amount=Decimal('29.97')) for _ in range(options['orders'])]
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product=products[i % len(products)], quantity=3, unit_price=Decimal('9.99'))
+                for i, order in enumerate(orders)
+            ]
+        )
+        token = str(StoreTokenObtainPairSerializer.get_token(buyer).access_token)
+        paths = [
+            '/api/products/',
+            f'/api/products/{products[0].pk}/',
+            '/api/auth/me/',
+            '/api/orders/',
+            f'/api/orders/{orders[0].pk}/',
+        ]
+        return token, paths
+
+    async def _run(self, app, token, paths, concurrency, options):
+        samples, errors = [], 0
+        remaining = options['requests']
+
+        async def client_loop(index):
+            nonlocal remaining, errors
+            client = ASGIClient(app, token)
+            while remaining > 0:
+                remaining -= 1
+                path = paths[remaining % len(paths)]
+                if options['cold_cache']:
+                    await cache.adelete(CATALOG_GENERATION_KEY)
+                start = time.perf_counter()
+                status, _ = await client.request('GET', path)
+                samples.append(time.perf_counter() - start)
+                errors += status != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(index) for index in range(concurrency)))
+        return len(samples) / (time.perf_counter() - started), summarize(samples), errors
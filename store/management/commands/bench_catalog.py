@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from store.cache import CATALOG_GENERATION_KEY
+from store.models import Product
+
+from ._bench import benchmark_database, summarize, time_calls
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare catalog requests per second with the rendered-response cache '
+        'cold, warm, and revalidated through If-None-Match.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            products = Product.objects.bulk_create(
+                [
+                    Product(
+                        name=f'Product {i}',
+                        description='Benchmark product ' * 8,
+                        price=Decimal('9.99'),
+                        stock=100,
+                    )
+                    for i in range(options['products'])
+                ]
+            )
+            cache.clear()
+            client = Client()
+            routes = {
+                'list': f"/api/products/?page_size={options['page_size']}",
+                'detail': f'/api/products/{products[0].pk}/',
+            }
+            self.stdout.write(
+                f"{'route':<8} {'mode':<12} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}"
+            )
+            for name, path in routes.items():
+                etag = client.get(path)['ETag']
+                runs = {
+                    'cold': time_calls(
+                        lambda: client.get(path),
+                        options['requests'],
+                        before_each=lambda: cache.delete(CATALOG_GENERATION_KEY),
+                    ),
+                    'warm': time_calls(lambda: client.get(path), options['requests']),
+                    'revalidate': time_calls(
+                        lambda: client.get(path, HTTP_IF_NONE_MATCH=etag),
+                        options['requests'],
+                    ),
+                }
+                for mode, samples in runs.items():
+                    stats = summarize(samples)
+                    self.stdout.write(
+                        f"{name:<8} {mode:<12} {stats['rps']:>10.1f} "
+                        f"{stats['p50_ms']:>9.3f} {stats['p99_ms']:>9.3f}"
+                    )
+                cold, warm = summarize(runs['cold']), summarize(runs['warm'])
+                self.stdout.write(
+                    self.style.SUCCESS(f"{name}: warm cache is {warm['rps'] / cold['rps']:.1f}x cold")
+                )
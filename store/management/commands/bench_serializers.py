@@ -0,0 +1,91 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from store.fastpath import order_rows, product_rows, serialize_orders, serialize_products
+from store.models import Order, OrderItem, Product
+from store.serializers import OrderSerializer, ProductSerializer
+
+from ._bench import benchmark_database, time_calls
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure microseconds per row to serialize product and order lists with '
+        'the DRF serializers and with the .values() fast path.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--items', type=int, default=3, help='Items per order.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = User.objects.create(username='bench')
+            products = Product.objects.bulk_create(
+                [
+                    Product(
+                        name=f'Product {i}',
+                        description='Benchmark product ' * 8,
+                        price=Decimal('9.99') + i,
+                        stock=100,
+                    )
+                    for i in range(options['products'])
+                ]
+            )
+            orders = Order.objects.bulk_create(
+                [
+                    Order(user=user, total_amount=Decimal('29.97'))
+                    for _ in range(options['orders'])
+                ]
+            )
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(
+                        order=order,
+                        product=product,
+                        quantity=3,
+                        unit_price=product.price,
+                    )
+                    for order in orders
+                    for product in random.sample(products, options['items'])
+                ]
+            )
+
+            product_queryset = Product.objects.prefetch_related('stock_shards').order_by('-id')
+            order_queryset = (
+                Order.objects.select_related('user')
+                .prefetch_related('items__product__stock_shards')
+                .order_by('-id')
+            )
+            cases = {
+                'products': (
+                    lambda: ProductSerializer(product_queryset.all(), many=True).data,
+                    lambda: serialize_products(product_rows(product_queryset.all())),
+                    options['products'],
+                ),
+                'orders': (
+                    lambda: OrderSerializer(order_queryset.all(), many=True).data,
+                    lambda: serialize_orders(order_rows(order_queryset.all())),
+                    options['orders'],
+                ),
+            }
+            renderer = JSONRenderer()
+            self.stdout.write(
+                f"{'list':<10} {'drf us/row':>11} {'fast us/row':>12} {'speedup':>8}"
+            )
+            for name, (drf, fast, rows) in cases.items():
+                if renderer.render(drf()) != renderer.render(fast()):
+                    raise CommandError(f'The fast path renders {name} differently.')
+                drf_us = min(time_calls(drf, options['repeat'])) / rows * 1e6
+                fast_us = min(time_calls(fast, options['repeat'])) / rows * 1e6
+                self.stdout.write(
+                    f'{name:<10} {drf_us:>11.1f} {fast_us:>12.1f} {drf_us / fast_us:>7.1f}x'
+                )
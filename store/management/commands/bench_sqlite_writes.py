@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections, transaction
+from django.db.models import F
+
+from config.sqlite import PROFILES, sqlite_database
+from store.models import Order, Product
+
+from ._bench import benchmark_database, summarize
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Run checkout-shaped write transactions from many threads against '
+        'each SQLite profile and compare throughput and lock errors.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--transactions', type=int, default=100, help='Per thread.')
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.db.backends').setLevel(logging.CRITICAL)
+        with benchmark_database() as connection:
+            if connection.vendor != 'sqlite':
+                raise CommandError('This benchmark needs an SQLite database.')
+            users = User.objects.bulk_create(
+                [User(username=f'writer{i}') for i in range(options['threads'])]
+            )
+            product = Product.objects.create(
+                name='Benchmark item', price=Decimal('9.99'), stock=10**9
+            )
+            self.stdout.write(
+                f"{'profile':<11} {'tx/s':>9} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9}"
+            )
+            results = {}
+            for profile in PROFILES[::-1]:
+                self.use_profile(connection, profile)
+                results[profile] = self.run(profile, users, product, options)
+            if results['default']:
+                self.stdout.write(
+                    f"production/default throughput: "
+                    f"{results['production'] / results['default']:.1f}x"
+                )
+
+    def use_profile(self, connection, profile):
+        connections.close_all()
+        database = sqlite_database(connection.settings_dict['NAME'], profile)
+        connection.settings_dict['OPTIONS'] = database.get('OPTIONS', {})
+        connection.settings_dict['CONN_MAX_AGE'] = database.get('CONN_MAX_AGE', 0)
+        if profile == 'default':
+            # WAL is a property of the file and outlives the connection.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+            connections.close_all()
+
+    def run(self, profile, users, product, options):
+        samples = []
+        errors = 0
+        lock = threading.Lock()
+
+        def worker(user):
+            nonlocal errors
+            mine = []
+            failed = 0
+            for _ in range(options['transactions']):
+                start = time.perf_counter()
+                try:
+                    # Read, then write: the pattern of a checkout.
+                    with transaction.atomic():
+                        price = Product.objects.values_list('price', flat=True).get(pk=product.pk)
+                        Order.objects.create(user=user, total_amount=price)
+                        Product.objects.filter(pk=product.pk).update(stock=F('stock') - 1)
+                    mine.append(time.perf_counter() - start)
+                except OperationalError:
+                    failed += 1
+                finally:
+                    # End of "request": closes the connection unless CONN_MAX_AGE keeps it.
+                    close_old_connections()
+            connections.close_all()
+            with lock:
+                samples.extend(mine)
+                errors += failed
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(worker, users))
+        elapsed = time.perf_counter() - start
+
+        stats = summarize(samples)
+        throughput = len(samples) / elapsed
+        self.stdout.write(
+            f"{profile:<11} "
+            f"{throughput:>9.1f} {errors:>7} {stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+        return throughput
@@ -0,0 +1,126 @@
+import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections
+from rest_framework.test import APIClient
+
+from store.models import Cart, CartItem, Order, OrderItem, Product
+
+from ._bench import benchmark_database
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Run many concurrent checkouts of one hot product, with and without '
+        'sharded stock, and check that nothing is oversold. A checkout failing '
+        'with "database is locked" is retried and counted under "locked", so '
+        'checkouts/s measures completed checkouts rather than lock failures.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=200)
+        parser.add_argument('--stock', type=int, default=150)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--shards', type=int, default=8)
+        parser.add_argument(
+            '--retries', type=int, default=20, help='Attempts per checkout failing on a lock.'
+        )
+
+    def handle(self, *args, **options):
+        # Lock timeouts are counted below; don't print a traceback for each.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        logging.getLogger('store.timing').setLevel(logging.ERROR)
+        with benchmark_database():
+            users = User.objects.bulk_create(
+                [User(username=f'buyer{i}') for i in range(options['buyers'])]
+            )
+            carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+            self.stdout.write(
+                f"{'mode':<10} {'checkouts/s':>12} {'sold':>6} {'rejected':>9} "
+                f"{'locked':>7} {'errors':>7} {'left':>6}"
+            )
+            oversold = False
+            for shards in (0, options['shards']):
+                oversold |= self.run(users, carts, shards, options)
+            if oversold:
+                raise CommandError('Stock was oversold.')
+            self.stdout.write(self.style.SUCCESS('No overselling detected.'))
+
+    def run(self, users, carts, shards, options):
+        OrderItem.objects.all().delete()
+        Order.objects.all().delete()
+        CartItem.objects.all().delete()
+        Product.objects.all().delete()
+        product = Product.objects.create(
+            name='Flash sale item', price=Decimal('19.99'), stock=options['stock']
+        )
+        if shards:
+            product.shard_stock(shards)
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product=product, quantity=1) for cart in carts]
+        )
+        connections.close_all()
+
+        outcomes = {'created': 0, 'rejected': 0, 'locked': 0, 'errors': 0}
+        lock = threading.Lock()
+        failures = threading.local()
+
+        def on_exception(sender, **kwargs):
+            # Runs in the failing request's thread, inside the handler's
+            # except block. The test client's own exception capture is
+            # shared by every thread, so it is turned off below.
+            exc = sys.exc_info()[1]
+            failures.locked = isinstance(exc, OperationalError) and 'locked' in str(exc)
+
+        def checkout(user):
+            client = APIClient(raise_request_exception=False)
+            client.force_authenticate(user=user)
+            for attempt in range(options['retries'] + 1):
+                failures.locked = False
+                try:
+                    status_code = client.post('/api/orders/', {}, format='json').status_code
+                finally:
+                    connections.close_all()
+                if status_code < 500:
+                    outcome = 'created' if status_code == 201 else 'rejected'
+                    break
+                outcome = 'errors'
+                if not failures.locked:
+                    break
+                # SQLite without BEGIN IMMEDIATE fails a transaction that
+                # upgrades its read lock while another one writes: retry.
+                with lock:
+                    outcomes['locked'] += 1
+                time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+            with lock:
+                outcomes[outcome] += 1
+
+        got_request_exception.connect(on_exception)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(checkout, users))
+        finally:
+            got_request_exception.disconnect(on_exception)
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db()
+        left = product.available_stock
+        sold = sum(OrderItem.objects.filter(product=product).values_list('quantity', flat=True))
+        mode = f'{shards} shards' if shards else 'single'
+        self.stdout.write(
+            f"{mode:<10} {len(users) / elapsed:>12.1f} {sold:>6} "
+            f"{outcomes['rejected']:>9} {outcomes['locked']:>7} {outcomes['errors']:>7} "
+            f"{left:>6}"
+        )
+        return left < 0 or sold + left != options['stock']
@@ -0,0 +1,551 @@
+import json
+import logging
+import random
+import sys
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from store.analytics import rebuild_sales_aggregates
+from store.carts import dump_guest_cart
+from store.feeds import initial_cursor
+from store.models import Cart, CartItem, Order, OrderItem, Product
+from store.search import rebuild_index
+from store.serializers import StoreTokenObtainPairSerializer
+
+from ._bench import benchmark_database, summarize, time_calls
+
+User = get_user_model()
+PASSWORD = 'bench-password'
+# The routes take cart lines from the first 50 products and use the ones
+# after them (but before the last) as products no cart holds.
+HOT_PRODUCTS = 50
+MIN_PRODUCTS = HOT_PRODUCTS + 2
+# Seeded order statuses, weighted roughly like a live shop.
+ORDER_STATUSES = (
+    [Order.STATUS_SHIPPED] * 6
+    + [Order.STATUS_PAID] * 2
+    + [Order.STATUS_PENDING, Order.STATUS_PREPARED, Order.STATUS_READY_TO_SHIP, Order.STATUS_CANCELLED]
+)
+
+
+@dataclass
+class Route:
+    """One benchmarked request.
+
+    ``path`` and ``data`` may be callables, evaluated per call after
+    ``before_each`` has prepared whatever the request consumes (a pending
+    order to pay, a cart to check out...).
+    """
+
+    name: str
+    url_name: str
+    method: str
+    path: Callable[[], str] | str
+    client: str = 'buyer'
+    data: Callable[[], dict] | dict | None = None
+    before_each: Callable[[], None] | None = None
+    expected_status: int = 200
+    # Routes dominated by password hashing run fewer calls.
+    max_calls: int | None = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database with realistic volumes and measure latency '
+        'percentiles, queries per request and response size for every API '
+        'route. Results can be written as JSON and compared with a baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--carts', type=int, default=100, help='Users with a filled cart.')
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--days', type=int, default=90, help='Spread orders over this many days.')
+        parser.add_argument('--requests', type=int, default=50, help='Calls per route.')
+        parser.add_argument('--route', action='append', default=[], help='Only run routes containing this text.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Compare with the results of a previous run.')
+        parser.add_argument(
+            '--max-slowdown',
+            type=float,
+            default=25.0,
+            help='Percent a route p50 may grow over the baseline before it counts as a regression.',
+        )
+        parser.add_argument(
+            '--min-delta-ms',
+            type=float,
+            default=1.0,
+            help='Ignore p50 changes smaller than this, whatever the percentage.',
+        )
+        parser.add_argument(
+            '--max-extra-queries',
+            type=int,
+            default=0,
+            help='Queries per request a route may add over the baseline.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['products'] < MIN_PRODUCTS:
+            raise CommandError(f'--products must be at least {MIN_PRODUCTS}.')
+        if options['orders'] < 1:
+            raise CommandError('--orders must be at least 1.')
+        baseline = self._load_baseline(options['baseline'])
+        random.seed(options['seed'])
+        # The slow-request log would land in the middle of the table.
+        logging.getLogger('store.timing').setLevel(logging.ERROR)
+        # Time what production runs: no per-query logging from DEBUG.
+        with override_settings(DEBUG=False), benchmark_database():
+            self.stdout.write('Seeding...')
+            state = self._seed(options)
+            routes = self._routes(state)
+            self._check_coverage(routes)
+            if options['route']:
+                routes = [
+                    route for route in routes
+                    if any(text in route.name for text in options['route'])
+                ]
+            cache.clear()
+            results = {}
+            self.stdout.write(
+                f"{'route':<28} {'status':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+                f"{'queries':>8} {'bytes':>9}"
+            )
+            for route in routes:
+                results[route.name] = self._measure(route, state, options['requests'])
+                row = results[route.name]
+                self.stdout.write(
+                    f"{route.name:<28} {row['status']:>6} {row['p50_ms']:>9.3f} "
+                    f"{row['p90_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['queries']:>8} "
+                    f"{row['bytes']:>9}"
+                )
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'database': connection.vendor,
+            'options': {
+                name: options[name]
+                for name in ('users', 'products', 'carts', 'orders', 'items_per_order', 'days', 'requests', 'seed')
+            },
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        unexpected = [name for name, row in results.items() if not row['ok']]
+        if unexpected:
+            self.stdout.write(
+                self.style.WARNING(f"Unexpected status codes: {', '.join(unexpected)}")
+            )
+        if baseline is not None:
+            regressions = self._compare(results, baseline['routes'], options)
+            if regressions:
+                raise CommandError(f'{len(regressions)} route(s) regressed against the baseline.')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+
+    # -- seeding -------------------------------------------------------------
+
+    def _seed(self, options):
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            [
+                User(username=f'buyer{i}', email=f'buyer{i}@example.com', password=password)
+                for i in range(max(options['users'], 1))
+            ]
+        )
+        staff = User.objects.create_superuser('bench-staff', password=PASSWORD)
+
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    name=f'Product {i} {random.choice(["lamp", "chair", "table", "shelf", "rug"])}',
+                    description='Benchmark product ' * 8,
+                    price=Decimal(random.randrange(100, 50000)) / 100,
+                    # Enough stock that checkouts never run dry mid-run.
+                    stock=1_000_000,
+                )
+                for i in range(max(options['products'], 10))
+            ],
+            batch_size=1000,
+        )
+        # A few hot products keep their stock in shards, as in production.
+        for product in products[:5]:
+            product.shard_stock(4)
+        rebuild_index()
+
+        carts = Cart.objects.bulk_create(
+            [Cart(user=user) for user in users[: options['carts']]], batch_size=1000
+        )
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product=product, quantity=random.randint(1, 3))
+                for cart in carts
+                for product in random.sample(products, min(3, len(products)))
+            ],
+            batch_size=1000,
+        )
+
+        # The first order is the buyer's, for the routes reading one of theirs.
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    user=users[0] if i == 0 else random.choice(users),
+                    status=random.choice(ORDER_STATUSES),
+                )
+                for i in range(options['orders'])
+            ],
+            batch_size=1000,
+        )
+        items = [
+            OrderItem(
+                order=order,
+                product=product,
+                quantity=random.randint(1, 4),
+                unit_price=product.price,
+            )
+            for order in orders
+            for product in random.sample(products, min(options['items_per_order'], len(products)))
+        ]
+        OrderItem.objects.bulk_create(items, batch_size=1000)
+        totals = {}
+        for item in items:
+            totals[item.order_id] = totals.get(item.order_id, Decimal('0')) + item.subtotal
+        now = timezone.now()
+        for order in orders:
+            order.total_amount = totals.get(order.id, Decimal('0'))
+            order.placed_at = now - timedelta(
+                days=random.randrange(max(options['days'], 1)), minutes=random.randrange(1440)
+            )
+        # placed_at is auto_now_add, so it is only set on the way in.
+        Order.objects.bulk_update(orders, ['total_amount', 'placed_at'], batch_size=1000)
+        rebuild_sales_aggregates()
+
+        buyer = users[0]
+        Cart.objects.get_or_create(user=buyer)
+        return {
+            'buyer': buyer,
+            'staff': staff,
+            'products': products,
+            'orders': [order for order in orders if order.user_id == buyer.id],
+            'counter': 0,
+        }
+
+    def _client(self, user):
+        client = APIClient()
+        if user is not None:
+            token = StoreTokenObtainPairSerializer.get_token(user)
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        return client
+
+    def _order(self, state, status):
+        """Create an order of the buyer's in ``status`` for a consuming route."""
+        product = random.choice(state['products'][5:])
+        order = Order.objects.create(
+            user=state['buyer'], status=status, total_amount=product.price
+        )
+        item = OrderItem.objects.create(
+            order=order, product=product, quantity=1, unit_price=product.price
+        )
+        state['order'], state['item'] = order, item
+        return order
+
+    def _next(self, state):
+        state['counter'] += 1
+        return state['counter']
+
+    # -- routes --------------------------------------------------------------
+
+    def _routes(self, state):
+        buyer, products = state['buyer'], state['products']
+        hot = products[:HOT_PRODUCTS]
+        product, order = products[len(products) // 2], state['orders'][0]
+        cart = Cart.objects.get(user=buyer)
+        kept_item = CartItem.objects.create(cart=cart, product=products[-1], quantity=1)
+
+        def fill_cart():
+            cart.items.exclude(pk=kept_item.pk).delete()
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, product=p, quantity=1) for p in random.sample(hot, 3)]
+            )
+
+        def free_product():
+            state['product'] = random.choice(products[HOT_PRODUCTS:-1])
+            cart.items.filter(product=state['product']).delete()
+
+        def new_cart_item():
+            free_product()
+            state['cart_item'] = CartItem.objects.create(cart=cart, product=state['product'])
+
+        def new_product():
+            state['product'] = Product.objects.create(name='Disposable', price=Decimal('1.00'))
+
+        def paid_batch():
+            state['batch'] = [self._order(state, Order.STATUS_PAID).id for _ in range(20)]
+
+        refresh = str(StoreTokenObtainPairSerializer.get_token(buyer))
+        staff_token = str(StoreTokenObtainPairSerializer.get_token(state['staff']).access_token)
+        cursor = initial_cursor()
+        guest_cart = dump_guest_cart({p.pk: 1 for p in random.sample(hot, 5)})
+
+        return [
+            Route('api-root', 'api-root', 'get', '/api/'),
+            Route('products.list', 'product-list', 'get', '/api/products/', client='anonymous'),
+            Route(
+                'products.list.sparse', 'product-list', 'get',
+                '/api/products/?fields=id,name,price', client='anonymous',
+            ),
+            Route('products.list.offset', 'product-list', 'get', '/api/products/?offset=1000', client='anonymous'),
+            Route('products.search', 'product-list', 'get', '/api/products/?q=lamp', client='anonymous'),
+            Route(
+                'products.sync', 'product-list', 'get',
+                f"/api/products/?updated_since={(timezone.now() - timedelta(days=1)).isoformat().replace('+00:00', 'Z')}",
+                client='anonymous',
+            ),
+            Route('products.detail', 'product-detail', 'get', f'/api/products/{product.pk}/', client='anonymous'),
+            Route(
+                'products.create', 'product-list', 'post', '/api/products/', client='staff',
+                data={'name': 'Bench product', 'price': '12.50', 'stock': 10},
+                expected_status=201,
+            ),
+            Route(
+                'products.update', 'product-detail', 'patch', f'/api/products/{product.pk}/',
+                client='staff', data=lambda: {'price': f'{random.randrange(100, 9999) / 100:.2f}'},
+            ),
+            Route(
+                'products.delete', 'product-detail', 'delete',
+                lambda: f"/api/products/{state['product'].pk}/", client='staff',
+                before_each=new_product, expected_status=204,
+            ),
+            Route('products.export', 'product-export', 'get', '/api/products/export/', client='staff'),
+            Route('products.export.csv', 'product-export', 'get', '/api/products/export/?output=csv', client='staff'),
+            Route(
+                'register', 'register-list', 'post', '/api/register/', client='anonymous',
+                data=lambda: {
+                    'username': f'bench-new-{self._next(state)}',
+                    'email': 'new@example.com',
+                    'password': PASSWORD,
+                },
+                expected_status=201, max_calls=10,
+            ),
+            Route(
+                'auth.token', 'token_obtain_pair', 'post', '/api/auth/token/', client='anonymous',
+                data={'username': buyer.username, 'password': PASSWORD}, max_calls=10,
+            ),
+            Route(
+                'auth.refresh', 'token_refresh', 'post', '/api/auth/token/refresh/',
+                client='anonymous', data={'refresh': refresh},
+            ),
+            Route('auth.me', 'me', 'get', '/api/auth/me/'),
+            Route('cart', 'cart', 'get', '/api/cart/'),
+            Route(
+                'cart.items.create', 'cart-item-list', 'post', '/api/cart/items/',
+                data=lambda: {'product_id': state['product'].pk, 'quantity': 1},
+                before_each=free_product, expected_status=201,
+            ),
+            Route(
+                'cart.guest', 'guest-cart', 'get', f'/api/cart/guest/?token={guest_cart}',
+                client='anonymous',
+            ),
+            Route(
+                'cart.guest.add', 'guest-cart', 'post', '/api/cart/guest/', client='anonymous',
+                data=lambda: {
+                    'token': guest_cart,
+                    'items': [{'product_id': random.choice(hot).pk, 'quantity': 1}],
+                },
+            ),
+            Route(
+                'cart.items.bulk', 'cart-item-bulk', 'post', '/api/cart/items/bulk/',
+                data=lambda: {
+                    'items': [
+                        {'product_id': p.pk, 'quantity': 1} for p in random.sample(hot, 10)
+                    ]
+                },
+                before_each=fill_cart,
+            ),
+            Route(
+                'cart.items.update', 'cart-item-detail', 'patch', f'/api/cart/items/{kept_item.pk}/',
+                data=lambda: {'quantity': random.randint(1, 5)},
+            ),
+            Route(
+                'cart.items.delete', 'cart-item-detail', 'delete',
+                lambda: f"/api/cart/items/{state['cart_item'].pk}/",
+                before_each=new_cart_item, expected_status=204,
+            ),
+            Route('orders.list', 'order-list', 'get', '/api/orders/'),
+            Route(
+                'orders.list.sparse', 'order-list', 'get',
+                '/api/orders/?fields=id,status,total_amount,items.quantity,items.product',
+            ),
+            Route('orders.list.staff', 'order-list', 'get', '/api/orders/', client='staff'),
+            Route(
+                'orders.sync', 'order-list', 'get',
+                f"/api/orders/?updated_since={(timezone.now() - timedelta(days=1)).isoformat().replace('+00:00', 'Z')}",
+            ),
+            Route('orders.detail', 'order-detail', 'get', f'/api/orders/{order.pk}/'),
+            Route(
+                'orders.create', 'order-list', 'post', '/api/orders/',
+                before_each=fill_cart, expected_status=201,
+            ),
+            Route(
+                'orders.pay', 'order-pay', 'post', lambda: f"/api/orders/{state['order'].pk}/pay/",
+                before_each=lambda: self._order(state, Order.STATUS_PENDING),
+            ),
+            Route(
+                'orders.set_status', 'order-set-status', 'patch',
+                lambda: f"/api/orders/{state['order'].pk}/set_status/", client='staff',
+                data={'status': Order.STATUS_CANCELLED},
+                before_each=lambda: self._order(state, Order.STATUS_PENDING),
+            ),
+            Route(
+                'orders.prepare', 'order-prepare', 'post',
+                lambda: f"/api/orders/{state['order'].pk}/prepare/", client='staff',
+                data=lambda: {'items': [{'id': state['item'].pk, 'prepared_quantity': 1}]},
+                before_each=lambda: self._order(state, Order.STATUS_PAID),
+            ),
+            Route(
+                'orders.ready_to_ship', 'order-ready-to-ship', 'post',
+                lambda: f"/api/orders/{state['order'].pk}/ready_to_ship/", client='staff',
+                before_each=lambda: self._order(state, Order.STATUS_PREPARED),
+            ),
+            Route(
+                'orders.ship', 'order-ship', 'post',
+                lambda: f"/api/orders/{state['order'].pk}/ship/", client='staff',
+                before_each=lambda: self._order(state, Order.STATUS_READY_TO_SHIP),
+            ),
+            Route(
+                'orders.fulfill', 'order-fulfill', 'post', '/api/orders/fulfill/', client='staff',
+                data=lambda: {'orders': [{'id': pk, 'action': 'ship'} for pk in state['batch']]},
+                before_each=paid_batch,
+            ),
+            Route('orders.board', 'order-board', 'get', '/api/orders/board/', client='staff'),
+            Route(
+                'orders.board.filtered', 'order-board', 'get',
+                f'/api/orders/board/?status={Order.STATUS_PAID}', client='staff',
+            ),
+            Route('orders.changes', 'order-changes', 'get', f'/api/orders/changes/?since={cursor}', client='staff'),
+            Route('orders.export', 'order-export', 'get', '/api/orders/export/', client='staff'),
+            Route(
+                'orders.events', 'order-events', 'get',
+                f'/api/orders/events/?token={staff_token}&since={cursor}', client='anonymous',
+            ),
+            Route('analytics.sales', 'sales-analytics', 'get', '/api/analytics/sales/', client='staff'),
+            Route(
+                'analytics.sales.year', 'sales-analytics', 'get',
+                f"/api/analytics/sales/?start={(timezone.localdate() - timedelta(days=365)).isoformat()}",
+                client='staff',
+            ),
+            Route('admin.index', 'admin:index', 'get', '/admin/', client='admin'),
+            Route('admin.orders', 'admin:store_order_changelist', 'get', '/admin/store/order/', client='admin'),
+        ]
+
+    def _check_coverage(self, routes):
+        """Warn about API routes no benchmark exercises."""
+
+        def names(patterns, namespace=''):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    # The admin registers dozens of pages; the two above stand in for it.
+                    if pattern.namespace != 'admin':
+                        yield from names(pattern.url_patterns, namespace)
+                elif isinstance(pattern, URLPattern) and pattern.name:
+                    yield pattern.name
+
+        missing = set(names(get_resolver().url_patterns)) - {route.url_name for route in routes}
+        if missing:
+            self.stdout.write(
+                self.style.WARNING(f"Routes without a benchmark: {', '.join(sorted(missing))}")
+            )
+
+    # -- measuring -----------------------------------------------------------
+
+    def _measure(self, route, state, iterations):
+        if route.client == 'admin':
+            client = APIClient()
+            client.force_login(state['staff'])
+        else:
+            client = self._client(state.get(route.client))
+        call = getattr(client, route.method)
+
+        def request():
+            path = route.path() if callable(route.path) else route.path
+            data = route.data() if callable(route.data) else route.data
+            response = call(path, data, format='json') if data is not None else call(path)
+            # Read streaming bodies inside the timing: that is where the work is.
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            return response, body
+
+        # Warm up once (and find out how the route behaves) before timing.
+        if route.before_each:
+            route.before_each()
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response, body = request()
+        # Read now: the next request clears the query log.
+        query_count = len(queries)
+
+        if route.max_calls:
+            iterations = min(iterations, route.max_calls)
+        samples = time_calls(request, iterations, before_each=route.before_each)
+        stats = summarize(samples)
+        return {
+            'status': response.status_code,
+            'ok': response.status_code == route.expected_status,
+            'queries': query_count,
+            'bytes': len(body),
+            **stats,
+        }
+
+    # -- comparing -----------------------------------------------------------
+
+    def _load_baseline(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as fh:
+                baseline = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+        if 'routes' not in baseline:
+            raise CommandError(f'{path} is not a bench_store result file.')
+        return baseline
+
+    def _compare(self, results, baseline, options):
+        regressions = []
+        self.stdout.write(
+            f"\n{'route':<28} {'p50 ms':>9} {'baseline':>9} {'change':>8} {'queries':>8} {'baseline':>9}"
+        )
+        for name, row in results.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f'{name:<28} (not in baseline)')
+                continue
+            delta = row['p50_ms'] - before['p50_ms']
+            change = delta / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+            slower = delta >= options['min_delta_ms'] and change > options['max_slowdown']
+            more_queries = row['queries'] > before['queries'] + options['max_extra_queries']
+            line = (
+                f"{name:<28} {row['p50_ms']:>9.3f} {before['p50_ms']:>9.3f} {change:>+7.1f}% "
+                f"{row['queries']:>8} {before['queries']:>9}"
+            )
+            if slower or more_queries:
+                regressions.append(name)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from store.idempotency import stale_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and abandoned Idempotency-Key records.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        deleted, _ = stale_keys().using(options['database']).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} idempotency keys.'))
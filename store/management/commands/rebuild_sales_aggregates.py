@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from store.analytics import rebuild_sales_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales summary tables from the order history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        sales, products = rebuild_sales_aggregates(options['database'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {sales} daily sales rows and {products} product rows.')
+        )
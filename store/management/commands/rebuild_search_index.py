@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from store.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite FTS5 product search index from the product table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not fts_enabled(using):
+            self.stdout.write(
+                self.style.WARNING(
+                    f'No FTS5 index on database {using!r}; searches use LIKE instead.'
+                )
+            )
+            return
+        indexed = rebuild_index(using)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} products.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Split a product\'s stock across N counter rows so flash-sale checkouts '
+        'do not contend on one row. --shards 0 folds the stock back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='+', type=int)
+        parser.add_argument('--shards', type=int, default=8)
+
+    def handle(self, *args, **options):
+        if options['shards'] < 0:
+            raise CommandError('--shards must be 0 or more.')
+        for product_id in options['product_ids']:
+            try:
+                product = Product.objects.get(pk=product_id)
+            except Product.DoesNotExist:
+                raise CommandError(f'Product {product_id} does not exist.')
+            product.shard_stock(options['shards'])
+            self.stdout.write(
+                f'{product}: {product.available_stock} units over '
+                f'{product.stock_shard_count or "no"} shards'
+            )
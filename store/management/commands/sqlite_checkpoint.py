@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+def wal_size(connection) -> int:
+    path = f"{connection.settings_dict['NAME']}-wal"
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Checkpoint the SQLite write-ahead log into the database file and '
+        'report the WAL size before and after.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--mode',
+            default='TRUNCATE',
+            choices=MODES,
+            type=str.upper,
+            help='TRUNCATE (default) also shrinks the -wal file to zero bytes.',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Database {options['database']!r} is not SQLite.")
+        with connection.cursor() as cursor:
+            journal_mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+            if journal_mode.lower() != 'wal':
+                self.stdout.write(
+                    self.style.WARNING(f'Journal mode is {journal_mode}; nothing to checkpoint.')
+                )
+                return
+            before = wal_size(connection)
+            busy, log_frames, checkpointed = cursor.execute(
+                f"PRAGMA wal_checkpoint({options['mode']})"
+            ).fetchone()
+        after = wal_size(connection)
+        self.stdout.write(
+            f'WAL: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB, '
+            f'{checkpointed}/{log_frames} frames checkpointed'
+        )
+        if busy:
+            self.stdout.write(
+                self.style.WARNING(
+                    'A reader or writer held the database; the checkpoint is incomplete.'
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('Checkpoint complete.'))
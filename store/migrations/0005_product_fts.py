@@ -0,0 +1,38 @@
+from django.db import migrations
+
+FTS_TABLE = 'store_product_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT sqlite_compileoption_used(%s)', ['ENABLE_FTS5'])
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            "name, description, tokenize = 'unicode61 remove_diacritics 2', "
+            "prefix = '2 3')"
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+            'SELECT id, name, description FROM store_product'
+        )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_order_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+ORDER_COLUMNS = 'id, user_id, status, total_amount, placed_at, updated_at'
+ITEM_COLUMNS = 'id, order_id, product_id, quantity, unit_price, prepared_quantity'
+CREATE_ORDER_HISTORY = f'''
+CREATE VIEW store_orderhistory AS
+SELECT {ORDER_COLUMNS}, FALSE AS archived FROM store_order
+UNION ALL
+SELECT {ORDER_COLUMNS}, TRUE AS archived FROM store_archivedorder
+'''
+CREATE_ORDER_HISTORY_ITEMS = f'''
+CREATE VIEW store_orderhistoryitem AS
+SELECT {ITEM_COLUMNS} FROM store_orderitem
+UNION ALL
+SELECT {ITEM_COLUMNS} FROM store_archivedorderitem
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_idempotency_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('prepared', 'Prepared'), ('ready_to_ship', 'Ready to Ship'), ('shipped', 'Shipped'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('placed_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'store_orderhistory',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderHistoryItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('prepared_quantity', models.PositiveIntegerField()),
+            ],
+            options={
+                'db_table': 'store_orderhistoryitem',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('prepared', 'Prepared'), ('ready_to_ship', 'Ready to Ship'), ('shipped', 'Shipped'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('placed_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('prepared_quantity', models.PositiveIntegerField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='store.archivedorder')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='store.product')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', 'placed_at'], name='archived_user_placed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', 'updated_at'], name='archived_user_updated_idx'),
+        ),
+        migrations.RunSQL(CREATE_ORDER_HISTORY, 'DROP VIEW store_orderhistory'),
+        migrations.RunSQL(CREATE_ORDER_HISTORY_ITEMS, 'DROP VIEW store_orderhistoryitem'),
+    ]
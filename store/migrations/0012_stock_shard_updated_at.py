@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstockshard',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='productstockshard',
+            index=models.Index(fields=['updated_at'], name='stock_shard_updated_idx'),
+        ),
+    ]
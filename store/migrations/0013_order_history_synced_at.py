@@ -0,0 +1,40 @@
+# Generated by Django 5.2.9 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+ORDER_COLUMNS = 'id, user_id, status, total_amount, placed_at, updated_at'
+CREATE_ORDER_HISTORY = f'''
+CREATE VIEW store_orderhistory AS
+SELECT {ORDER_COLUMNS}, FALSE AS archived, updated_at AS synced_at FROM store_order
+UNION ALL
+SELECT {ORDER_COLUMNS}, TRUE AS archived, archived_at AS synced_at FROM store_archivedorder
+'''
+CREATE_PREVIOUS_ORDER_HISTORY = f'''
+CREATE VIEW store_orderhistory AS
+SELECT {ORDER_COLUMNS}, FALSE AS archived FROM store_order
+UNION ALL
+SELECT {ORDER_COLUMNS}, TRUE AS archived FROM store_archivedorder
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_stock_shard_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderhistory',
+            name='synced_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['archived_at', 'id'], name='archived_synced_idx'),
+        ),
+        migrations.RunSQL(
+            ['DROP VIEW store_orderhistory', CREATE_ORDER_HISTORY],
+            ['DROP VIEW store_orderhistory', CREATE_PREVIOUS_ORDER_HISTORY],
+        ),
+    ]
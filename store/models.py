@@ -1,7 +1,10 @@
+import random
 from decimal import Decimal
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 
 
 class Product(models.Model):
@@ -11,12 +14,117 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     image_url = models.URLField(blank=True)
     is_active = models.BooleanField(default=True)
+    # 0 keeps stock in the ``stock`` column; N > 0 splits it across N
+    # ProductStockShard rows so concurrent checkouts don't contend on one row.
+    stock_shard_count = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['is_active', 'created_at'], name='product_active_created_idx'
+            ),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_idx'),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
+    @property
+    def available_stock(self) -> int:
+        if not self.stock_shard_count:
+            return self.stock
+        return sum(shard.quantity for shard in self.stock_shards.all())
+
+    @property
+    def last_changed_at(self):
+        """``updated_at``, or the last change to a stock shard if later.
+
+        Claims update the shards only, so the product row stays out of
+        concurrent checkouts.
+        """
+        if not self.stock_shard_count:
+            return self.updated_at
+        return max([self.updated_at, *(shard.updated_at for shard in self.stock_shards.all())])
+
+    @transaction.atomic
+    def shard_stock(self, shard_count: int, total: int | None = None) -> None:
+        """Spread ``total`` (default: the current stock) over ``shard_count`` shards.
+
+        A ``shard_count`` of 0 folds the shards back into the ``stock`` column.
+        The product row and its shards are locked before the stock is read (on
+        SQLite the first UPDATE takes the write lock), so a checkout can't
+        land between the read and the re-spread.
+        """
+        Product.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+        stock, sharded = Product.objects.values_list('stock', 'stock_shard_count').get(pk=self.pk)
+        shards = ProductStockShard.objects.select_for_update().filter(product=self)
+        if total is None:
+            total = sum(shards.values_list('quantity', flat=True)) if sharded else stock
+        shards.delete()
+        if shard_count:
+            base, extra = divmod(total, shard_count)
+            ProductStockShard.objects.bulk_create(
+                [
+                    ProductStockShard(
+                        product=self, index=index, quantity=base + (index < extra)
+                    )
+                    for index in range(shard_count)
+                ]
+            )
+        self.stock_shard_count = shard_count
+        self.stock = 0 if shard_count else total
+        self.save(update_fields=['stock_shard_count', 'stock', 'updated_at'])
+
+    def claim_sharded_stock(self, quantity: int) -> bool:
+        """Take ``quantity`` units from the stock shards with conditional UPDATEs.
+
+        A random shard is tried first; the others are only visited when it
+        can't cover the whole quantity. Returns ``False`` when the shards run
+        dry, in which case units may already be taken and the caller must
+        roll back.
+        """
+        start = random.randrange(self.stock_shard_count)
+        shards = ProductStockShard.objects.filter(product=self)
+        now = timezone.now()
+        if shards.filter(index=start, quantity__gte=quantity).update(
+            quantity=F('quantity') - quantity, updated_at=now
+        ):
+            return True
+        remaining = quantity
+        available = sorted(
+            shards.filter(quantity__gt=0).values_list('index', 'quantity'),
+            key=lambda shard: (shard[0] - start) % self.stock_shard_count,
+        )
+        for index, shard_quantity in available:
+            take = min(remaining, shard_quantity)
+            if shards.filter(index=index, quantity__gte=take).update(
+                quantity=F('quantity') - take, updated_at=now
+            ):
+                remaining -= take
+            if not remaining:
+                return True
+        return False
+
+
+class ProductStockShard(models.Model):
+    product = models.ForeignKey(
+        Product, related_name='stock_shards', on_delete=models.CASCADE
+    )
+    index = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('product', 'index')
+        indexes = [
+            models.Index(fields=['updated_at'], name='stock_shard_updated_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product} shard {self.index}: {self.quantity}"
+
 
 class Cart(models.Model):
     user = models.OneToOneField(
@@ -64,6 +172,12 @@ class Order(models.Model):
         (STATUS_SHIPPED, 'Shipped'),
         (STATUS_CANCELLED, 'Cancelled'),
     ]
+    # Fulfillment state machine: the statuses each staff action starts from.
+    PREPARABLE_STATUSES = (STATUS_PAID, STATUS_PREPARED)
+    READY_TO_SHIP_FROM_STATUSES = (STATUS_PREPARED,)
+    SHIPPABLE_STATUSES = (STATUS_READY_TO_SHIP, STATUS_PREPARED, STATUS_PAID)
+    # Statuses whose items count as sold in the sales aggregates.
+    SOLD_STATUSES = (STATUS_PAID, STATUS_PREPARED, STATUS_READY_TO_SHIP, STATUS_SHIPPED)
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -77,19 +191,20 @@ class Order(models.Model):
     placed_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'placed_at'], name='order_user_placed_idx'),
+            models.Index(fields=['status', 'placed_at'], name='order_status_placed_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+            models.Index(fields=['user', 'updated_at'], name='order_user_updated_idx'),
+        ]
+
     def __str__(self) -> str:
         return f"Order #{self.id} ({self.status})"
 
-    def recalculate_total(self) -> None:
-        total = sum((item.subtotal for item in self.items.all()), Decimal('0'))
-        self.total_amount = total.quantize(Decimal('0.01'))
-        self.save(update_fields=['total_amount'])
-
-    def update_preparation_status(self) -> None:
-        items = list(self.items.all())
-        if items and all(item.prepared_quantity >= item.quantity for item in items):
-            self.status = self.STATUS_PREPARED
-            self.save(update_fields=['status', 'updated_at'])
+    @staticmethod
+    def is_fully_prepared(items) -> bool:
+        return bool(items) and all(item.prepared_quantity >= item.quantity for item in items)
 
 
 class OrderItem(models.Model):
@@ -105,3 +220,159 @@ class OrderItem(models.Model):
     @property
     def subtotal(self) -> Decimal:
         return self.quantity * self.unit_price
+
+
+class ArchivedOrder(models.Model):
+    """A shipped or cancelled order moved out of ``Order`` by ``store.archive``.
+
+    Keeps the order's id, so ``OrderHistory`` can serve both tables as one.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT,
+        related_name='archived_orders',
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    placed_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'placed_at'], name='archived_user_placed_idx'),
+            models.Index(fields=['user', 'updated_at'], name='archived_user_updated_idx'),
+            models.Index(fields=['archived_at', 'id'], name='archived_synced_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"Archived order #{self.id} ({self.status})"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='+', on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    prepared_quantity = models.PositiveIntegerField()
+
+    def __str__(self) -> str:
+        return f"{self.product} x{self.quantity}"
+
+
+class OrderHistory(models.Model):
+    """Read-only ``UNION ALL`` of ``Order`` and ``ArchivedOrder`` (a database view).
+
+    Filter it by user or id: both tables are searched through their own
+    indexes, whereas an unfiltered ordered scan sorts the whole history.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_constraint=False,
+    )
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    placed_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived = models.BooleanField()
+    # ``updated_at`` of a live order, ``archived_at`` of an archived one.
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'store_orderhistory'
+
+    def __str__(self) -> str:
+        return f"Order #{self.id} ({self.status})"
+
+
+class OrderHistoryItem(models.Model):
+    """Read-only ``UNION ALL`` of ``OrderItem`` and ``ArchivedOrderItem``."""
+
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        OrderHistory, related_name='items', on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    product = models.ForeignKey(
+        Product, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    prepared_quantity = models.PositiveIntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'store_orderhistoryitem'
+
+    def __str__(self) -> str:
+        return f"{self.product} x{self.quantity}"
+
+    @property
+    def subtotal(self) -> Decimal:
+        return self.quantity * self.unit_price
+
+
+class DailySales(models.Model):
+    """Orders placed on ``day`` that are currently in ``status``.
+
+    Maintained incrementally by ``store.analytics`` on every status change;
+    ``rebuild_sales_aggregates`` recomputes it from the order table.
+    """
+
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'status')
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.status}: {self.order_count} orders, {self.revenue}"
+
+
+class DailyProductSales(models.Model):
+    """Units of ``product`` sold in orders placed on ``day`` (see ``Order.SOLD_STATUSES``)."""
+
+    day = models.DateField()
+    product = models.ForeignKey(Product, related_name='daily_sales', on_delete=models.CASCADE)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('day', 'product')
+
+    def __str__(self) -> str:
+        return f"{self.day} {self.product}: {self.units}"
+
+
+class IdempotencyKey(models.Model):
+    """The response to a request sent with an ``Idempotency-Key`` header.
+
+    Claimed (``status_code`` empty) before the request runs, so duplicates
+    can wait for it, then filled with the response that retries replay
+    until ``expires_at``. See ``store.idempotency``.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE
+    )
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content = models.BinaryField(default=b'')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self) -> str:
+        return f"{self.user_id}:{self.key} ({self.status_code or 'in flight'})"
@@ -0,0 +1,112 @@
+from rest_framework.pagination import (
+    CursorPagination,
+    LimitOffsetPagination,
+    _reverse_ordering,
+)
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination keyed on the view's ``cursor_ordering``.
+
+    Views declare a unique ordering such as ``('-created_at', '-id')`` so
+    that every page is fetched with an indexed range scan, whatever its
+    depth. Passing ``?offset=`` (optionally with ``?limit=``) switches to
+    classic limit/offset pagination, which the admin UI uses to jump to an
+    arbitrary page.
+
+    ``apaginate_queryset`` is the cursor pagination for async views: a copy
+    of ``CursorPagination.paginate_queryset`` that awaits its one query.
+    """
+
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    offset_pagination_class = LimitOffsetPagination
+
+    def __init__(self):
+        self.offset_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.offset_pagination_class.offset_query_param in request.query_params:
+            self.offset_paginator = self.offset_pagination_class()
+            self.offset_paginator.max_limit = self.max_page_size
+            ordering = self.get_ordering(request, queryset, view)
+            return self.offset_paginator.paginate_queryset(
+                queryset.order_by(*ordering), request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset with the query awaited; keep the
+        # two in step when upgrading DRF.
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            order = self.ordering[0]
+            order_attr = order.lstrip('-')
+            # (cursor reversed) XOR (queryset reversed)
+            if self.cursor.reverse != order.startswith('-'):
+                queryset = queryset.filter(**{order_attr + '__lt': current_position})
+            else:
+                queryset = queryset.filter(**{order_attr + '__gt': current_position})
+
+        results = [row async for row in queryset[offset:offset + self.page_size + 1]]
+        self.page = list(results[:self.page_size])
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # The query ran in reverse order; put the page back in order.
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+class StaffBoardPagination(KeysetPagination):
+    page_size = 200
+    max_page_size = 1000
@@ -0,0 +1,124 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+RECENT_WRITE_KEY = 'store:replica:recent-write:{user_id}'
+
+_replica_reads = ContextVar('store_replica_reads', default=False)
+_pinned_to_primary = ContextVar('store_pinned_to_primary', default=False)
+
+
+@contextmanager
+def routing_scope():
+    """Start a request with reads on the primary and no write pin."""
+    reads_token = _replica_reads.set(False)
+    pinned_token = _pinned_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(reads_token)
+        _pinned_to_primary.reset(pinned_token)
+
+
+def allow_replica_reads() -> None:
+    _replica_reads.set(True)
+
+
+def read_from_primary() -> None:
+    """Keep the rest of the scope's reads on the primary."""
+    _replica_reads.set(False)
+
+
+def note_recent_write(user_id) -> None:
+    """Keep ``user_id``'s reads on the primary while replicas catch up."""
+    cache.set(
+        RECENT_WRITE_KEY.format(user_id=user_id),
+        True,
+        timeout=settings.REPLICA_READ_YOUR_WRITES_SECONDS,
+    )
+
+
+def wrote_recently(user_id) -> bool:
+    if user_id is None:
+        return False
+    return cache.get(RECENT_WRITE_KEY.format(user_id=user_id), False)
+
+
+async def awrote_recently(user_id) -> bool:
+    if user_id is None:
+        return False
+    return await cache.aget(RECENT_WRITE_KEY.format(user_id=user_id), False)
+
+
+class PrimaryReplicaRouter:
+    """Send reads to ``DATABASE_REPLICAS`` where the request allows it.
+
+    Reads only leave the primary inside a ``routing_scope`` that called
+    ``allow_replica_reads``, and never after the scope has written anything:
+    the first write pins the rest of the request to the primary so it reads
+    its own writes.
+    """
+
+    def replica(self):
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if (
+            not settings.DATABASE_REPLICAS
+            or not _replica_reads.get()
+            or _pinned_to_primary.get()
+        ):
+            return DEFAULT_DB_ALIAS
+        return self.replica()
+
+    def db_for_write(self, model, **hints):
+        _pinned_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, kept in sync outside Django.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Let ``replica_actions`` (safe methods on plain views) read from replicas.
+
+    A request that writes keeps its user's reads on the primary for
+    ``REPLICA_READ_YOUR_WRITES_SECONDS``, so the order just placed or paid
+    shows up in the next list even if the replicas lag.
+    """
+
+    replica_actions = ('list', 'retrieve', 'export')
+
+    def dispatch(self, request, *args, **kwargs):
+        with routing_scope():
+            response = super().dispatch(request, *args, **kwargs)
+            user = getattr(request, 'user', None)
+            if _pinned_to_primary.get() and user is not None and user.is_authenticated:
+                note_recent_write(user.pk)
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        action = getattr(self, 'action', None)
+        if (
+            action in self.replica_actions
+            or (action is None and request.method in SAFE_METHODS)
+        ) and not wrote_recently(request.user.pk):
+            allow_replica_reads()
+        super().initial(request, *args, **kwargs)
@@ -0,0 +1,127 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .cache import bump_catalog_generation
+from .models import Product
+
+FTS_TABLE = 'store_product_fts'
+_fts_enabled = {}
+
+
+def fts_enabled(using) -> bool:
+    """Whether the product FTS5 index exists on the ``using`` database."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _fts_enabled:
+        _fts_enabled[key] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_enabled[key]
+
+
+def _terms(query):
+    return re.findall(r'\w+', query)
+
+
+def _match_expression(terms):
+    # Every term is quoted (no FTS5 operators leak through from user input)
+    # and matched as a prefix, so "lam" finds "lampe".
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+def _no_matches(queryset, ranked):
+    if ranked:
+        queryset = queryset.annotate(search_rank=Value(0, output_field=IntegerField()))
+    return queryset.none()
+
+
+def search_products(queryset, query, ranked=True):
+    """Filter ``queryset`` to products matching ``query``.
+
+    With ``ranked`` the matches are annotated with ``search_rank`` (0 is the
+    most relevant) and capped at ``PRODUCT_SEARCH_LIMIT``; the cap applies
+    to matches within ``queryset``, so inactive or filtered-out products
+    can't crowd out the rest. Databases without
+    the FTS5 index fall back to a ``LIKE`` search over name and description.
+    """
+    terms = _terms(query)
+    if not terms:
+        return _no_matches(queryset, ranked)
+    using = queryset.db
+    if fts_enabled(using):
+        expression = _match_expression(terms)
+        if not ranked:
+            return queryset.filter(
+                pk__in=RawSQL(
+                    f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                    [expression],
+                )
+            )
+        candidates, params = queryset.order_by().values('pk').query.sql_with_params()
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'AND rowid IN ({candidates}) ORDER BY rank LIMIT %s',
+                [expression, *params, settings.PRODUCT_SEARCH_LIMIT],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return _no_matches(queryset, ranked)
+        return queryset.filter(pk__in=ids).annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+                output_field=IntegerField(),
+            )
+        )
+
+    matches = Q()
+    for term in terms:
+        matches &= Q(name__icontains=term) | Q(description__icontains=term)
+    queryset = queryset.filter(matches)
+    if not ranked:
+        return queryset
+    return queryset.annotate(
+        search_rank=Case(
+            When(name__icontains=terms[0], then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def index_product(product, using='default') -> None:
+    if not fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (%s, %s, %s)',
+            [product.pk, product.name, product.description],
+        )
+
+
+def unindex_product(product, using='default') -> None:
+    if not fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+
+
+def rebuild_index(using='default') -> int:
+    """Repopulate the FTS5 index from the product table; return rows indexed."""
+    if not fts_enabled(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, description) '
+            f'SELECT id, name, description FROM {Product._meta.db_table}'
+        )
+        indexed = cursor.rowcount
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    bump_catalog_generation()
+    return indexed
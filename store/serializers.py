@@ -1,8 +1,16 @@
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
+from .authentication import add_user_claims
+from .carts import load_guest_cart, merge_guest_cart
+from .fieldsets import SparseFieldsMixin
 from .models import Cart, CartItem, Order, OrderItem, Product
 
 User = get_user_model()
@@ -19,7 +27,40 @@ class RegisterSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class StoreTokenObtainPairSerializer(TokenObtainPairSerializer):
+    guest_cart = serializers.CharField(required=False, write_only=True)
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        token = attrs.get('guest_cart')
+        if token:
+            # A bad guest cart is dropped rather than failing the login.
+            try:
+                quantities = load_guest_cart(token)
+            except signing.BadSignature:
+                quantities = {}
+            merge_guest_cart(self.user.pk, quantities)
+        return data
+
+
+class StoreTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        # Refresh the profile claims too, so they are at most one access
+        # token lifetime old.
+        data = super().validate(attrs)
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.get(
+            **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}
+        )
+        data['access'] = str(add_user_claims(refresh.access_token, user))
+        return data
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = (
@@ -35,6 +76,25 @@ class ProductSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'stock' in data and instance.stock_shard_count:
+            data['stock'] = instance.available_stock
+        if 'updated_at' in data and instance.stock_shard_count:
+            data['updated_at'] = self.fields['updated_at'].to_representation(
+                instance.last_changed_at
+            )
+        return data
+
+    def update(self, instance, validated_data):
+        if instance.stock_shard_count and 'stock' in validated_data:
+            # Sharded stock is re-spread across the shards, not stored on the row.
+            stock = validated_data.pop('stock')
+            instance = super().update(instance, validated_data)
+            instance.shard_stock(instance.stock_shard_count, total=stock)
+            return instance
+        return super().update(instance, validated_data)
+
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -67,11 +127,34 @@ class CartItemSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         product = attrs.get('product') or getattr(self.instance, 'product', None)
         quantity = attrs.get('quantity', getattr(self.instance, 'quantity', 1))
-        if product and product.stock < quantity:
+        if product and product.available_stock < quantity:
             raise serializers.ValidationError('Insufficient stock for this product.')
         return attrs
 
 
+class CartLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class BulkCartItemsSerializer(serializers.Serializer):
+    items = CartLineSerializer(many=True, allow_empty=False, max_length=200)
+
+    def quantities(self):
+        """``{product_id: quantity}``, summing repeated products."""
+        quantities = {}
+        for line in self.validated_data['items']:
+            product_id = line['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + line['quantity']
+        return quantities
+
+
+class GuestCartSerializer(BulkCartItemsSerializer):
+    token = serializers.CharField(required=False, allow_blank=True)
+    # Empty when replacing the whole cart with nothing.
+    items = CartLineSerializer(many=True, max_length=200)
+
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total = serializers.SerializerMethodField()
@@ -86,7 +169,7 @@ class CartSerializer(serializers.ModelSerializer):
         return total.quantize(Decimal('0.01'))
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     subtotal = serializers.SerializerMethodField()
     prepared_quantity = serializers.IntegerField(read_only=True)
@@ -107,7 +190,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return obj.subtotal.quantize(Decimal('0.01'))
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     total_amount = serializers.DecimalField(
         max_digits=10, decimal_places=2, read_only=True
@@ -141,3 +224,112 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
 class PreparationItemSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     prepared_quantity = serializers.IntegerField(min_value=0)
+
+
+class FulfillmentOperationSerializer(serializers.Serializer):
+    ACTION_CHOICES = ('prepare', 'ready_to_ship', 'ship')
+
+    id = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=ACTION_CHOICES)
+    items = PreparationItemSerializer(many=True, required=False)
+
+
+class FulfillmentSerializer(serializers.Serializer):
+    orders = FulfillmentOperationSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class OrderChangeSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    status = serializers.CharField()
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    placed_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+
+
+class StaffBoardFilterSerializer(serializers.Serializer):
+    status = serializers.CharField(required=False)
+    placed_from = serializers.DateField(required=False)
+    placed_to = serializers.DateField(required=False)
+    q = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_status(self, value):
+        statuses = [status for status in value.split(',') if status]
+        known = {choice for choice, _ in Order.STATUS_CHOICES}
+        unknown = set(statuses) - known
+        if unknown:
+            raise serializers.ValidationError(f"Unknown status: {', '.join(sorted(unknown))}.")
+        return statuses
+
+    def filter_queryset(self, queryset):
+        data = self.validated_data
+        if data.get('status'):
+            queryset = queryset.filter(status__in=data['status'])
+        # Compare against datetime bounds so the (status, placed_at) index is used.
+        if data.get('placed_from'):
+            start = datetime.combine(data['placed_from'], time.min)
+            queryset = queryset.filter(placed_at__gte=timezone.make_aware(start))
+        if data.get('placed_to'):
+            end = datetime.combine(data['placed_to'] + timedelta(days=1), time.min)
+            queryset = queryset.filter(placed_at__lt=timezone.make_aware(end))
+        search = data.get('q', '').strip().lstrip('#')
+        if search.isdigit():
+            queryset = queryset.filter(id=int(search))
+        elif search:
+            queryset = queryset.filter(user__username__istartswith=search)
+        return queryset
+
+
+class StaffBoardItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    prepared_quantity = serializers.IntegerField()
+
+
+class StaffBoardOrderSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    status = serializers.CharField()
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    item_count = serializers.SerializerMethodField()
+    placed_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+    items = StaffBoardItemSerializer(many=True)
+
+    def get_item_count(self, obj):
+        return sum(item['quantity'] for item in obj['items'])
+
+
+class SalesAnalyticsFilterSerializer(serializers.Serializer):
+    MAX_DAYS = 366
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    top = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        attrs['end'] = attrs.get('end') or timezone.localdate()
+        attrs['start'] = attrs.get('start') or attrs['end'] - timedelta(days=29)
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end.')
+        if (attrs['end'] - attrs['start']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f'The range is limited to {self.MAX_DAYS} days.')
+        return attrs
+
+
+class SalesStatusSerializer(serializers.Serializer):
+    status = serializers.CharField()
+    order_count = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class SalesDaySerializer(SalesStatusSerializer):
+    day = serializers.DateField()
+
+
+class ProductSalesSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    name = serializers.CharField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_cached_user
+from .cache import bump_cart_versions, bump_catalog_generation
+from .models import Cart, CartItem, Product
+from .search import index_product, unindex_product
+
+CART_PRODUCT_FIELDS = {'price', 'stock'}
+SEARCH_PRODUCT_FIELDS = {'name', 'description'}
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart(sender, instance, **kwargs):
+    bump_cart_versions([instance.cart.user_id])
+
+
+@receiver(post_save, sender=Product)
+def invalidate_carts_with_product(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not CART_PRODUCT_FIELDS & set(update_fields)):
+        return
+    bump_cart_versions(
+        Cart.objects.filter(items__product=instance).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_generation()
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or SEARCH_PRODUCT_FIELDS & set(update_fields):
+        index_product(instance, using=using)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, using, **kwargs):
+    unindex_product(instance, using=using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    forget_cached_user(instance.pk)
@@ -1,17 +1,89 @@
+import csv
+import json
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.connection import ConnectionDoesNotExist
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from .models import Cart, CartItem, Order, Product
+from config.sqlite import sqlite_database
+
+from . import carts
+from .analytics import rebuild_sales_aggregates
+from .models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Cart,
+    CartItem,
+    DailyProductSales,
+    DailySales,
+    IdempotencyKey,
+    Order,
+    OrderItem,
+    Product,
+)
+from .routers import (
+    RECENT_WRITE_KEY,
+    PrimaryReplicaRouter,
+    allow_replica_reads,
+    routing_scope,
+)
+from .search import rebuild_index
+from .serializers import StoreTokenObtainPairSerializer
+from .timing import RequestTimings
 
 User = get_user_model()
 
 
-class EcommerceAPITests(APITestCase):
+def stand_in_for_replicas(test, aliases):
+    # A separate connection to a mirror can't see the test's uncommitted
+    # rows, so replicas share the primary's connection and transaction.
+    for alias in aliases:
+        try:
+            test.addCleanup(connections.__setitem__, alias, connections[alias])
+        except ConnectionDoesNotExist:
+            test.addCleanup(connections.__delitem__, alias)
+        connections[alias] = connections[DEFAULT_DB_ALIAS]
+
+
+class StoreAPITestCase(APITestCase):
     def setUp(self):
+        # Cached carts and catalog pages outlive the per-test transaction.
+        cache.clear()
+        stand_in_for_replicas(self, settings.DATABASE_REPLICAS)
+
+    def make_order(self, user, lines=(), order_status=Order.STATUS_PENDING):
+        """An order of ``lines`` (``(product, quantity)`` pairs) at the products' prices."""
+        total = sum((product.price * quantity for product, quantity in lines), Decimal('0'))
+        order = Order.objects.create(user=user, status=order_status, total_amount=total)
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(order=order, product=product, quantity=quantity, unit_price=product.price)
+                for product, quantity in lines
+            ]
+        )
+        return order
+
+
+class EcommerceAPITests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
         self.user = User.objects.create_user(
             username='buyer', password='password123', email='buyer@example.com'
         )
@@ -41,7 +113,7 @@ class EcommerceAPITests(APITestCase):
         url = reverse('product-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertGreaterEqual(len(response.data['results']), 1)
 
     def test_add_item_to_cart(self):
         self.authenticate()
@@ -104,3 +176,1549 @@ class EcommerceAPITests(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         order = Order.objects.get(id=order_id)
         self.assertEqual(order.status, Order.STATUS_PREPARED)
+
+
+class PaginationTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.products = [
+            Product.objects.create(name=f'Product {i}', price=Decimal('1.00'), stock=5)
+            for i in range(5)
+        ]
+
+    def test_product_list_uses_cursor_pagination(self):
+        url = reverse('product-list')
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('cursor=', response.data['next'])
+
+        seen = []
+        next_url = f'{url}?page_size=2'
+        while next_url:
+            page = self.client.get(next_url).json()
+            seen.extend(item['id'] for item in page['results'])
+            next_url = page['next']
+        expected = [p.id for p in sorted(self.products, key=lambda p: (p.created_at, p.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_offset_pagination_is_opt_in(self):
+        response = self.client.get(reverse('product-list'), {'offset': 3, 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_order_list_is_paginated(self):
+        for _ in range(3):
+            Order.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('order-list'), {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class CheckoutTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def fill_cart(self, lines, quantity=2):
+        products = Product.objects.bulk_create(
+            [
+                Product(name=f'Product {i}', price=Decimal('2.50'), stock=10)
+                for i in range(lines)
+            ]
+        )
+        CartItem.objects.bulk_create(
+            [CartItem(cart=self.cart, product=p, quantity=quantity) for p in products]
+        )
+        return products
+
+    def checkout_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return len(ctx.captured_queries)
+
+    def test_checkout_query_count_does_not_grow_with_cart_size(self):
+        self.fill_cart(1)
+        single_line = self.checkout_query_count()
+        self.fill_cart(40)
+        forty_lines = self.checkout_query_count()
+        self.assertEqual(single_line, forty_lines)
+
+    def test_checkout_decrements_stock_and_totals_in_memory(self):
+        products = self.fill_cart(3, quantity=4)
+        response = self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_amount'], '30.00')
+        self.assertEqual(len(response.data['items']), 3)
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.stock, 6)
+
+    def test_checkout_insufficient_stock_rolls_back(self):
+        products = self.fill_cart(2, quantity=4)
+        Product.objects.filter(pk=products[1].pk).update(stock=3)
+        response = self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], f'Insufficient stock for {products[1].name}.')
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.cart.items.count(), 2)
+        products[0].refresh_from_db()
+        self.assertEqual(products[0].stock, 10)
+
+
+    def test_stock_running_out_during_checkout_names_the_product(self):
+        products = self.fill_cart(3, quantity=4)
+
+        def sell_out(user_ids):
+            # Another checkout takes the stock once this one has checked it.
+            Product.objects.filter(pk=products[1].pk).update(stock=3)
+
+        with mock.patch('store.views.bump_cart_versions', side_effect=sell_out):
+            response = self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], f'Insufficient stock for {products[1].name}.')
+        self.assertFalse(Order.objects.exists())
+
+
+class CartReadTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def add_products(self, count):
+        products = Product.objects.bulk_create(
+            [Product(name=f'Product {i}', price=Decimal('3.00'), stock=10) for i in range(count)]
+        )
+        for product in products:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+        return products
+
+    def cart_query_count(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_cart_query_count_is_fixed(self):
+        self.add_products(2)
+        two_lines = self.cart_query_count()
+        self.add_products(10)
+        twelve_lines = self.cart_query_count()
+        self.assertEqual(two_lines, twelve_lines)
+
+    def test_repeated_cart_reads_skip_the_database(self):
+        self.add_products(2)
+        first = self.client.get(reverse('cart'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('cart'))
+        self.assertEqual(first.data, second.data)
+
+    def test_cart_snapshot_invalidated_by_item_and_product_changes(self):
+        product = self.add_products(1)[0]
+        self.client.get(reverse('cart'))
+
+        item = self.cart.items.get()
+        item.quantity = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.data['items'][0]['quantity'], 3)
+
+        product.price = Decimal('5.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.data['total'], Decimal('15.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.data['items'], [])
+
+
+class CartUpsertTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        Cart.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.products = Product.objects.bulk_create(
+            [Product(name=f'Product {i}', price=Decimal('2.50'), stock=5) for i in range(30)]
+        )
+
+    def bulk(self, lines):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('cart-item-bulk'),
+                {'items': [{'product_id': p.id, 'quantity': q} for p, q in lines]},
+                format='json',
+            )
+
+    def quantities(self):
+        return dict(CartItem.objects.values_list('product__name', 'quantity'))
+
+    def test_bulk_merges_into_existing_lines(self):
+        first, second = self.products[:2]
+        self.client.post(
+            reverse('cart-item-list'), {'product_id': first.id, 'quantity': 1}, format='json'
+        )
+        self.client.get(reverse('cart'))
+        response = self.bulk([(first, 2), (second, 1), (second, 1)])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.quantities(), {'Product 0': 3, 'Product 1': 2})
+        self.assertEqual(response.data['total'], Decimal('12.50'))
+        # The cached cart snapshot was dropped.
+        self.assertEqual(len(self.client.get(reverse('cart')).data['items']), 2)
+
+    def test_bulk_query_count_is_fixed(self):
+        with CaptureQueriesContext(connection) as three_lines:
+            self.bulk([(product, 1) for product in self.products[:3]])
+        with CaptureQueriesContext(connection) as thirty_lines:
+            self.bulk([(product, 1) for product in self.products])
+        self.assertEqual(len(three_lines), len(thirty_lines))
+        self.assertEqual(len(self.quantities()), 30)
+
+    def test_bulk_checks_stock_of_merged_quantities(self):
+        self.bulk([(self.products[0], 4)])
+        response = self.bulk([(self.products[0], 2), (self.products[1], 1)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.quantities(), {'Product 0': 4})
+        Product.objects.filter(pk=self.products[2].pk).update(is_active=False)
+        self.assertEqual(
+            self.bulk([(self.products[2], 1)]).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_concurrent_adds_of_a_product_both_count(self):
+        product = self.products[0]
+        CartItem.objects.create(cart=self.user.cart, product=product, quantity=1)
+        check_cart_lines = carts.check_cart_lines
+        calls = []
+
+        def check_then_add_concurrently(*args):
+            if not calls:
+                # Another request adds the product once this one has checked.
+                CartItem.objects.filter(product=product).update(quantity=F('quantity') + 1)
+            calls.append(args)
+            return check_cart_lines(*args)
+
+        with mock.patch.object(carts, 'check_cart_lines', check_then_add_concurrently):
+            self.bulk([(product, 2)])
+        self.assertEqual(self.quantities(), {'Product 0': 4})
+
+    def test_adding_a_product_twice_merges_the_line(self):
+        url = reverse('cart-item-list')
+        payload = {'product_id': self.products[0].id, 'quantity': 2}
+        self.assertEqual(
+            self.client.post(url, payload, format='json').status_code, status.HTTP_201_CREATED
+        )
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 4)
+        self.assertEqual(
+            self.client.post(url, payload, format='json').status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class GuestCartTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=3)
+        self.mug = Product.objects.create(name='Mug', price=Decimal('5.50'), stock=10)
+
+    def add(self, lines, token=None):
+        payload = {'items': [{'product_id': p.id, 'quantity': q} for p, q in lines]}
+        if token:
+            payload['token'] = token
+        return self.client.post(reverse('guest-cart'), payload, format='json')
+
+    def test_guest_cart_lives_in_the_token(self):
+        token = self.add([(self.lamp, 1)]).data['token']
+        response = self.add([(self.lamp, 1), (self.mug, 2)], token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['product']['name'], item['quantity']) for item in response.data['items']],
+            [('Lamp', 2), ('Mug', 2)],
+        )
+        self.assertEqual(response.data['total'], Decimal('51.00'))
+        read = self.client.get(reverse('guest-cart'), {'token': response.data['token']})
+        self.assertEqual(read.data['items'], response.data['items'])
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_guest_cart_checks_stock_and_replaces(self):
+        token = self.add([(self.lamp, 2)]).data['token']
+        self.assertEqual(self.add([(self.lamp, 2)], token).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put(
+            reverse('guest-cart'),
+            {'token': token, 'items': [{'product_id': self.mug.id, 'quantity': 1}]},
+            format='json',
+        )
+        self.assertEqual([item['product']['name'] for item in response.data['items']], ['Mug'])
+
+    def test_tampered_token_is_rejected(self):
+        token = self.add([(self.lamp, 1)]).data['token']
+        response = self.client.get(reverse('guest-cart'), {'token': token[:-2] + 'xx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login_merges_the_guest_cart(self):
+        user = User.objects.create_user(username='buyer', password='password123')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.lamp, quantity=1)
+        token = self.add([(self.lamp, 2), (self.mug, 3)]).data['token']
+        self.mug.is_active = False
+        self.mug.save()
+        # A retried login merges the same token again.
+        for _ in range(2):
+            response = self.client.post(
+                reverse('token_obtain_pair'),
+                {'username': 'buyer', 'password': 'password123', 'guest_cart': token},
+                format='json',
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The larger of the two lamp quantities; the deactivated mug is dropped.
+        self.assertEqual(
+            dict(cart.items.values_list('product__name', 'quantity')), {'Lamp': 2}
+        )
+
+    def test_reading_an_empty_cart_writes_nothing(self):
+        user = User.objects.create_user(username='buyer', password='password123')
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.data['items'], [])
+        self.assertEqual(response.data['total'], Decimal('0.00'))
+        response = self.client.post(reverse('order-list'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Cart.objects.exists())
+
+
+class IdempotencyKeyTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=5)
+        CartItem.objects.create(
+            cart=Cart.objects.create(user=self.user), product=self.product, quantity=2
+        )
+
+    def post(self, url, key):
+        return self.client.post(url, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_checkout_replays_the_order(self):
+        first = self.post(reverse('order-list'), 'checkout-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        retry = self.post(reverse('order-list'), 'checkout-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        # Without the key the empty cart is reported as usual.
+        self.assertEqual(
+            self.client.post(reverse('order-list')).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_retried_payment_replays_instead_of_failing(self):
+        order_id = self.post(reverse('order-list'), 'checkout').data['id']
+        url = reverse('order-pay', args=[order_id])
+        paid = self.post(url, 'pay')
+        retry = self.post(url, 'pay')
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.json()['status'], Order.STATUS_PAID)
+        self.assertEqual(retry.json()['updated_at'], paid.json()['updated_at'])
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        order_id = self.post(reverse('order-list'), 'reused').data['id']
+        response = self.post(reverse('order-pay', args=[order_id]), 'reused')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.get().status, Order.STATUS_PENDING)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_duplicate_of_an_unfinished_request(self):
+        self.post(reverse('order-list'), 'running')
+        # As if the first request were still running.
+        IdempotencyKey.objects.update(status_code=None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(reverse('order-list'), 'running')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        # Waiting reads the claim without taking the write lock.
+        self.assertFalse(
+            [q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'DELETE'))]
+        )
+        # Until its claim is considered abandoned and the retry runs again.
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        response = self.post(reverse('order-list'), 'running')
+        self.assertEqual(response.data, {'detail': 'Cart is empty.'})
+
+    def test_server_errors_release_the_key(self):
+        with mock.patch.object(
+            OrderItem.objects, 'bulk_create', side_effect=RuntimeError('boom')
+        ), self.assertRaises(RuntimeError):
+            self.post(reverse('order-list'), 'flaky')
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(
+            self.post(reverse('order-list'), 'flaky').status_code, status.HTTP_201_CREATED
+        )
+
+    def test_response_is_stored_with_the_order(self):
+        with mock.patch.object(
+            JSONRenderer, 'render', side_effect=RuntimeError('crash')
+        ), self.assertRaises(RuntimeError):
+            self.post(reverse('order-list'), 'crash')
+        # The order went with the response, so the retry places it.
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(
+            self.post(reverse('order-list'), 'crash').status_code, status.HTTP_201_CREATED
+        )
+
+    def test_prune_deletes_expired_keys(self):
+        self.post(reverse('order-list'), 'old')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        call_command('prune_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class CatalogCacheTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=3)
+
+    def test_warm_catalog_is_served_without_queries(self):
+        url = reverse('product-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_get_returns_not_modified(self):
+        url = reverse('product-detail', args=[self.product.id])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified.content, b'')
+
+        since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_product_save_invalidates_catalog(self):
+        url = reverse('product-detail', args=[self.product.id])
+        etag = self.client.get(url)['ETag']
+        self.product.price = Decimal('25.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['price'], '25.00')
+
+    def test_checkout_only_expires_pages_showing_the_stock_bought(self):
+        desk = Product.objects.create(name='Desk', price=Decimal('80.00'), stock=4)
+        lamp_url = reverse('product-detail', args=[self.product.id])
+        desk_url = reverse('product-detail', args=[desk.id])
+        for url in (lamp_url, desk_url, reverse('product-list')):
+            self.client.get(url)
+        buyer = User.objects.create_user(username='buyer')
+        CartItem.objects.create(
+            cart=Cart.objects.create(user=buyer), product=self.product, quantity=2
+        )
+        self.client.force_authenticate(user=buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.force_authenticate(user=None)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(desk_url).json()['stock'], 4)
+        self.assertEqual(self.client.get(lamp_url).json()['stock'], 1)
+        listed = self.client.get(reverse('product-list')).json()['results']
+        self.assertEqual([p['stock'] for p in listed], [4, 1])
+
+    def test_list_last_modified_moves_when_a_product_leaves(self):
+        Product.objects.create(name='Desk', price=Decimal('80.00'), stock=1)
+        url = reverse('product-list')
+        with mock.patch('store.cache._new_version', return_value=1_000 * 10**9):
+            last_modified = self.client.get(url)['Last-Modified']
+        self.product.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        with mock.patch('store.cache._new_version', return_value=2_000 * 10**9):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['name'] for p in response.json()['results']], ['Desk'])
+
+
+class ProductSearchTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.lamp = Product.objects.create(
+            name='Lampe de bureau', description='Lumière LED', price=Decimal('30.00'), stock=4
+        )
+        self.desk = Product.objects.create(
+            name='Bureau en chêne', description='Grand plateau, idéal avec une lampe',
+            price=Decimal('250.00'), stock=1,
+        )
+        Product.objects.create(name='Chaise', price=Decimal('45.00'), stock=8)
+
+    def search(self, query):
+        response = self.client.get(reverse('product-list'), {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_search_ranks_and_matches_prefixes(self):
+        self.assertEqual(self.search('lamp'), [self.lamp.id, self.desk.id])
+        self.assertEqual(self.search('bur lam'), [self.lamp.id, self.desk.id])
+        self.assertEqual(self.search('lumiere'), [self.lamp.id])
+        self.assertEqual(self.search('"*'), [])
+
+    @override_settings(PRODUCT_SEARCH_LIMIT=1)
+    def test_limit_only_counts_products_the_list_shows(self):
+        Product.objects.filter(pk=self.lamp.pk).update(is_active=False)
+        self.assertEqual(self.search('lampe'), [self.desk.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.lamp.name = 'Applique murale'
+        self.lamp.description = ''
+        self.lamp.save()
+        self.assertEqual(self.search('applique'), [self.lamp.id])
+        self.assertEqual(self.search('lampe'), [self.desk.id])
+
+        Product.objects.bulk_create([Product(name='Lampadaire', price=Decimal('80.00'))])
+        self.assertEqual(len(self.search('lampadaire')), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rebuild_index(), 4)
+        self.assertEqual(len(self.search('lampadaire')), 1)
+
+        self.desk.delete()
+        self.assertEqual(self.search('bureau'), [])
+
+    def test_like_fallback_without_fts(self):
+        with mock.patch('store.search.fts_enabled', return_value=False):
+            self.assertEqual(self.search('lampe'), [self.lamp.id, self.desk.id])
+
+
+class ShardedStockTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = Product.objects.create(name='Console', price=Decimal('299.00'), stock=10)
+        self.product.shard_stock(4)
+        self.client.force_authenticate(user=self.user)
+
+    def test_stock_reads_as_sum_of_shards(self):
+        self.assertEqual(
+            sorted(self.product.stock_shards.values_list('quantity', flat=True)), [2, 2, 3, 3]
+        )
+        response = self.client.get(reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(response.json()['stock'], 10)
+
+    def test_checkout_claims_across_shards(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=7)
+        response = self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['items'][0]['product']['stock'], 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.available_stock, 3)
+
+    def test_checkout_cannot_oversell_sharded_stock(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=11)
+        response = self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.product.available_stock, 10)
+
+    def test_resharding_reads_the_stock_under_its_lock(self):
+        loaded = Product.objects.prefetch_related('stock_shards').get(pk=self.product.pk)
+        # A checkout claims after the product was loaded.
+        self.assertTrue(self.product.claim_sharded_stock(3))
+        loaded.shard_stock(2)
+        self.assertEqual(
+            sorted(loaded.stock_shards.values_list('quantity', flat=True)), [3, 4]
+        )
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_claims_move_updated_at_without_the_product_row(self):
+        since = timezone.now()
+        row_updated_at = Product.objects.get(pk=self.product.pk).updated_at
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=3)
+        self.client.post(reverse('order-list'), {}, format='json')
+        self.assertEqual(Product.objects.get(pk=self.product.pk).updated_at, row_updated_at)
+        response = self.client.get(reverse('product-list'), {'updated_since': since.isoformat()})
+        [product] = response.json()['results']
+        self.assertEqual(product['stock'], 7)
+        self.assertGreater(parse_datetime(product['updated_at']), since)
+        cache.clear()
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            serialized = self.client.get(reverse('product-list')).json()['results']
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('product-list')).json()['results'], serialized)
+        self.assertEqual(serialized[0]['updated_at'], product['updated_at'])
+
+    def test_unsharding_folds_stock_back(self):
+        self.product.shard_stock(0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertFalse(self.product.stock_shards.exists())
+
+
+class StaffBoardTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+        self.alice = User.objects.create_user(username='alice', password='password123')
+        self.bob = User.objects.create_user(username='bob', password='password123')
+        self.product = Product.objects.create(name='Mug', description='x' * 500, price=Decimal('6.00'), stock=50)
+        self.paid = self.make_order(self.alice, [(self.product, 2)] * 2, Order.STATUS_PAID)
+        self.pending = self.make_order(self.bob, [(self.product, 2)])
+        self.client.force_authenticate(user=self.staff)
+
+    def board(self, **params):
+        response = self.client.get(reverse('order-board'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_board_returns_slim_projection(self):
+        orders = self.board()
+        self.assertEqual([order['id'] for order in orders], [self.pending.id, self.paid.id])
+        paid = orders[1]
+        self.assertEqual(paid['username'], 'alice')
+        self.assertEqual(paid['item_count'], 4)
+        self.assertEqual(
+            set(paid['items'][0]), {'id', 'name', 'quantity', 'prepared_quantity'}
+        )
+        self.assertEqual(paid['items'][0]['name'], 'Mug')
+
+    def test_board_filters(self):
+        self.assertEqual([o['id'] for o in self.board(status='paid')], [self.paid.id])
+        self.assertEqual([o['id'] for o in self.board(q='bo')], [self.pending.id])
+        self.assertEqual([o['id'] for o in self.board(q=f'#{self.paid.id}')], [self.paid.id])
+        today = self.paid.placed_at.date()
+        self.assertEqual(len(self.board(placed_from=today, placed_to=today)), 2)
+        self.assertEqual(self.board(placed_to=today.replace(year=today.year - 1)), [])
+        response = self.client.get(reverse('order-board'), {'status': 'lost'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_board_query_count_is_fixed(self):
+        for _ in range(5):
+            self.make_order(self.alice, [(self.product, 2)] * 3, Order.STATUS_PAID)
+        with self.assertNumQueries(2):
+            self.board()
+
+    def test_board_is_staff_only(self):
+        self.client.force_authenticate(user=self.alice)
+        response = self.client.get(reverse('order-board'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BatchFulfillmentTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+        self.buyer = User.objects.create_user(username='buyer', password='password123')
+        self.product = Product.objects.create(name='Mug', price=Decimal('6.00'), stock=50)
+        self.lines = [(self.product, 2)] * 2
+        self.client.force_authenticate(user=self.staff)
+
+    def prepare_op(self, order, prepared=2):
+        return {
+            'id': order.id,
+            'action': 'prepare',
+            'items': [{'id': item.id, 'prepared_quantity': prepared} for item in order.items.all()],
+        }
+
+    def fulfill(self, operations):
+        return self.client.post(reverse('order-fulfill'), {'orders': operations}, format='json')
+
+    def test_batch_applies_state_machine_per_order(self):
+        full = self.make_order(self.buyer, self.lines, Order.STATUS_PAID)
+        partial = self.make_order(self.buyer, self.lines, Order.STATUS_PAID)
+        pending = self.make_order(self.buyer, self.lines)
+        response = self.fulfill(
+            [
+                self.prepare_op(full),
+                {'id': full.id, 'action': 'ready_to_ship'},
+                {'id': full.id, 'action': 'ship'},
+                self.prepare_op(partial, prepared=1),
+                {'id': partial.id, 'action': 'ready_to_ship'},
+                self.prepare_op(pending),
+                {'id': 999999, 'action': 'ship'},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        outcomes = [(r['ok'], r['status'], r['detail']) for r in response.data['results']]
+        self.assertEqual(
+            outcomes,
+            [
+                (True, Order.STATUS_PREPARED, None),
+                (True, Order.STATUS_READY_TO_SHIP, None),
+                (True, Order.STATUS_SHIPPED, None),
+                (True, Order.STATUS_PAID, None),
+                (False, Order.STATUS_PAID, 'Order must be prepared first.'),
+                (False, Order.STATUS_PENDING, 'Order must be paid before preparation.'),
+                (False, None, 'Not found.'),
+            ],
+        )
+        full.refresh_from_db()
+        partial.refresh_from_db()
+        self.assertEqual(full.status, Order.STATUS_SHIPPED)
+        self.assertEqual(partial.status, Order.STATUS_PAID)
+        self.assertEqual(
+            list(partial.items.values_list('prepared_quantity', flat=True)), [1, 1]
+        )
+        self.assertFalse(pending.items.filter(prepared_quantity__gt=0).exists())
+
+    def test_batch_query_count_is_fixed(self):
+        def run(count):
+            operations = [
+                self.prepare_op(self.make_order(self.buyer, self.lines, Order.STATUS_PAID))
+                for _ in range(count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.fulfill(operations)
+            self.assertTrue(all(r['ok'] for r in response.data['results']))
+            return len(ctx.captured_queries)
+
+        self.assertEqual(run(2), run(20))
+
+    def test_batch_is_staff_only(self):
+        self.client.force_authenticate(user=self.buyer)
+        response = self.fulfill([{'id': 1, 'action': 'ship'}])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(ORDER_FEED_SETTLE_SECONDS=0)
+class OrderChangeFeedTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+        self.buyer = User.objects.create_user(username='buyer', password='password123')
+        self.order = Order.objects.create(user=self.buyer, total_amount=Decimal('12.00'))
+        self.client.force_authenticate(user=self.staff)
+
+    def changes(self, since=None):
+        params = {'since': since} if since else {}
+        response = self.client.get(reverse('order-changes'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_changes_are_incremental(self):
+        cursor = self.changes()['cursor']
+        self.assertEqual(self.changes(cursor)['changes'], [])
+
+        self.client.post(reverse('order-pay', args=[self.order.id]), {}, format='json')
+        feed = self.changes(cursor)
+        self.assertEqual(
+            [(c['id'], c['status'], c['username']) for c in feed['changes']],
+            [(self.order.id, Order.STATUS_PAID, 'buyer')],
+        )
+        self.assertEqual(self.changes(feed['cursor'])['changes'], [])
+
+        self.client.post(reverse('order-ship', args=[self.order.id]), {}, format='json')
+        feed = self.changes(feed['cursor'])
+        self.assertEqual([c['status'] for c in feed['changes']], [Order.STATUS_SHIPPED])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('order-changes'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_event_stream_sends_changes_and_checks_staff(self):
+        url = reverse('order-events')
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        buyer_token = str(AccessToken.for_user(self.buyer))
+        self.assertEqual(
+            self.client.get(url, {'token': buyer_token}).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        response = self.client.get(
+            url, {'token': str(AccessToken.for_user(self.staff)), 'since': '0-0'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: order', body)
+        self.assertIn(f'"id": {self.order.id}', body)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyer = User.objects.create_user(username='buyer', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        self.lamp, self.chair = Product.objects.bulk_create(
+            [
+                Product(name='Lamp', price=Decimal('20.00'), stock=5),
+                Product(name='Chair', price=Decimal('50.00'), stock=5),
+            ]
+        )
+        self.order = Order.objects.create(user=self.buyer, total_amount=Decimal('20.00'))
+        self.cancelled = Order.objects.create(user=self.buyer, total_amount=Decimal('50.00'))
+        Order.objects.create(user=self.other, total_amount=Decimal('50.00'))
+        self.since = timezone.now().isoformat()
+
+    def test_products_since_only_returns_changes_and_tombstones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp.price = Decimal('25.00')
+            self.lamp.save()
+            self.chair.is_active = False
+            self.chair.save()
+        response = self.client.get(reverse('product-list'), {'updated_since': self.since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lamp, chair = response.json()['results']
+        self.assertEqual((lamp['id'], lamp['price']), (self.lamp.id, '25.00'))
+        self.assertEqual(set(chair), {'id', 'updated_at', 'tombstone'})
+        self.assertEqual(chair['id'], self.chair.id)
+
+        response = self.client.get(
+            reverse('product-list'), {'updated_since': timezone.now().isoformat()}
+        )
+        self.assertEqual(response.json()['results'], [])
+
+    def test_orders_since_are_scoped_to_user(self):
+        self.client.force_authenticate(user=self.buyer)
+        Order.objects.filter(pk=self.cancelled.pk).update(
+            status=Order.STATUS_CANCELLED, updated_at=timezone.now()
+        )
+        self.client.post(reverse('order-pay', args=[self.order.id]), {}, format='json')
+        response = self.client.get(reverse('order-list'), {'updated_since': self.since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cancelled, paid = response.data['results']
+        self.assertEqual(cancelled, {
+            'id': self.cancelled.id,
+            'updated_at': cancelled['updated_at'],
+            'tombstone': True,
+        })
+        self.assertEqual((paid['id'], paid['status']), (self.order.id, Order.STATUS_PAID))
+
+    def test_cursor_resumes_after_equal_timestamps(self):
+        stamp = timezone.now()
+        Product.objects.filter(pk__in=[self.lamp.pk, self.chair.pk]).update(updated_at=stamp)
+        first = self.client.get(
+            reverse('product-list'), {'updated_since': self.since, 'page_size': 1}
+        ).json()
+        self.assertEqual([p['id'] for p in first['results']], [self.lamp.id])
+        rest = self.client.get(
+            reverse('product-list'), {'updated_since': first['cursor']}
+        ).json()
+        self.assertEqual([p['id'] for p in rest['results']], [self.chair.id])
+        done = self.client.get(reverse('product-list'), {'updated_since': rest['cursor']})
+        self.assertEqual(done.json(), {**done.json(), 'results': [], 'cursor': rest['cursor']})
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_recent_changes_wait_until_they_settle(self):
+        Order.objects.filter(pk=self.order.pk).update(updated_at=timezone.now())
+        self.client.force_authenticate(user=self.buyer)
+        params = {'updated_since': (timezone.now() - timedelta(minutes=5)).isoformat()}
+        self.assertEqual(self.client.get(reverse('order-list'), params).data['results'], [])
+        Order.objects.filter(pk=self.order.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=2)
+        )
+        results = self.client.get(reverse('order-list'), params).data['results']
+        self.assertEqual([order['id'] for order in results], [self.order.id])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_sync_pages_are_not_served_from_the_catalog_cache(self):
+        params = {'updated_since': (timezone.now() - timedelta(minutes=5)).isoformat()}
+        settled = timezone.now() - timedelta(minutes=2)
+        desk = Product.objects.create(name='Desk', price=Decimal('80.00'), stock=2)
+        self.assertEqual(self.client.get(reverse('product-list'), params).json()['results'], [])
+        # The settle window passes.
+        Product.objects.filter(pk=desk.pk).update(updated_at=settled)
+        results = self.client.get(reverse('product-list'), params).json()['results']
+        self.assertEqual([p['id'] for p in results], [desk.id])
+
+        CartItem.objects.create(
+            cart=Cart.objects.create(user=self.buyer), product=self.lamp, quantity=1
+        )
+        self.client.force_authenticate(user=self.buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('order-list'), {}, format='json')
+        Product.objects.filter(pk=self.lamp.pk).update(updated_at=settled + timedelta(minutes=1))
+        results = self.client.get(reverse('product-list'), params).json()['results']
+        self.assertEqual(
+            [(p['id'], p['stock']) for p in results], [(desk.id, 2), (self.lamp.id, 4)]
+        )
+
+    def test_invalid_timestamp_is_rejected(self):
+        response = self.client.get(reverse('product-list'), {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('updated_since', response.data)
+
+
+class TokenAuthenticationTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user(
+            username='buyer', password='password123', email='buyer@example.com'
+        )
+
+    def obtain_tokens(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'),
+            {'username': 'buyer', 'password': 'password123'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def user_queries(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('me'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, [q for q in queries.captured_queries if 'auth_user' in q['sql']]
+
+    def test_claims_authenticate_without_loading_the_user(self):
+        profile, queries = self.user_queries(self.obtain_tokens()['access'])
+        self.assertEqual(queries, [])
+        self.assertEqual(
+            profile,
+            {
+                'username': 'buyer',
+                'email': 'buyer@example.com',
+                'is_staff': False,
+                'is_superuser': False,
+            },
+        )
+
+    def test_tokens_without_claims_use_the_user_cache(self):
+        access = str(AccessToken.for_user(User.objects.get(username='buyer')))
+        self.assertEqual(len(self.user_queries(access)[1]), 1)
+        self.assertEqual(self.user_queries(access)[1], [])
+
+        User.objects.filter(username='buyer').get().save()
+        self.assertEqual(len(self.user_queries(access)[1]), 1)
+
+    def test_refresh_picks_up_profile_changes(self):
+        refresh = self.obtain_tokens()['refresh']
+        User.objects.filter(username='buyer').update(is_staff=True)
+        response = self.client.post(
+            reverse('token_refresh'), {'refresh': refresh}, format='json'
+        )
+        profile, _ = self.user_queries(response.data['access'])
+        self.assertTrue(profile['is_staff'])
+
+    def test_token_user_can_checkout_and_pay(self):
+        product = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=5)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.obtain_tokens()['access']}")
+        self.client.post(
+            reverse('cart-item-list'), {'product_id': product.id, 'quantity': 1}, format='json'
+        )
+        order = self.client.post(reverse('order-list'), {}, format='json').data
+        response = self.client.post(reverse('order-pay', args=[order['id']]), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Order.STATUS_PAID)
+
+
+class SQLiteProfileTests(StoreAPITestCase):
+    def test_production_profile(self):
+        database = sqlite_database('db.sqlite3', 'production')
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('PRAGMA journal_mode=WAL', database['OPTIONS']['init_command'])
+        self.assertGreater(database['CONN_MAX_AGE'], 0)
+        self.assertNotIn('OPTIONS', sqlite_database('db.sqlite3', 'default'))
+        with self.assertRaises(ValueError):
+            sqlite_database('db.sqlite3', 'fast')
+
+    def test_production_profile_is_opt_in(self):
+        with mock.patch.dict('os.environ', clear=True):
+            self.assertNotIn('OPTIONS', sqlite_database('db.sqlite3'))
+        with mock.patch.dict('os.environ', {'SQLITE_CONN_MAX_AGE': '0'}):
+            self.assertEqual(sqlite_database('db.sqlite3', 'production')['CONN_MAX_AGE'], 0)
+
+    def test_replicas_are_opened_read_only(self):
+        options = sqlite_database('replica.sqlite3', 'production', replica=True)['OPTIONS']
+        self.assertNotIn('journal_mode', options['init_command'])
+        self.assertIn('PRAGMA query_only=ON', options['init_command'])
+        self.assertNotIn('transaction_mode', options)
+
+    def test_pragmas_are_applied_to_connections(self):
+        if connection.settings_dict['OPTIONS'].get('transaction_mode') != 'IMMEDIATE':
+            self.skipTest('SQLITE_PROFILE is not production.')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_checkpoint_skips_databases_without_wal(self):
+        out = StringIO()
+        call_command('sqlite_checkpoint', stdout=out)
+        self.assertIn('nothing to checkpoint', out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=5)
+        self.client.force_authenticate(user=self.user)
+
+    def test_reads_leave_the_primary_until_the_first_write(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Product), DEFAULT_DB_ALIAS)
+        with routing_scope():
+            allow_replica_reads()
+            self.assertEqual(router.db_for_read(Product), 'replica')
+            self.assertEqual(router.db_for_write(Order), DEFAULT_DB_ALIAS)
+            self.assertEqual(router.db_for_read(Product), DEFAULT_DB_ALIAS)
+        with routing_scope():
+            self.assertEqual(router.db_for_read(Product), DEFAULT_DB_ALIAS)
+
+    def test_history_reads_use_replicas_and_catalog_misses_do_not(self):
+        with mock.patch.object(PrimaryReplicaRouter, 'replica', return_value='replica') as replica:
+            self.client.get(reverse('order-list'))
+            replica.assert_called()
+
+            replica.reset_mock()
+            self.client.get(reverse('product-list'))
+            replica.assert_not_called()
+
+            self.client.post(
+                reverse('cart-item-list'),
+                {'product_id': self.product.id, 'quantity': 1},
+                format='json',
+            )
+            response = self.client.post(reverse('order-list'), {}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            replica.assert_not_called()
+
+    def test_reads_stay_on_the_primary_just_after_a_write(self):
+        self.client.post(
+            reverse('cart-item-list'),
+            {'product_id': self.product.id, 'quantity': 1},
+            format='json',
+        )
+        order_id = self.client.post(reverse('order-list'), {}, format='json').data['id']
+        with mock.patch.object(PrimaryReplicaRouter, 'replica', return_value='replica') as replica:
+            self.client.get(reverse('order-list'))
+            self.client.get(reverse('order-detail', args=[order_id]))
+            replica.assert_not_called()
+
+            cache.delete(RECENT_WRITE_KEY.format(user_id=self.user.pk))
+            self.client.get(reverse('order-list'))
+            replica.assert_called()
+
+
+class FastListSerializationTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        lamp = Product.objects.create(
+            name='Lampe de bureau', description='Lampe LED', price=Decimal('19.90'), stock=7
+        )
+        chair = Product.objects.create(name='Chaise', price=Decimal('45.00'), stock=12)
+        chair.shard_stock(3)
+        for lamps, chairs in ((1, 2), (3, 1)):
+            self.make_order(self.user, [(lamp, lamps), (chair, chairs)])
+        self.client.force_authenticate(user=self.user)
+
+    def assertSameBytes(self, url, params=None):
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            cache.clear()
+            expected = self.client.get(url, params)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+        return len(queries)
+
+    def test_product_pages_match_the_serializer(self):
+        self.assertSameBytes(reverse('product-list'))
+        self.assertSameBytes(reverse('product-list'), {'page_size': 1})
+        self.assertSameBytes(reverse('product-list'), {'q': 'lampe'})
+        self.assertSameBytes(reverse('product-list'), {'offset': 1})
+
+    def test_order_pages_match_the_serializer(self):
+        self.assertSameBytes(reverse('order-list'))
+        self.assertEqual(self.assertSameBytes(reverse('order-list'), {'page_size': 1}), 3)
+
+    def test_sparse_product_pages_match_the_serializer(self):
+        url = reverse('product-list')
+        self.assertSameBytes(url, {'fields': 'id,name,stock'})
+        self.assertSameBytes(url, {'fields': 'price', 'q': 'lampe'})
+        self.assertSameBytes(url, {'fields': 'id', 'page_size': 1})
+        product = self.client.get(url, {'fields': 'name, stock'}).data['results'][0]
+        self.assertEqual(product, {'name': 'Chaise', 'stock': 12})
+
+    def test_sparse_order_pages_match_the_serializer(self):
+        url = reverse('order-list')
+        for params in (
+            {'fields': 'id,status'},
+            {'fields': 'id,user,items'},
+            {'fields': 'items', 'expand': 'items.product'},
+            {'fields': 'total_amount,items.subtotal,items.product.stock'},
+            {'expand': ''},
+        ):
+            self.assertSameBytes(url, params)
+        order = self.client.get(url, {'fields': 'id,items.quantity,items.product'}).data
+        lamp = Product.objects.get(name='Lampe de bureau')
+        self.assertEqual(order['results'][0]['items'][0], {'product': lamp.id, 'quantity': 3})
+
+    def test_sparse_reads_load_only_the_selected_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('order-list'), {'fields': 'id,items.quantity'})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('store_product', sql)
+        self.assertNotIn('username', sql)
+        order = Order.objects.first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('order-detail', args=[order.id]), {'fields': 'id,items.product.name'}
+            )
+        self.assertEqual(
+            response.data['items'],
+            [{'product': {'name': 'Lampe de bureau'}}, {'product': {'name': 'Chaise'}}],
+        )
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('store_productstockshard', sql)
+        self.assertEqual(len(queries), 2)
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_sparse_product_detail_and_sync(self):
+        chair = Product.objects.get(name='Chaise')
+        response = self.client.get(reverse('product-detail', args=[chair.id]), {'fields': 'stock'})
+        self.assertEqual(response.data, {'stock': 12})
+        chair.is_active = False
+        chair.save()
+        since = (chair.updated_at - timedelta(seconds=1)).isoformat()
+        response = self.client.get(
+            reverse('product-list'), {'fields': 'name', 'updated_since': since}
+        )
+        lamp, tombstone = response.data['results']
+        self.assertEqual(lamp, {'name': 'Lampe de bureau'})
+        self.assertEqual((tombstone['id'], tombstone['tombstone']), (chair.id, True))
+
+    def test_unknown_fields_are_rejected(self):
+        for url, params in (
+            (reverse('product-list'), {'fields': 'id,secret'}),
+            (reverse('product-list'), {'fields': 'name.first'}),
+            (reverse('product-list'), {'expand': 'stock'}),
+            (reverse('order-list'), {'fields': 'items.product.cost'}),
+            (reverse('order-list'), {'fields': ','}),
+        ):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(
+            username='staff', password='password123', is_staff=True
+        )
+        self.buyer = User.objects.create_user(username='buyer', password='password123')
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=5)
+        Product.objects.create(name='Old chair', price=Decimal('45.00'), is_active=False)
+        self.orders = [
+            self.make_order(self.buyer, [(self.lamp, quantity)]) for quantity in (1, 2, 3)
+        ]
+        self.make_order(self.buyer, order_status=Order.STATUS_PAID)
+        self.client.force_authenticate(user=self.staff)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse(f'{name}-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_orders_ndjson_matches_the_api_rows(self):
+        response, body = self.export('order', status='pending')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [order.id for order in self.orders])
+        api = self.client.get(reverse('order-list')).json()['results']
+        self.assertEqual(rows, [row for row in reversed(api) if row['status'] == 'pending'])
+
+    def test_orders_csv_has_one_line_per_item(self):
+        response, body = self.export('order', output='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(
+            [(line['quantity'], line['subtotal']) for line in lines[:3]],
+            [('1', '20.00'), ('2', '40.00'), ('3', '60.00')],
+        )
+        self.assertEqual((lines[3]['status'], lines[3]['item_id']), ('paid', ''))
+
+    def test_products_export_includes_inactive_products(self):
+        _, body = self.export('product', output='csv')
+        names = [line['name'] for line in csv.DictReader(StringIO(body))]
+        self.assertEqual(names, ['Lamp', 'Old chair'])
+
+    def test_export_is_staff_only_and_checks_output(self):
+        self.assertEqual(
+            self.client.get(reverse('order-export'), {'output': 'xlsx'}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.client.force_authenticate(user=self.buyer)
+        self.assertEqual(
+            self.client.get(reverse('order-export')).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+
+class OrderArchiveTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.buyer = User.objects.create_user(username='buyer')
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=50)
+        self.chair = Product.objects.create(name='Chair', price=Decimal('45.50'), stock=50)
+        old = timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS + 1)
+        self.orders = {}
+        for name, order_status, updated_at in (
+            ('shipped', Order.STATUS_SHIPPED, old),
+            ('cancelled', Order.STATUS_CANCELLED, old),
+            ('recent', Order.STATUS_SHIPPED, timezone.now()),
+            ('paid', Order.STATUS_PAID, old),
+        ):
+            order = self.make_order(self.buyer, [(self.lamp, 2), (self.chair, 2)], order_status)
+            Order.objects.filter(pk=order.pk).update(updated_at=updated_at)
+            self.orders[name] = order.pk
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_orders', *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_old_finished_orders_with_their_items(self):
+        self.assertIn('2 orders would be archived', self.archive('--dry-run'))
+        self.assertEqual(ArchivedOrder.objects.count(), 0)
+        self.assertIn('Archived 1 orders', self.archive('--batch-size=1', '--max-batches=1'))
+        self.assertIn('Archived 1 orders', self.archive())
+        archived = {self.orders['shipped'], self.orders['cancelled']}
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), archived)
+        self.assertEqual(ArchivedOrderItem.objects.filter(order_id__in=archived).count(), 4)
+        self.assertFalse(Order.objects.filter(pk__in=archived).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id__in=archived).exists())
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_customer_history_is_unchanged(self):
+        self.client.force_authenticate(user=self.buyer)
+        detail_url = reverse('order-detail', args=[self.orders['shipped']])
+        responses = []
+        for _ in range(2):
+            for fast in (True, False):
+                with override_settings(FAST_LIST_SERIALIZATION=fast):
+                    responses.append(
+                        (
+                            self.client.get(reverse('order-list')).content,
+                            self.client.get(detail_url).content,
+                            self.client.get(reverse('order-list'), {'fields': 'id,items'}).content,
+                        )
+                    )
+            self.archive()
+        self.assertEqual(len(json.loads(responses[0][0])['results']), 4)
+        self.assertEqual(responses, [responses[0]] * 4)
+
+    def test_archived_orders_are_read_only_and_off_the_staff_board(self):
+        self.archive()
+        shipped = self.orders['shipped']
+        self.client.force_authenticate(user=self.staff)
+        ids = [order['id'] for order in self.client.get(reverse('order-list')).data['results']]
+        self.assertNotIn(shipped, ids)
+        self.assertEqual(
+            self.client.get(reverse('order-detail', args=[shipped])).data['status'], 'shipped'
+        )
+        response = self.client.patch(
+            reverse('order-set-status', args=[shipped]), {'status': 'pending'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        export = self.client.get(reverse('order-export'))
+        self.assertEqual(len(b''.join(export.streaming_content).splitlines()), 4)
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_staff_sync_drops_archived_orders(self):
+        since = timezone.now().isoformat()
+        self.archive()
+        self.client.force_authenticate(user=self.staff)
+        params = {'updated_since': since}
+        results = self.client.get(reverse('order-list'), params).data['results']
+        self.assertEqual(
+            [(order['id'], order.get('tombstone')) for order in results],
+            [(self.orders['shipped'], True), (self.orders['cancelled'], True)],
+        )
+        sparse = self.client.get(reverse('order-list'), {**params, 'fields': 'id,status'})
+        self.assertEqual(sparse.data['results'], results)
+        # Customers keep archived orders in their history.
+        self.client.force_authenticate(user=self.buyer)
+        self.assertEqual(self.client.get(reverse('order-list'), params).data['results'], [])
+
+    def test_sales_aggregates_still_count_archived_orders(self):
+        rebuild_sales_aggregates()
+        before = list(DailySales.objects.values('day', 'status', 'order_count', 'revenue'))
+        products = list(DailyProductSales.objects.values('day', 'product', 'units', 'revenue'))
+        self.archive()
+        rebuild_sales_aggregates()
+        self.assertCountEqual(
+            DailySales.objects.values('day', 'status', 'order_count', 'revenue'), before
+        )
+        self.assertCountEqual(
+            DailyProductSales.objects.values('day', 'product', 'units', 'revenue'), products
+        )
+
+    @override_settings(ROOT_URLCONF='config.urls_async')
+    def test_async_history_includes_archived_orders(self):
+        self.archive()
+        access = StoreTokenObtainPairSerializer.get_token(self.buyer).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        native = self.client.get('/api/orders/')
+        self.assertNotIn('Allow', native)
+        with override_settings(ROOT_URLCONF='config.urls'):
+            drf = self.client.get('/api/orders/')
+        self.assertEqual(native.json(), drf.json())
+        self.assertEqual(len(native.json()['results']), 4)
+        detail = self.client.get(f"/api/orders/{self.orders['cancelled']}/")
+        self.assertEqual(detail.json()['status'], 'cancelled')
+
+
+class SalesAnalyticsTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(
+            username='staff', password='password123', is_staff=True
+        )
+        self.buyer = User.objects.create_user(username='buyer', password='password123')
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=50)
+        self.chair = Product.objects.create(name='Chair', price=Decimal('45.50'), stock=50)
+
+    def checkout(self, lamps=0, chairs=0):
+        self.client.force_authenticate(user=self.buyer)
+        for product, quantity in ((self.lamp, lamps), (self.chair, chairs)):
+            if quantity:
+                self.client.post(
+                    reverse('cart-item-list'),
+                    {'product_id': product.id, 'quantity': quantity},
+                    format='json',
+                )
+        order_id = self.client.post(reverse('order-list'), {}, format='json').data['id']
+        self.client.force_authenticate(user=self.staff)
+        return order_id
+
+    def snapshot(self):
+        sales = DailySales.objects.exclude(order_count=0)
+        products = DailyProductSales.objects.exclude(units=0)
+        return (
+            sorted(sales.values_list('day', 'status', 'order_count', 'revenue')),
+            sorted(products.values_list('day', 'product_id', 'units', 'revenue')),
+        )
+
+    def test_aggregates_follow_transitions_and_match_a_rebuild(self):
+        first = self.checkout(lamps=2, chairs=1)
+        second = self.checkout(lamps=1)
+        third = self.checkout(chairs=2)
+        for order_id in (first, second, third):
+            self.client.post(reverse('order-pay', args=[order_id]), {}, format='json')
+        self.client.post(reverse('order-ship', args=[first]), {}, format='json')
+        self.client.patch(
+            reverse('order-set-status', args=[second]), {'status': 'cancelled'}, format='json'
+        )
+        self.client.post(
+            reverse('order-fulfill'), {'orders': [{'id': third, 'action': 'ship'}]}, format='json'
+        )
+        self.checkout(lamps=5)
+
+        today = timezone.localdate()
+        sales, products = self.snapshot()
+        self.assertEqual(
+            sales,
+            [
+                (today, 'cancelled', 1, Decimal('20.00')),
+                (today, 'pending', 1, Decimal('100.00')),
+                (today, 'shipped', 2, Decimal('176.50')),
+            ],
+        )
+        self.assertEqual(
+            products,
+            [
+                (today, self.lamp.id, 2, Decimal('40.00')),
+                (today, self.chair.id, 3, Decimal('136.50')),
+            ],
+        )
+        rebuild_sales_aggregates()
+        self.assertEqual(self.snapshot(), (sales, products))
+
+    def test_endpoint_reads_only_the_summary_tables(self):
+        for lamps in (1, 2, 3):
+            self.client.post(
+                reverse('order-pay', args=[self.checkout(lamps=lamps)]), {}, format='json'
+            )
+        url = reverse('sales-analytics')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'top': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(
+            response.data['by_status'],
+            [{'status': 'paid', 'order_count': 3, 'revenue': '120.00'}],
+        )
+        self.assertEqual(
+            response.data['top_products'],
+            [{'product_id': self.lamp.id, 'name': 'Lamp', 'units': 6, 'revenue': '120.00'}],
+        )
+        self.assertEqual(
+            self.client.get(url, {'start': '2026-02-01', 'end': '2026-01-01'}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.client.force_authenticate(user=self.buyer)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class RequestTimingTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', password='password123')
+        cart = Cart.objects.create(user=self.user)
+        for name in ('Lamp', 'Chair'):
+            product = Product.objects.create(name=name, price=Decimal('10.00'), stock=5)
+            CartItem.objects.create(cart=cart, product=product)
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header_counts_queries(self):
+        self.user.is_staff = True
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart'))
+        metrics = dict(
+            metric.strip().split(';', 1) for metric in response['Server-Timing'].split(',')
+        )
+        self.assertEqual(set(metrics), {'db', 'view', 'encode', 'total'})
+        self.assertIn(f'desc="{len(queries)} queries"', metrics['db'])
+        self.assertGreater(len(queries), 0)
+
+    def test_timings_are_not_shown_to_the_public(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('cart')))
+        self.client.force_authenticate(user=None)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('product-list')))
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_as_json(self):
+        with self.assertLogs('store.timing', level='WARNING') as logs:
+            self.client.get(reverse('cart'))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['event'], 'slow_request')
+        self.assertEqual(entry['path'], reverse('cart'))
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['queries'], 0)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_password_hashing_routes_are_not_logged_as_slow(self):
+        with self.assertNoLogs('store.timing', level='WARNING'):
+            response = self.client.post(
+                reverse('register-list'),
+                {'username': 'newcomer', 'password': 'password123'},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_top_statements_group_in_lists(self):
+        timings = RequestTimings()
+        timings.statements.update(
+            {
+                'SELECT * FROM t WHERE id IN (%s, %s)': 2,
+                'SELECT * FROM t WHERE id IN (%s, %s, %s)': 1,
+                'SELECT 1': 1,
+            }
+        )
+        self.assertEqual(
+            timings.top_statements(5),
+            [{'sql': 'SELECT * FROM t WHERE id IN (%s, ...)', 'count': 3}],
+        )
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled_middleware_is_not_loaded(self):
+        self.user.is_staff = True
+        self.assertNotIn('Server-Timing', self.client.get(reverse('cart')))
+
+
+@override_settings(ROOT_URLCONF='config.urls_async')
+class AsyncReadViewTests(StoreAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.buyer = User.objects.create_user(username='buyer', email='buyer@example.com')
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('20.00'), stock=5)
+        self.chair = Product.objects.create(name='Chair', price=Decimal('45.50'), stock=20)
+        self.console = Product.objects.create(name='Console', price=Decimal('299.00'), stock=9)
+        self.console.shard_stock(3)
+        Product.objects.create(name='Retired', price=Decimal('1.00'), is_active=False)
+        self.make_order(self.buyer, [(self.lamp, 2), (self.console, 2)])
+        self.order = self.make_order(self.buyer, [(self.chair, 2)])
+        self.make_order(self.staff)
+
+    def login(self, user):
+        access = StoreTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def get_both(self, path, **params):
+        """GET ``path`` through the async views, then the DRF views."""
+        cache.clear()
+        native = self.client.get(path, params)
+        cache.clear()
+        with override_settings(ROOT_URLCONF='config.urls'):
+            drf = self.client.get(path, params)
+        self.assertEqual(native.status_code, drf.status_code)
+        self.assertEqual(native.json(), drf.json())
+        return native
+
+    def test_catalog_matches_the_drf_views(self):
+        first = self.get_both('/api/products/', page_size=2)
+        # Answered natively: DRF responses carry an Allow header.
+        self.assertNotIn('Allow', first)
+        self.assertEqual([p['name'] for p in first.json()['results']], ['Console', 'Chair'])
+        self.get_both(first.json()['next'])
+        detail = self.get_both(f'/api/products/{self.console.id}/')
+        self.assertEqual(detail.json()['stock'], 9)
+        revalidated = self.client.get(
+            f'/api/products/{self.console.id}/', HTTP_IF_NONE_MATCH=detail['ETag']
+        )
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_async_pages_carry_the_drf_cursors(self):
+        page = self.get_both('/api/products/', page_size=1).json()
+        names = [page['results'][0]['name']]
+        while page['next']:
+            page = self.get_both(page['next']).json()
+            names.append(page['results'][0]['name'])
+        while page['previous']:
+            page = self.get_both(page['previous']).json()
+            names.append(page['results'][0]['name'])
+        self.assertEqual(names, ['Console', 'Chair', 'Lamp', 'Chair', 'Console'])
+
+    def test_order_history_and_profile_match_the_drf_views(self):
+        self.login(self.buyer)
+        history = self.get_both('/api/orders/', page_size=1)
+        self.assertNotIn('Allow', history)
+        self.get_both(history.json()['next'])
+        self.get_both(f'/api/orders/{self.order.id}/')
+        self.get_both('/api/auth/me/')
+        self.login(self.staff)
+        self.assertEqual(len(self.get_both('/api/orders/').json()['results']), 3)
+
+    def test_other_requests_fall_back_to_the_drf_views(self):
+        self.get_both('/api/products/', q='lamp')
+        self.get_both('/api/products/999/')
+        self.get_both('/api/orders/')
+        self.login(self.buyer)
+        self.get_both(f"/api/orders/{Order.objects.get(user=self.staff).id}/")
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.get_both('/api/products/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.login(self.staff)
+        response = self.client.post(
+            '/api/products/', {'name': 'Desk', 'price': '80.00', 'stock': 3}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,179 @@
+"""Per-request SQL and timing instrumentation.
+
+``RequestTimingMiddleware`` counts and times every SQL statement a request
+runs, on any database alias, through a ``connection.execute_wrapper`` hook
+that reads the current request from a context variable (so queries issued
+from ``sync_to_async`` threads are counted too). Responses to staff users
+(or to everyone with ``DEBUG``) get a ``Server-Timing`` header; the public
+doesn't see query counts or timings::
+
+    Server-Timing: db;dur=3.1;desc="12 queries", view;dur=8.4, encode;dur=1.2, total;dur=10.3
+
+``view`` covers the view itself, SQL and serializers included; ``encode``
+is the time the renderer spends turning a DRF/template response into bytes
+(streaming bodies are produced after the middleware returns and aren't
+included). Requests slower than
+``SLOW_REQUEST_MS`` or running more than ``SLOW_REQUEST_QUERIES`` statements
+are logged as one JSON line on the ``store.timing`` logger with the most
+repeated statements, which is where N+1 queries show up. Routes named in
+``SLOW_REQUEST_SKIP_URL_NAMES`` (registration and login, which spend their
+time hashing passwords) are only checked against the query count.
+
+With ``REQUEST_TIMING=False`` the middleware removes itself from the chain.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('store.timing')
+
+_current = ContextVar('store_request_timings', default=None)
+# "IN (%s, %s, %s)" and "IN (%s, %s)" are the same statement.
+_PLACEHOLDERS = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+class RequestTimings:
+    __slots__ = ('started', 'queries', 'sql_time', 'statements', 'view_started', 'view_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.view_started = None
+        self.view_time = None
+
+    def top_statements(self, limit):
+        """The ``limit`` statements run more than once, most repeated first."""
+        repeated = Counter()
+        for sql, count in self.statements.items():
+            repeated[_PLACEHOLDERS.sub('%s, ...', sql)] += count
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in repeated.most_common(limit)
+            if count > 1
+        ]
+
+
+def record_sql(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.sql_time += time.perf_counter() - start
+        timings.statements[sql] += 1
+
+
+def _install(connection):
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install(connection)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # New connections get the hook as they open; connections this
+        # thread already holds get it now.
+        connection_created.connect(_on_connection_created, dispatch_uid='store.timing')
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Runs between the view returning and the response being rendered.
+        timings = _current.get()
+        if timings is not None and timings.view_started is not None:
+            timings.view_time = time.perf_counter() - timings.view_started
+        return response
+
+    def _finish(self, request, response, timings):
+        finished = time.perf_counter()
+        total = finished - timings.started
+        encode = 0.0
+        if timings.view_started is None:
+            view = 0.0
+        elif timings.view_time is None:
+            view = finished - timings.view_started
+        else:
+            view = timings.view_time
+            encode = finished - timings.view_started - view
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response['Server-Timing'] = (
+                f'db;dur={timings.sql_time * 1000:.1f};desc="{timings.queries} queries", '
+                f'view;dur={view * 1000:.1f}, encode;dur={encode * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        match = request.resolver_match
+        timed = match is None or match.url_name not in settings.SLOW_REQUEST_SKIP_URL_NAMES
+        if (
+            (timed and total * 1000 >= settings.SLOW_REQUEST_MS)
+            or timings.queries > settings.SLOW_REQUEST_QUERIES
+        ):
+            logger.warning(
+                json.dumps(
+                    {
+                        'event': 'slow_request',
+                        'method': request.method,
+                        'path': request.path,
+                        'status': response.status_code,
+                        'total_ms': round(total * 1000, 1),
+                        'view_ms': round(view * 1000, 1),
+                        'encode_ms': round(encode * 1000, 1),
+                        'sql_ms': round(timings.sql_time * 1000, 1),
+                        'queries': timings.queries,
+                        'top_sql': timings.top_statements(settings.SLOW_REQUEST_TOP_SQL),
+                    }
+                )
+            )
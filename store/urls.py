@@ -1,7 +1,16 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import CartItemViewSet, CartView, OrderViewSet, ProductViewSet, RegisterView
+from .views import (
+    CartItemViewSet,
+    CartView,
+    GuestCartView,
+    OrderViewSet,
+    ProductViewSet,
+    RegisterView,
+)
+from .views_analytics import SalesAnalyticsView
+from .views_feed import order_events
 from .views_profile import ProfileView
 
 router = DefaultRouter()
@@ -11,7 +20,11 @@ router.register('orders', OrderViewSet, basename='order')
 router.register('register', RegisterView, basename='register')
 
 urlpatterns = [
+    # Before the router so "events" isn't taken for an order id.
+    path('orders/events/', order_events, name='order-events'),
     path('', include(router.urls)),
     path('cart/', CartView.as_view(), name='cart'),
+    path('cart/guest/', GuestCartView.as_view(), name='guest-cart'),
     path('auth/me/', ProfileView.as_view(), name='me'),
+    path('analytics/sales/', SalesAnalyticsView.as_view(), name='sales-analytics'),
 ]
@@ -1,48 +1,269 @@
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
+from django.core import signing
 from django.db import transaction
+from django.db.models import Case, F, OuterRef, Prefetch, Q, Subquery, When
+from django.db.models.functions import Coalesce, Greatest
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Cart, CartItem, Order, OrderItem, Product
+from .analytics import record_status_change
+from .cache import (
+    CatalogCacheMixin,
+    bump_cart_versions,
+    bump_catalog_stock,
+    get_cart_snapshot,
+    set_cart_snapshot,
+)
+from .carts import (
+    active_products,
+    add_to_cart,
+    check_cart_lines,
+    dump_guest_cart,
+    load_guest_cart,
+)
+from .exports import export_orders, export_output, export_products
+from .fastpath import (
+    FastListMixin,
+    order_rows,
+    product_rows,
+    serialize_orders,
+    serialize_products,
+)
+from .feeds import InvalidCursor, encode_cursor, initial_cursor, order_changes_queryset
+from .fieldsets import SparseFieldsetMixin, sparse_orders, sparse_products
+from .idempotency import idempotent
+from .models import Cart, CartItem, Order, OrderHistory, OrderItem, Product, ProductStockShard
+from .pagination import StaffBoardPagination
+from .routers import ReplicaReadMixin
+from .search import search_products
+from .sync import DeltaSyncMixin
 from .serializers import (
+    BulkCartItemsSerializer,
     CartItemSerializer,
     CartSerializer,
+    GuestCartSerializer,
+    FulfillmentSerializer,
+    OrderChangeSerializer,
     OrderSerializer,
     OrderStatusUpdateSerializer,
     PreparationItemSerializer,
     ProductSerializer,
     RegisterSerializer,
+    StaffBoardFilterSerializer,
+    StaffBoardOrderSerializer,
 )
 
 User = get_user_model()
 
 
+def catalog_products():
+    """The products the public catalog shows."""
+    return Product.objects.filter(is_active=True)
+
+
+def visible_orders(user, action, syncing=False):
+    """The orders ``user`` reads through ``action`` of ``OrderViewSet``.
+
+    Reads see archived orders too (store/archive.py), except the staff list:
+    an unfiltered scan of the history would sort every order. A staff sync
+    (``syncing``) reads the history, narrowed to recent changes, so that
+    orders archived since come back as tombstones.
+    """
+    model = Order
+    if action == 'retrieve' or (action == 'list' and (syncing or not user.is_staff)):
+        model = OrderHistory
+    if user.is_staff:
+        return model.objects.all()
+    return model.objects.filter(user_id=user.id)
+
+
 class RegisterView(mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.filter(is_active=True).order_by('-created_at')
+class ProductViewSet(
+    ReplicaReadMixin,
+    CatalogCacheMixin,
+    DeltaSyncMixin,
+    SparseFieldsetMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = catalog_products().prefetch_related('stock_shards').order_by('-created_at')
     serializer_class = ProductSerializer
+    fast_list_rows = staticmethod(product_rows)
+    fast_list_serialize = staticmethod(serialize_products)
+    sparse_loader = staticmethod(sparse_products)
+    sparse_required_columns = ('is_active', 'created_at', 'updated_at')
+    # Product.last_changed_at, which sharded stock moves without the row.
+    sync_ordering = ('synced_at', 'id')
+    list_ordering = ('-created_at', '-id')
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    @property
+    def search_query(self):
+        if self.action != 'list':
+            return ''
+        return self.request.query_params.get('q', '').strip()
+
+    @property
+    def cursor_ordering(self):
+        if self.updated_since is not None:
+            return self.sync_ordering
+        if self.search_query:
+            return ('search_rank', 'id')
+        return self.list_ordering
+
+    def is_tombstone(self, instance) -> bool:
+        return not instance.is_active
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.updated_since is not None:
+            # Deactivated products are included so clients can drop them.
+            since = self.updated_since[0]
+            shards = ProductStockShard.objects.filter(product=OuterRef('pk'))
+            queryset = (
+                Product.objects.prefetch_related('stock_shards')
+                .filter(
+                    Q(updated_at__gte=since)
+                    | Q(
+                        pk__in=ProductStockShard.objects.filter(
+                            updated_at__gte=since
+                        ).values('product_id')
+                    )
+                )
+                .annotate(
+                    synced_at=Greatest(
+                        'updated_at',
+                        Coalesce(
+                            Subquery(shards.order_by('-updated_at').values('updated_at')[:1]),
+                            'updated_at',
+                        ),
+                    )
+                )
+            )
+            queryset = self.sync_queryset(queryset)
+        if self.search_query:
+            queryset = search_products(queryset, self.search_query)
+        return self.sparse_queryset(queryset)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Stream every product, active or not, as NDJSON or ``?output=csv``."""
+        return export_products(Product.objects.all(), export_output(request))
+
+
+def carts_with_items():
+    return Cart.objects.prefetch_related(
+        Prefetch(
+            'items',
+            queryset=CartItem.objects.select_related('product').prefetch_related(
+                'product__stock_shards'
+            ),
+        )
+    )
+
 
 class CartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        version, data = get_cart_snapshot(request.user.id)
+        if data is None:
+            # Reading never creates the cart; the first added line does.
+            cart = carts_with_items().filter(user_id=request.user.id).first()
+            if cart is None:
+                data = {'id': None, 'items': [], 'total': Decimal('0.00'), 'updated_at': None}
+            else:
+                data = CartSerializer(cart).data
+            set_cart_snapshot(request.user.id, version, data)
+        return Response(data)
+
+
+class GuestCartView(APIView):
+    """The cart of an anonymous visitor, held by the client as a signed token.
+
+    ``GET ?token=`` renders it, ``POST {token, items}`` adds lines (merging
+    quantities like ``/cart/items/bulk/``) and ``PUT {token, items}``
+    replaces them. Every response carries the new ``token``; nothing is
+    written to the database. Sending the token as ``guest_cart`` when
+    obtaining a JWT merges it into the user's cart.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        return Response(self._cart(self._load(request.query_params.get('token'))))
+
+    def post(self, request):
+        serializer = GuestCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        current = self._load(serializer.validated_data.get('token'))
+        added = {
+            product_id: current.get(product_id, 0) + quantity
+            for product_id, quantity in serializer.quantities().items()
+        }
+        products = active_products({**current, **added})
+        check_cart_lines(products, added)
+        return Response(self._cart({**current, **added}, products))
+
+    def put(self, request):
+        serializer = GuestCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantities = serializer.quantities()
+        products = active_products(quantities)
+        check_cart_lines(products, quantities)
+        return Response(self._cart(quantities, products))
+
+    def _load(self, token):
+        if not token:
+            return {}
+        try:
+            return load_guest_cart(token)
+        except signing.BadSignature:
+            raise ValidationError({'token': ['Invalid guest cart.']})
+
+    def _cart(self, quantities, products=None):
+        """Render ``quantities``, dropping products deactivated since they were added."""
+        if products is None:
+            products = active_products(quantities)
+        kept = {
+            product_id: quantity
+            for product_id, quantity in quantities.items()
+            if product_id in products
+        }
+        items = []
+        total = Decimal('0')
+        for product_id, quantity in sorted(kept.items()):
+            product = products[product_id]
+            subtotal = (product.price * quantity).quantize(Decimal('0.01'))
+            total += subtotal
+            items.append(
+                {
+                    'product': ProductSerializer(product).data,
+                    'quantity': quantity,
+                    'subtotal': str(subtotal),
+                }
+            )
+        return {
+            'token': dump_guest_cart(kept),
+            'items': items,
+            'total': total.quantize(Decimal('0.01')),
+        }
 
 
 class CartItemViewSet(
@@ -55,18 +276,57 @@ class CartItemViewSet(
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        cart, _ = Cart.objects.get_or_create(user=self.request.user)
-        return CartItem.objects.filter(cart=cart).select_related('product')
+        # Lines are found through their owner, so updates and deletes don't
+        # have to load (or create) the cart first.
+        return CartItem.objects.filter(cart__user_id=self.request.user.id).select_related(
+            'product', 'cart'
+        )
 
-    def perform_create(self, serializer):
-        cart, _ = Cart.objects.get_or_create(user=self.request.user)
-        serializer.save(cart=cart)
+    def get_cart(self):
+        if not hasattr(self, '_cart'):
+            self._cart, _ = Cart.objects.get_or_create(user_id=self.request.user.id)
+        return self._cart
+
+    def create(self, request, *args, **kwargs):
+        """Add a product, merging the quantity into its line if it's already there."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product = serializer.validated_data['product']
+        quantity = serializer.validated_data['quantity']
+        cart = self.get_cart()
+        merged = add_to_cart(cart, {product.id: quantity})[product.id] != quantity
+        item = self.get_queryset().prefetch_related('product__stock_shards').get(
+            cart=cart, product=product
+        )
+        return Response(
+            self.get_serializer(item).data,
+            status=status.HTTP_200_OK if merged else status.HTTP_201_CREATED,
+        )
 
     def perform_update(self, serializer):
         serializer.save()
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Add many ``{product_id, quantity}`` lines at once, e.g. to reorder.
+
+        Quantities are merged into lines already in the cart. Stock is
+        checked for every product before anything is written, and the whole
+        request costs the same few queries however many lines it carries.
+        Responds with the updated cart.
+        """
+        serializer = BulkCartItemsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart = self.get_cart()
+        add_to_cart(cart, serializer.quantities())
+        return Response(CartSerializer(carts_with_items().get(pk=cart.pk)).data)
+
 
 class OrderViewSet(
+    ReplicaReadMixin,
+    DeltaSyncMixin,
+    SparseFieldsetMixin,
+    FastListMixin,
     viewsets.GenericViewSet,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
@@ -74,50 +334,232 @@ class OrderViewSet(
 ):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    fast_list_rows = staticmethod(order_rows)
+    fast_list_serialize = staticmethod(serialize_orders)
+    expandable_fields = ('items.product',)
+    sparse_loader = staticmethod(sparse_orders)
+    list_ordering = ('-placed_at', '-id')
 
-    def get_queryset(self):
+    @property
+    def cursor_ordering(self):
+        if self.updated_since is not None:
+            return self.sync_ordering
+        return self.list_ordering
+
+    @property
+    def sync_ordering(self):
+        # OrderHistory.synced_at: an archived order leaves the staff list
+        # when it is archived, not when it was last updated.
         if self.request.user.is_staff:
-            return Order.objects.select_related('user').prefetch_related('items__product')
-        return Order.objects.filter(user=self.request.user).select_related('user').prefetch_related('items__product')
+            return ('synced_at', 'id')
+        return ('updated_at', 'id')
+
+    @property
+    def sparse_required_columns(self):
+        if self.updated_since is not None and self.request.user.is_staff:
+            return ('status', 'placed_at', 'updated_at', 'archived', 'synced_at')
+        return ('status', 'placed_at', 'updated_at')
 
-    @transaction.atomic
+    def is_tombstone(self, instance) -> bool:
+        if instance.status == Order.STATUS_CANCELLED:
+            return True
+        return self.request.user.is_staff and instance.archived
+
+    def get_queryset(self):
+        queryset = (
+            visible_orders(self.request.user, self.action, self.updated_since is not None)
+            .select_related('user')
+            .prefetch_related('items__product__stock_shards')
+        )
+        if self.updated_since is not None:
+            queryset = self.sync_queryset(queryset)
+        return self.sparse_queryset(queryset)
+
+    @idempotent
     def create(self, request, *args, **kwargs):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        items = cart.items.select_related('product')
-        if not items.exists():
-            return Response({'detail': 'Cart is empty.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        order = Order.objects.create(user=request.user)
-        for cart_item in items:
-            product = cart_item.product
-            if cart_item.quantity > product.stock:
+        with transaction.atomic():
+            cart = Cart.objects.filter(user_id=request.user.id).first()
+            cart_items = [] if cart is None else list(
+                cart.items.select_related('product').prefetch_related('product__stock_shards')
+            )
+            if not cart_items:
+                return Response({'detail': 'Cart is empty.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            for cart_item in cart_items:
+                if cart_item.quantity > cart_item.product.available_stock:
+                    return self._insufficient_stock(cart_item.product)
+
+            bump_cart_versions(
+                Cart.objects.filter(
+                    items__product_id__in=[item.product_id for item in cart_items]
+                ).values_list('user_id', flat=True)
+            )
+            short = self._reserve_stock(cart_items)
+            if short is not None:
+                # Stock ran out after the cart was read; undo the partial
+                # decrement.
                 transaction.set_rollback(True)
-                return Response(
-                    {'detail': f'Insufficient stock for {product.name}.'},
-                    status=status.HTTP_400_BAD_REQUEST,
+                order = None
+            else:
+                total = sum((item.subtotal for item in cart_items), Decimal('0'))
+                order = Order.objects.create(
+                    user_id=request.user.id, total_amount=total.quantize(Decimal('0.01'))
                 )
-            product.stock -= cart_item.quantity
-            product.save(update_fields=['stock'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=cart_item.quantity,
-                unit_price=product.price,
-            )
-        order.recalculate_total()
-        items.delete()
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(
+                            order=order,
+                            product=item.product,
+                            quantity=item.quantity,
+                            unit_price=item.product.price,
+                        )
+                        for item in cart_items
+                    ]
+                )
+                record_status_change([order], None, Order.STATUS_PENDING)
+                cart.items.all().delete()
+
+        if order is None:
+            return self._insufficient_stock(short)
+
+        # Serialize after commit so the write transaction stays short.
+        order = self.get_queryset().get(pk=order.pk)
         serializer = self.get_serializer(order)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def _reserve_stock(self, cart_items):
+        """Decrement stock for every cart line.
+
+        Unsharded products are decremented together by one conditional
+        UPDATE; sharded products claim from their stock shards instead of
+        touching the product row. Returns ``None``, or a product that no
+        longer has enough stock, in which case some rows may already be
+        decremented and the caller must roll back.
+        """
+        in_stock = Q()
+        new_stock = []
+        plain_items = []
+        for item in cart_items:
+            if item.product.stock_shard_count:
+                if not item.product.claim_sharded_stock(item.quantity):
+                    return item.product
+                continue
+            plain_items.append(item)
+            in_stock |= Q(pk=item.product_id, stock__gte=item.quantity)
+            new_stock.append(When(pk=item.product_id, then=F('stock') - item.quantity))
+        bump_catalog_stock([item.product_id for item in cart_items])
+        if not plain_items:
+            return None
+        now = timezone.now()
+        plain = {item.product_id: item.product for item in plain_items}
+        if Product.objects.filter(in_stock).update(
+            stock=Case(*new_stock), updated_at=now
+        ) == len(plain):
+            return None
+        # The rows the UPDATE skipped for lack of stock kept their updated_at.
+        short = (
+            Product.objects.filter(pk__in=plain).exclude(updated_at=now).order_by('pk')
+            .values_list('pk', flat=True).first()
+        )
+        return plain[short]
+
+    def _insufficient_stock(self, product):
+        return Response(
+            {'detail': f'Insufficient stock for {product.name}.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[permissions.IsAdminUser],
+        pagination_class=StaffBoardPagination,
+    )
+    def board(self, request):
+        """Slim, filterable order projection for the staff dashboard."""
+        filters = StaffBoardFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        orders = filters.filter_queryset(Order.objects.all()).values(
+            'id', 'status', 'total_amount', 'placed_at', 'updated_at',
+            username=F('user__username'),
+        )
+        page = self.paginate_queryset(orders)
+        items_by_order = {order['id']: [] for order in page}
+        items = OrderItem.objects.filter(order_id__in=items_by_order).order_by('id').values(
+            'id', 'order_id', 'quantity', 'prepared_quantity', name=F('product__name')
+        )
+        for item in items:
+            items_by_order[item['order_id']].append(item)
+        for order in page:
+            order['items'] = items_by_order[order['id']]
+        return self.get_paginated_response(StaffBoardOrderSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Stream orders and their items as NDJSON or ``?output=csv``.
+
+        Takes the board filters (``status``, ``placed_from``, ``placed_to``, ``q``).
+        """
+        output = export_output(request)
+        filters = StaffBoardFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        return export_orders(filters.filter_queryset(OrderHistory.objects.all()), output)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def changes(self, request):
+        """Orders created or changed since the ``?since=`` cursor.
+
+        Without ``since`` the response only carries a cursor to poll from.
+        """
+        cursor = request.query_params.get('since') or initial_cursor()
+        try:
+            rows = list(order_changes_queryset(cursor))
+        except InvalidCursor as exc:
+            raise ValidationError({'since': str(exc)})
+        if rows:
+            cursor = encode_cursor(rows[-1]['updated_at'], rows[-1]['id'])
+        return Response(
+            {'changes': OrderChangeSerializer(rows, many=True).data, 'cursor': cursor}
+        )
+
+    def _change_status(self, order, new_status):
+        """Move ``order`` to ``new_status`` and update the sales aggregates.
+
+        The UPDATE is guarded on the status the order was read with so a
+        transition is applied, and counted, once. Returns a 409 response if
+        another request changed the order in between, otherwise ``None``.
+        """
+        old_status = order.status
+        if old_status == new_status:
+            return None
+        with transaction.atomic():
+            # Stamped once the write lock is held (BEGIN IMMEDIATE), not
+            # before waiting for it, so updated_at follows commit order.
+            now = timezone.now()
+            updated = Order.objects.filter(pk=order.pk, status=old_status).update(
+                status=new_status, updated_at=now
+            )
+            if updated:
+                record_status_change([order], old_status, new_status)
+        if not updated:
+            return Response(
+                {'detail': 'Order changed while it was updated; retry.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        order.status, order.updated_at = new_status, now
+        return None
+
     @action(detail=True, methods=['post'])
+    @idempotent
     def pay(self, request, pk=None):
         order = self.get_object()
-        if order.user != request.user and not request.user.is_staff:
+        if order.user_id != request.user.id and not request.user.is_staff:
             return Response({'detail': 'Not allowed.'}, status=status.HTTP_403_FORBIDDEN)
         if order.status != Order.STATUS_PENDING:
             return Response({'detail': 'Order not pending.'}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = Order.STATUS_PAID
-        order.save(update_fields=['status', 'updated_at'])
+        conflict = self._change_status(order, Order.STATUS_PAID)
+        if conflict:
+            return conflict
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
@@ -126,13 +568,16 @@ class OrderViewSet(
         order = self.get_object()
         serializer = OrderStatusUpdateSerializer(order, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        if 'status' in serializer.validated_data:
+            conflict = self._change_status(order, serializer.validated_data['status'])
+            if conflict:
+                return conflict
         return Response(OrderSerializer(order).data)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def prepare(self, request, pk=None):
         order = self.get_object()
-        if order.status not in [Order.STATUS_PAID, Order.STATUS_PREPARED]:
+        if order.status not in Order.PREPARABLE_STATUSES:
             return Response(
                 {'detail': 'Order must be paid before preparation.'},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -151,23 +596,120 @@ class OrderViewSet(
             item.prepared_quantity = min(prepared_qty, item.quantity)
             item.save(update_fields=['prepared_quantity'])
 
-        order.update_preparation_status()
+        if order.status != Order.STATUS_PREPARED and Order.is_fully_prepared(
+            list(items_map.values())
+        ):
+            conflict = self._change_status(order, Order.STATUS_PREPARED)
+            if conflict:
+                return conflict
         return Response(OrderSerializer(order).data)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def ready_to_ship(self, request, pk=None):
         order = self.get_object()
-        if order.status != Order.STATUS_PREPARED:
+        if order.status not in Order.READY_TO_SHIP_FROM_STATUSES:
             return Response({'detail': 'Order must be prepared first.'}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = Order.STATUS_READY_TO_SHIP
-        order.save(update_fields=['status', 'updated_at'])
+        conflict = self._change_status(order, Order.STATUS_READY_TO_SHIP)
+        if conflict:
+            return conflict
         return Response(OrderSerializer(order).data)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
     def ship(self, request, pk=None):
         order = self.get_object()
-        if order.status not in [Order.STATUS_READY_TO_SHIP, Order.STATUS_PREPARED, Order.STATUS_PAID]:
+        if order.status not in Order.SHIPPABLE_STATUSES:
             return Response({'detail': 'Order not ready to ship.'}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = Order.STATUS_SHIPPED
-        order.save(update_fields=['status', 'updated_at'])
+        conflict = self._change_status(order, Order.STATUS_SHIPPED)
+        if conflict:
+            return conflict
         return Response(OrderSerializer(order).data)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def fulfill(self, request):
+        """Prepare, mark ready and ship many orders in one request.
+
+        Operations are applied in payload order with the same rules as the
+        single-order actions, so one order may be prepared, marked ready and
+        shipped in a single batch. Item quantities are written with one
+        ``bulk_update`` and statuses with one guarded UPDATE per transition.
+        """
+        serializer = FulfillmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['orders']
+        order_ids = {operation['id'] for operation in operations}
+
+        with transaction.atomic():
+            original = dict(
+                Order.objects.filter(id__in=order_ids).values_list('id', 'status')
+            )
+            current = dict(original)
+            items_by_order = {}
+            prepare_ids = [op['id'] for op in operations if op['action'] == 'prepare']
+            for item in OrderItem.objects.filter(order_id__in=prepare_ids).only(
+                'id', 'order_id', 'quantity', 'prepared_quantity'
+            ):
+                items_by_order.setdefault(item.order_id, {})[item.id] = item
+
+            results = []
+            changed_items = {}
+            for operation in operations:
+                order_id, action_name = operation['id'], operation['action']
+                order_status = current.get(order_id)
+                detail = None
+                if order_status is None:
+                    detail = 'Not found.'
+                elif action_name == 'prepare':
+                    if order_status not in Order.PREPARABLE_STATUSES:
+                        detail = 'Order must be paid before preparation.'
+                    else:
+                        items = items_by_order.get(order_id, {})
+                        for item_data in operation.get('items', []):
+                            item = items.get(item_data['id'])
+                            if not item:
+                                continue
+                            item.prepared_quantity = min(item_data['prepared_quantity'], item.quantity)
+                            changed_items[item.id] = item
+                        if Order.is_fully_prepared(list(items.values())):
+                            current[order_id] = Order.STATUS_PREPARED
+                elif action_name == 'ready_to_ship':
+                    if order_status not in Order.READY_TO_SHIP_FROM_STATUSES:
+                        detail = 'Order must be prepared first.'
+                    else:
+                        current[order_id] = Order.STATUS_READY_TO_SHIP
+                elif order_status not in Order.SHIPPABLE_STATUSES:
+                    detail = 'Order not ready to ship.'
+                else:
+                    current[order_id] = Order.STATUS_SHIPPED
+                results.append(
+                    {
+                        'id': order_id,
+                        'action': action_name,
+                        'ok': detail is None,
+                        'status': current.get(order_id),
+                        'detail': detail,
+                    }
+                )
+
+            if changed_items:
+                OrderItem.objects.bulk_update(changed_items.values(), ['prepared_quantity'])
+            transitions = {}
+            for order_id, new_status in current.items():
+                if new_status != original[order_id]:
+                    transitions.setdefault((original[order_id], new_status), []).append(order_id)
+            now = timezone.now()
+            for (old_status, new_status), ids in transitions.items():
+                updated = Order.objects.filter(id__in=ids, status=old_status).update(
+                    status=new_status, updated_at=now
+                )
+                if updated != len(ids):
+                    transaction.set_rollback(True)
+                    return Response(
+                        {'detail': 'Orders changed while the batch was applied; retry.'},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+            changed = Order.objects.filter(
+                id__in=[order_id for ids in transitions.values() for order_id in ids]
+            ).only('id', 'placed_at', 'total_amount').in_bulk()
+            for (old_status, new_status), ids in transitions.items():
+                record_status_change([changed[order_id] for order_id in ids], old_status, new_status)
+        return Response({'results': results})
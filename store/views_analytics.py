@@ -0,0 +1,52 @@
+from django.db.models import F, Sum
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import DailyProductSales, DailySales
+from .routers import ReplicaReadMixin
+from .serializers import (
+    ProductSalesSerializer,
+    SalesAnalyticsFilterSerializer,
+    SalesDaySerializer,
+    SalesStatusSerializer,
+)
+
+
+class SalesAnalyticsView(ReplicaReadMixin, APIView):
+    """Revenue per day and status, and best sellers, from the sales aggregates.
+
+    Reads at most ``days x statuses`` and ``days x products`` summary rows,
+    whatever the number of orders.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        filters = SalesAnalyticsFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        start, end, top = (filters.validated_data[key] for key in ('start', 'end', 'top'))
+
+        sales = DailySales.objects.filter(day__range=(start, end)).exclude(order_count=0)
+        daily = sales.order_by('day', 'status').values('day', 'status', 'order_count', 'revenue')
+        by_status = (
+            sales.values('status')
+            .annotate(order_count=Sum('order_count'), revenue=Sum('revenue'))
+            .order_by('status')
+        )
+        top_products = (
+            DailyProductSales.objects.filter(day__range=(start, end))
+            .values('product_id', name=F('product__name'))
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .filter(units__gt=0)
+            .order_by('-units', 'product_id')[:top]
+        )
+        return Response(
+            {
+                'start': start,
+                'end': end,
+                'daily': SalesDaySerializer(daily, many=True).data,
+                'by_status': SalesStatusSerializer(by_status, many=True).data,
+                'top_products': ProductSalesSerializer(top_products, many=True).data,
+            }
+        )
@@ -0,0 +1,194 @@
+"""Native async GET handlers for the read-heavy endpoints.
+
+``config.urls_async`` (``ASYNC_READ_VIEWS=True``) puts these in front of the
+DRF views for the catalog list and detail, the profile and the order
+history. Under ASGI a plain JSON GET on them is read with the async ORM and
+rendered on the event loop instead of holding a worker thread for the whole
+request. Anything else (other methods, ``?q=``, ``?updated_since=``,
+``?offset=``, ``?fields=``/``?expand=``, the browsable API, missing objects,
+bad tokens or cursors) is handed to the sync view, so the API answers
+exactly as before.
+"""
+
+import time
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .authentication import aauthenticate
+from .cache import (
+    acatalog_entry,
+    acatalog_entry_is_current,
+    aget_catalog_generation,
+    catalog_cache_key,
+    conditional_catalog_response,
+)
+from .fastpath import aserialize_orders, aserialize_products, order_rows, product_rows
+from .pagination import KeysetPagination
+from .routers import allow_replica_reads, awrote_recently, routing_scope
+from .views import OrderViewSet, ProductViewSet, catalog_products, visible_orders
+from .views_profile import ProfileView
+
+JSON = 'application/json'
+# Sparse fieldsets (store/fieldsets.py) are only rendered by the DRF views.
+SPARSE_PARAMS = ('fields', 'expand')
+
+product_list_view = sync_to_async(ProductViewSet.as_view({'get': 'list', 'post': 'create'}))
+product_detail_view = sync_to_async(
+    ProductViewSet.as_view(
+        {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+    )
+)
+order_list_view = sync_to_async(OrderViewSet.as_view({'get': 'list', 'post': 'create'}))
+order_detail_view = sync_to_async(OrderViewSet.as_view({'get': 'retrieve'}))
+profile_view = sync_to_async(ProfileView.as_view())
+
+
+def _native(request, unsupported=()):
+    """Whether ``request`` is a JSON GET the async path can answer."""
+    if request.method != 'GET' or 'format' in request.GET:
+        return False
+    if any(param in request.GET for param in (*SPARSE_PARAMS, *unsupported)):
+        return False
+    return 'text/html' not in request.headers.get('Accept', '')
+
+
+async def _user(request):
+    """The token's user, ``AnonymousUser`` without one, ``None`` if it's rejected."""
+    try:
+        authenticated = await aauthenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    # As DRF does, so the timing middleware knows who is asking.
+    request.user = authenticated[0] if authenticated else AnonymousUser()
+    return request.user
+
+
+def _response(content):
+    response = HttpResponse(content, content_type=JSON)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+async def _page(request, rows, ordering, serialize):
+    """Serialize one cursor page of ``rows`` as the paginated JSON body."""
+    using = rows.db
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(
+        rows.using(using), Request(request), SimpleNamespace(cursor_ordering=ordering)
+    )
+    return paginator.get_paginated_response(await serialize(page, using=using)).data
+
+
+async def _catalog_response(request, build):
+    """Serve the data ``build()`` returns through the catalog cache."""
+    generation = await aget_catalog_generation()
+    key = catalog_cache_key(request, generation)
+    entry = await cache.aget(key)
+    if entry is None or not await acatalog_entry_is_current(entry):
+        started = time.time_ns()
+        data = await build()
+        if data is None:
+            return None
+        entry, cacheable = await acatalog_entry(
+            JSONRenderer().render(data), JSON, data, generation, started
+        )
+        if cacheable:
+            await cache.aset(key, entry, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return conditional_catalog_response(request, entry, _response(entry.content))
+
+
+@csrf_exempt
+async def product_list(request):
+    if not _native(request, ('q', 'updated_since', 'offset')) or await _user(request) is None:
+        return await product_list_view(request)
+
+    async def build():
+        rows = product_rows(catalog_products())
+        return await _page(request, rows, ProductViewSet.list_ordering, aserialize_products)
+
+    with routing_scope():
+        try:
+            return await _catalog_response(request, build)
+        except APIException:
+            pass
+    return await product_list_view(request)
+
+
+@csrf_exempt
+async def product_detail(request, pk):
+    if not _native(request) or await _user(request) is None:
+        return await product_detail_view(request, pk=pk)
+
+    async def build():
+        rows = product_rows(catalog_products().filter(pk=pk))
+        using = rows.db
+        row = await rows.using(using).afirst()
+        if row is None:
+            return None
+        return (await aserialize_products([row], using=using))[0]
+
+    with routing_scope():
+        response = await _catalog_response(request, build)
+    return response or await product_detail_view(request, pk=pk)
+
+
+@csrf_exempt
+async def profile(request):
+    user = await _user(request) if _native(request) else None
+    if user is None or not user.is_authenticated:
+        return await profile_view(request)
+    return _response(
+        JSONRenderer().render(
+            {
+                'username': user.get_username(),
+                'email': user.email,
+                'is_staff': user.is_staff,
+                'is_superuser': user.is_superuser,
+            }
+        )
+    )
+
+
+@csrf_exempt
+async def order_list(request):
+    user = await _user(request) if _native(request, ('updated_since', 'offset')) else None
+    if user is None or not user.is_authenticated:
+        return await order_list_view(request)
+    with routing_scope():
+        if not await awrote_recently(user.pk):
+            allow_replica_reads()
+        rows = order_rows(visible_orders(user, 'list'))
+        try:
+            data = await _page(request, rows, OrderViewSet.list_ordering, aserialize_orders)
+        except APIException:
+            return await order_list_view(request)
+    return _response(JSONRenderer().render(data))
+
+
+@csrf_exempt
+async def order_detail(request, pk):
+    user = await _user(request) if _native(request) else None
+    if user is None or not user.is_authenticated:
+        return await order_detail_view(request, pk=pk)
+    with routing_scope():
+        if not await awrote_recently(user.pk):
+            allow_replica_reads()
+        rows = order_rows(visible_orders(user, 'retrieve').filter(pk=pk))
+        using = rows.db
+        row = await rows.using(using).afirst()
+        if row is not None:
+            data = (await aserialize_orders([row], using=using))[0]
+    if row is None:
+        return await order_detail_view(request, pk=pk)
+    return _response(JSONRenderer().render(data))
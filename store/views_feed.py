@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .authentication import StoreJWTAuthentication
+from .feeds import InvalidCursor, decode_cursor, encode_cursor, initial_cursor, order_changes_queryset
+from .serializers import OrderChangeSerializer
+
+
+def _authenticate(request):
+    # EventSource can't send headers, so the access token may come as ?token=.
+    authentication = StoreJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None and request.GET.get('token'):
+        raw_token = request.GET['token'].encode()
+    if raw_token is None:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (AuthenticationFailed, InvalidToken):
+        return None
+
+
+def _event(row):
+    cursor = encode_cursor(row['updated_at'], row['id'])
+    data = json.dumps(OrderChangeSerializer(row).data)
+    return cursor, f'id: {cursor}\nevent: order\ndata: {data}\n\n'
+
+
+def _retry():
+    return f'retry: {int(settings.ORDER_FEED_POLL_INTERVAL * 1000)}\n\n'
+
+
+async def _event_stream(cursor):
+    yield _retry()
+    idle = 0.0
+    while True:
+        rows = [row async for row in order_changes_queryset(cursor)]
+        for row in rows:
+            cursor, event = _event(row)
+            yield event
+        idle = 0.0 if rows else idle + settings.ORDER_FEED_POLL_INTERVAL
+        if idle >= settings.ORDER_FEED_HEARTBEAT_SECONDS:
+            idle = 0.0
+            yield ': keep-alive\n\n'
+        await asyncio.sleep(settings.ORDER_FEED_POLL_INTERVAL)
+
+
+def _single_batch(cursor):
+    # Under WSGI a worker can't be parked on an endless stream: send what has
+    # changed and let EventSource reconnect with Last-Event-ID after `retry`.
+    yield _retry()
+    for row in order_changes_queryset(cursor):
+        yield _event(row)[1]
+
+
+async def order_events(request):
+    """Server-Sent Events stream of staff order changes.
+
+    Served as a long-lived stream through ``config.asgi``; each open
+    dashboard costs one indexed query per ``ORDER_FEED_POLL_INTERVAL``.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'}, status=401
+        )
+    if not user.is_staff:
+        return JsonResponse(
+            {'detail': 'You do not have permission to perform this action.'}, status=403
+        )
+    cursor = (
+        request.headers.get('Last-Event-ID') or request.GET.get('since') or initial_cursor()
+    )
+    try:
+        decode_cursor(cursor)
+    except InvalidCursor as exc:
+        return JsonResponse({'since': [str(exc)]}, status=400)
+
+    if isinstance(request, ASGIRequest):
+        stream = _event_stream(cursor)
+    else:
+        stream = _single_batch(cursor)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response